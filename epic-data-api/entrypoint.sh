@@ -31,11 +31,14 @@ python manage.py migrate
 # Create logs directory if it doesn't exist
 mkdir -p /var/log/epic-data
 
-# Start server with Gunicorn
+# Start server with Gunicorn. Threaded workers keep reporting to the master
+# while a thread streams a long export, so --timeout does not kill them
 echo "Starting Gunicorn server..."
 /usr/local/bin/gunicorn epic_data.wsgi:application \
     --bind 0.0.0.0:8000 \
     --workers 4 \
+    --worker-class gthread \
+    --threads 4 \
     --timeout 120 \
     --access-logfile /var/log/epic-data/gunicorn-access.log \
     --error-logfile /var/log/epic-data/gunicorn-error.log \
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 
 # Load environment variables from .env file if it exists
 if os.path.exists(os.path.join(os.path.dirname(__file__), "..", ".env")):
@@ -90,6 +91,12 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Parks are ingested from several threads; take the write lock when a
+        # transaction starts and wait for it instead of failing immediately
+        "OPTIONS": {
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
     }
 }
 
@@ -100,6 +107,30 @@ if os.environ.get("DATABASE_URL") and os.environ.get("USE_POSTGRES", "False") ==
     )
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Shared by the web workers and the ingest process, which invalidates cached
+# responses after each ingest. The default file cache lives in the project
+# directory so every process (and container mounting it) sees the same one;
+# set CACHE_BACKEND to django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION to a redis:// URL to use Redis instead
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", str(BASE_DIR / "cache")),
+    }
+}
+# File and memory caches evict entries at random once they hold MAX_ENTRIES;
+# Redis evicts by its own policy and takes no such option
+if not CACHES["default"]["BACKEND"].endswith("RedisCache"):
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", "10000"))
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -149,6 +180,171 @@ THEME_PARK_API_BASE_URL = os.environ.get(
 THEME_PARK_ENTITY_ID = os.environ.get(
     "THEME_PARK_ENTITY_ID", "12dbb85b-265f-44e6-bccf-f1faa17211fc"
 )
+# Comma-separated list of parks to track; defaults to THEME_PARK_ENTITY_ID
+THEME_PARK_ENTITY_IDS = [
+    entity_id.strip()
+    for entity_id in os.environ.get(
+        "THEME_PARK_ENTITY_IDS", THEME_PARK_ENTITY_ID
+    ).split(",")
+    if entity_id.strip()
+]
+# Maximum number of parks fetched and processed at the same time
+THEME_PARK_MAX_CONCURRENT_FETCHES = int(
+    os.environ.get("THEME_PARK_MAX_CONCURRENT_FETCHES", "4")
+)
+# Write each live data payload with bulk inserts inside one transaction
+# instead of one autocommitted query per row
+THEME_PARK_BULK_INGEST = os.environ.get("THEME_PARK_BULK_INGEST", "True") == "True"
+# Only record a status row when it differs from the previous one, plus a
+# heartbeat row every THEME_PARK_STATUS_HEARTBEAT_MINUTES while unchanged
+THEME_PARK_DELTA_RECORDING = (
+    os.environ.get("THEME_PARK_DELTA_RECORDING", "True") == "True"
+)
+THEME_PARK_STATUS_HEARTBEAT_MINUTES = int(
+    os.environ.get("THEME_PARK_STATUS_HEARTBEAT_MINUTES", "15")
+)
+
+# HTTP client for the theme park API: timeouts in seconds, retry backoff in
+# seconds, and how many consecutive failed fetches open the circuit breaker
+THEME_PARK_API_CONNECT_TIMEOUT = float(
+    os.environ.get("THEME_PARK_API_CONNECT_TIMEOUT", "5")
+)
+THEME_PARK_API_READ_TIMEOUT = float(os.environ.get("THEME_PARK_API_READ_TIMEOUT", "15"))
+THEME_PARK_API_MAX_RETRIES = int(os.environ.get("THEME_PARK_API_MAX_RETRIES", "2"))
+THEME_PARK_API_BACKOFF_BASE = float(os.environ.get("THEME_PARK_API_BACKOFF_BASE", "1"))
+THEME_PARK_API_BACKOFF_MAX = float(os.environ.get("THEME_PARK_API_BACKOFF_MAX", "8"))
+THEME_PARK_API_BREAKER_THRESHOLD = int(
+    os.environ.get("THEME_PARK_API_BREAKER_THRESHOLD", "5")
+)
+THEME_PARK_API_BREAKER_RESET_TIMEOUT = float(
+    os.environ.get("THEME_PARK_API_BREAKER_RESET_TIMEOUT", "300")
+)
+THEME_PARK_API_POOL_SIZE = int(os.environ.get("THEME_PARK_API_POOL_SIZE", "10"))
+
+# Seconds a cached current-waits or index response may be served before it is
+# rebuilt even without a new ingest (times and upcoming showtimes age)
+THEME_PARK_RESPONSE_CACHE_SECONDS = int(
+    os.environ.get("THEME_PARK_RESPONSE_CACHE_SECONDS", "60")
+)
+
+# Server-sent event stream (ASGI only): how long each ingest's changes stay
+# available for resuming clients, how often each process checks for a new
+# ingest, and how often an idle stream gets a keepalive comment
+THEME_PARK_EVENT_RETENTION_SECONDS = int(
+    os.environ.get("THEME_PARK_EVENT_RETENTION_SECONDS", "900")
+)
+THEME_PARK_EVENT_POLL_SECONDS = float(
+    os.environ.get("THEME_PARK_EVENT_POLL_SECONDS", "1")
+)
+THEME_PARK_EVENT_KEEPALIVE_SECONDS = float(
+    os.environ.get("THEME_PARK_EVENT_KEEPALIVE_SECONDS", "15")
+)
+
+# Columnar archive of cold status history: `manage.py archive_statuses` moves
+# UTC days older than THEME_PARK_ARCHIVE_AFTER_DAYS out of the status tables
+THEME_PARK_ARCHIVE_DIR = os.environ.get(
+    "THEME_PARK_ARCHIVE_DIR", str(BASE_DIR / "archive")
+)
+THEME_PARK_ARCHIVE_AFTER_DAYS = int(
+    os.environ.get("THEME_PARK_ARCHIVE_AFTER_DAYS", "14")
+)
+
+# Range partitioning of the history tables on PostgreSQL: partition size
+# ("day" or "month"), how many future partitions `manage.py
+# maintain_partitions` keeps ready, and how many days of partitions it keeps
+# (0 keeps everything) before it detaches or drops them
+THEME_PARK_PARTITION_INTERVAL = os.environ.get("THEME_PARK_PARTITION_INTERVAL", "month")
+THEME_PARK_PARTITION_PRECREATE = int(
+    os.environ.get("THEME_PARK_PARTITION_PRECREATE", "2")
+)
+THEME_PARK_PARTITION_RETENTION_DAYS = int(
+    os.environ.get("THEME_PARK_PARTITION_RETENTION_DAYS", "0")
+)
+THEME_PARK_PARTITION_EXPIRED_ACTION = os.environ.get(
+    "THEME_PARK_PARTITION_EXPIRED_ACTION", "detach"
+)
+
+# Tiered compaction of old attraction statuses (`manage.py compact_statuses`,
+# also run daily by the scheduler): raw rows of days older than the first
+# setting become 15-minute summaries, and those older than the second become
+# hourly summaries. 0 turns a tier off.
+THEME_PARK_COMPACT_RAW_AFTER_DAYS = int(
+    os.environ.get("THEME_PARK_COMPACT_RAW_AFTER_DAYS", "0")
+)
+THEME_PARK_COMPACT_QUARTER_HOUR_AFTER_DAYS = int(
+    os.environ.get("THEME_PARK_COMPACT_QUARTER_HOUR_AFTER_DAYS", "0")
+)
+
+# Wait forecasts served by /park/api/forecast/: horizons in hours, days of
+# hourly rollups the weekday-and-hour profiles are trained on, how often they
+# are retrained, and how quickly (in hours) the gap between the current wait
+# and the profile fades out of the forecast
+THEME_PARK_FORECAST_HORIZONS_HOURS = [
+    int(hours)
+    for hours in os.environ.get("THEME_PARK_FORECAST_HORIZONS_HOURS", "1,2,3,4").split(
+        ","
+    )
+    if hours.strip()
+]
+THEME_PARK_FORECAST_TRAINING_DAYS = int(
+    os.environ.get("THEME_PARK_FORECAST_TRAINING_DAYS", "56")
+)
+THEME_PARK_FORECAST_RETRAIN_SECONDS = int(
+    os.environ.get("THEME_PARK_FORECAST_RETRAIN_SECONDS", "3600")
+)
+THEME_PARK_FORECAST_TREND_HOURS = float(
+    os.environ.get("THEME_PARK_FORECAST_TREND_HOURS", "1.5")
+)
+
+# Run the in-process scheduler in the web workers. Set to False when polling
+# is done by a separate `manage.py run_ingestor` process instead
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "True") == "True"
+# Seconds between polls of each park in the standalone ingestor
+THEME_PARK_POLL_INTERVAL_SECONDS = float(
+    os.environ.get("THEME_PARK_POLL_INTERVAL_SECONDS", "60")
+)
+# Adaptive polling: poll at THEME_PARK_POLL_INTERVAL_SECONDS while a park is
+# open (per its operatingHours, widened by the margin), at the fast interval
+# when at least the given share of attractions changed since the last poll,
+# and at the closed interval outside operating hours
+THEME_PARK_ADAPTIVE_POLLING = (
+    os.environ.get("THEME_PARK_ADAPTIVE_POLLING", "True") == "True"
+)
+THEME_PARK_FAST_POLL_INTERVAL_SECONDS = float(
+    os.environ.get("THEME_PARK_FAST_POLL_INTERVAL_SECONDS", "30")
+)
+THEME_PARK_CLOSED_POLL_INTERVAL_SECONDS = float(
+    os.environ.get("THEME_PARK_CLOSED_POLL_INTERVAL_SECONDS", "900")
+)
+THEME_PARK_POLL_HOURS_MARGIN_MINUTES = float(
+    os.environ.get("THEME_PARK_POLL_HOURS_MARGIN_MINUTES", "30")
+)
+THEME_PARK_FAST_POLL_CHANGE_FRACTION = float(
+    os.environ.get("THEME_PARK_FAST_POLL_CHANGE_FRACTION", "0.25")
+)
+# With delta recording an unchanged status is only stored again by a poll
+# made after the heartbeat, so every poll interval has to fit within it
+if THEME_PARK_DELTA_RECORDING:
+    for _name, _interval in (
+        ("THEME_PARK_POLL_INTERVAL_SECONDS", THEME_PARK_POLL_INTERVAL_SECONDS),
+        (
+            "THEME_PARK_CLOSED_POLL_INTERVAL_SECONDS",
+            THEME_PARK_CLOSED_POLL_INTERVAL_SECONDS,
+        ),
+    ):
+        if _interval > THEME_PARK_STATUS_HEARTBEAT_MINUTES * 60:
+            raise ImproperlyConfigured(
+                f"{_name} ({_interval:g} seconds) must not exceed "
+                f"THEME_PARK_STATUS_HEARTBEAT_MINUTES"
+            )
+
+# Scheduler leader election: only the process holding the lock runs the
+# scheduler, and the others retry every SCHEDULER_LEADER_RETRY_SECONDS
+SCHEDULER_LEADER_RETRY_SECONDS = float(
+    os.environ.get("SCHEDULER_LEADER_RETRY_SECONDS", "15")
+)
+# Lock file used when not on PostgreSQL (defaults to one beside the database)
+SCHEDULER_LOCK_FILE = os.environ.get("SCHEDULER_LOCK_FILE")
 
 # Ensure logs directory exists
 LOGS_DIR = os.path.join(BASE_DIR, "logs")
@@ -21,5 +21,6 @@ from django.views.generic import RedirectView
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('park/', include('theme_park_data.urls')),
+    path('scheduler/', include('scheduler.urls')),
     path('', RedirectView.as_view(url='park/', permanent=False)),
 ]
@@ -0,0 +1,191 @@
+import fcntl
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key shared by every process that may run the scheduler
+ADVISORY_LOCK_KEY = zlib.crc32(b"epic_data.scheduler")
+
+
+class AdvisoryLock:
+    """PostgreSQL session-level advisory lock held on a dedicated connection
+
+    The lock lives as long as the connection, so if the leader dies the
+    server drops the lock with its session and another process can take it.
+    """
+
+    backend = "postgres-advisory-lock"
+
+    def __init__(self, key=ADVISORY_LOCK_KEY, alias=DEFAULT_DB_ALIAS):
+        self.key = key
+        self.alias = alias
+        self.connection = None
+
+    def acquire(self):
+        if self.connection is None:
+            # Not Django's per-thread connection: that one may be closed or
+            # recycled at any time, which would silently drop the lock
+            self.connection = connections.create_connection(self.alias)
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", [self.key])
+            acquired = cursor.fetchone()[0]
+        if not acquired:
+            # Followers retry every few seconds; keeping their connection
+            # open in between would cost a server slot per web worker
+            self.release()
+        return acquired
+
+    def is_held(self):
+        """True if this session still holds the lock, as listed in pg_locks"""
+        if self.connection is None:
+            return False
+        try:
+            with self.connection.cursor() as cursor:
+                # A bigint key is listed as its high and low 32 bits
+                cursor.execute(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks"
+                    " WHERE locktype = 'advisory' AND pid = pg_backend_pid()"
+                    " AND granted AND classid::bigint = %s AND objid::bigint = %s"
+                    " AND objsubid = 1)",
+                    [self.key >> 32, self.key & 0xFFFFFFFF],
+                )
+                held = cursor.fetchone()[0]
+        except DatabaseError:
+            held = False
+        if not held:
+            self.release()
+        return held
+
+    def release(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except DatabaseError:
+                pass
+            self.connection = None
+
+
+class FileLock:
+    """Exclusive flock on a file, released by the OS when the holder exits"""
+
+    backend = "file-lock"
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.handle = None
+
+    def acquire(self):
+        handle = open(self.path, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return False
+
+        # Record the holder to make the lock file easier to inspect
+        handle.seek(0)
+        handle.truncate()
+        handle.write(f"{os.getpid()}\n")
+        handle.flush()
+        self.handle = handle
+        return True
+
+    def is_held(self):
+        return self.handle is not None
+
+    def release(self):
+        if self.handle is not None:
+            fcntl.flock(self.handle, fcntl.LOCK_UN)
+            self.handle.close()
+            self.handle = None
+
+
+def default_lock():
+    """Advisory lock on PostgreSQL, otherwise a lock file beside the database"""
+    database = settings.DATABASES[DEFAULT_DB_ALIAS]
+    if database["ENGINE"] == "django.db.backends.postgresql":
+        return AdvisoryLock()
+    if settings.SCHEDULER_LOCK_FILE:
+        return FileLock(settings.SCHEDULER_LOCK_FILE)
+    if database["ENGINE"] == "django.db.backends.sqlite3":
+        return FileLock(f"{database['NAME']}.scheduler.lock")
+    return FileLock(Path(settings.BASE_DIR) / "scheduler.lock")
+
+
+class LeaderElection:
+    """Keep trying to become leader and run a callback while leading
+
+    A background thread tries to take the lock every ``retry_interval``
+    seconds. The process that gets it calls ``on_elected``; if it later
+    finds the lock gone it calls ``on_deposed`` and goes back to waiting.
+    Followers keep retrying, so they take over when the leader dies.
+    """
+
+    def __init__(self, lock, on_elected, on_deposed, retry_interval=None):
+        self.lock = lock
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.retry_interval = retry_interval or settings.SCHEDULER_LEADER_RETRY_SECONDS
+        self.is_leader = False
+        self.leader_since = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="scheduler-leader-election", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Step down and stop campaigning"""
+        self._stop.set()
+        if self.is_leader:
+            self._step_down()
+        self.lock.release()
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "is_leader": self.is_leader,
+            "leader_since": (
+                self.leader_since.isoformat() if self.leader_since else None
+            ),
+            "lock_backend": self.lock.backend,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.is_leader:
+                    if not self.lock.is_held():
+                        logger.warning(
+                            f"Process {os.getpid()} lost scheduler leadership"
+                        )
+                        self._step_down()
+                elif self.lock.acquire():
+                    logger.info(f"Process {os.getpid()} elected scheduler leader")
+                    self.is_leader = True
+                    self.leader_since = datetime.now()
+                    self.on_elected()
+            except Exception as e:
+                logger.error(f"Scheduler leader election failed: {str(e)}")
+                if self.is_leader:
+                    self._step_down()
+                self.lock.release()
+
+            self._stop.wait(self.retry_interval)
+
+    def _step_down(self):
+        self.is_leader = False
+        self.leader_since = None
+        try:
+            self.on_deposed()
+        except Exception as e:
+            logger.error(f"Error stopping scheduler: {str(e)}")
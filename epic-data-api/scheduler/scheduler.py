@@ -1,48 +1,177 @@
+import atexit
 import logging
+import os
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta
 from django.conf import settings
+from django.db import close_old_connections, connection
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 from django_apscheduler.jobstores import DjangoJobStore
 from django.core.management import call_command
 from apscheduler.triggers.cron import CronTrigger
+from theme_park_data.polling import PollingPolicy
+from theme_park_data.services import ThemeParkApiService
+from theme_park_data.telemetry import api_calls
+from .leader import LeaderElection, default_lock
 
 logger = logging.getLogger(__name__)
 
-def fetch_live_data_job():
-    """Job to fetch live data from the API"""
-    logger.info(f"Running fetch_live_data job at {datetime.now()}")
-    call_command('fetch_live_data')
+PARTITION_JOB_ID = "maintain_partitions"
+COMPACTION_JOB_ID = "compact_statuses"
+
+# Leader election for this process and the scheduler it runs while leading
+_election = None
+_scheduler = None
+
+# Warm per-park services and the policy that picks each park's next poll
+_services = {}
+_policy = None
+
+
+def fetch_live_data_job(entity_id):
+    """Job to fetch one park's live data from the API"""
+    logger.info(f"Running fetch_live_data job for {entity_id} at {datetime.now()}")
+    close_old_connections()
+    service = _services.get(entity_id)
+    if service is None:
+        service = _services[entity_id] = ThemeParkApiService(entity_id=entity_id)
+    data = service.fetch_live_data()
+
+    # The cron trigger fires every minute; move the next run to the time the
+    # polling policy picked instead (sooner, or later outside park hours)
+    if _scheduler is not None and _policy is not None and _policy.adaptive:
+        delay = _policy.next_interval(entity_id, data)
+        _scheduler.modify_job(
+            park_job_id(entity_id),
+            next_run_time=datetime.now() + timedelta(seconds=delay),
+        )
+
+
+def maintain_partitions_job():
+    """Job to create upcoming history partitions and expire old ones"""
+    logger.info(f"Running maintain_partitions job at {datetime.now()}")
+    close_old_connections()
+    call_command("maintain_partitions")
+
+
+def compact_statuses_job():
+    """Job to compact old attraction statuses into summaries"""
+    logger.info(f"Running compact_statuses job at {datetime.now()}")
+    close_old_connections()
+    call_command("compact_statuses")
+
+
+def park_job_id(entity_id):
+    return f"fetch_live_data_{entity_id}"
+
+
+def leadership_status():
+    """Whether this process currently runs the scheduler"""
+    if _election is None:
+        return {
+            "pid": os.getpid(),
+            "is_leader": False,
+            "leader_since": None,
+            "lock_backend": None,
+        }
+    return _election.status()
 
 
 def start():
-    """Start the scheduler"""
+    """Campaign for scheduler leadership
+
+    Every web worker calls this, but only the process holding the leader
+    lock runs the scheduler; the others wait to take over if it dies.
+    """
+    global _election
     # Don't run scheduler when running management commands (like migrations)
     if any('manage.py' in arg for arg in sys.argv):
         # Only start scheduler if it's the runserver command
         if 'runserver' not in sys.argv:
             return
 
-    scheduler = BackgroundScheduler()
-    scheduler.add_jobstore(DjangoJobStore(), "default")
-    
-    # Run every minute
-    scheduler.add_job(
-        fetch_live_data_job,
-        trigger=CronTrigger(minute="*"),  # Every minute
-        id="fetch_live_data",
-        max_instances=1,
-        replace_existing=True,
+    if _election is not None or not settings.SCHEDULER_ENABLED:
+        return
+
+    _election = LeaderElection(
+        default_lock(), on_elected=start_scheduler, on_deposed=stop_scheduler
     )
-    
-    # Run once at startup as well
-    scheduler.add_job(
-        fetch_live_data_job,
-        id="fetch_live_data_startup",
-        max_instances=1,
-        replace_existing=True,
-        next_run_time=datetime.now()
+    _election.start()
+    atexit.register(_election.stop)
+
+
+def stop_scheduler():
+    """Shut down the scheduler after losing leadership"""
+    global _scheduler
+    if _scheduler is not None:
+        logger.info("Stopping scheduler...")
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+        # Calls of the current minute are otherwise only written by the next
+        api_calls.flush()
+
+
+def start_scheduler():
+    """Start the scheduler in this process"""
+    global _scheduler, _policy
+    _policy = PollingPolicy()
+    # Each park gets its own job, so a slow park only ever delays itself;
+    # the executor's pool size bounds how many parks are fetched at once
+    scheduler = BackgroundScheduler(
+        executors={
+            "default": ThreadPoolExecutor(settings.THEME_PARK_MAX_CONCURRENT_FETCHES)
+        }
     )
-    
+    scheduler.add_jobstore(DjangoJobStore(), "default")
+
+    # Run every minute, unless the polling policy picks another time, and
+    # once straight away so a new leader does not wait for the next minute
+    for entity_id in settings.THEME_PARK_ENTITY_IDS:
+        scheduler.add_job(
+            fetch_live_data_job,
+            trigger=CronTrigger(minute="*"),  # Every minute
+            args=[entity_id],
+            id=park_job_id(entity_id),
+            max_instances=1,
+            replace_existing=True,
+            next_run_time=datetime.now(),
+        )
+
+    # Keep the partitions of the history tables ahead of the data (PostgreSQL)
+    if connection.vendor == "postgresql":
+        scheduler.add_job(
+            maintain_partitions_job,
+            trigger=CronTrigger(hour=3, minute=30),  # Daily
+            id=PARTITION_JOB_ID,
+            max_instances=1,
+            replace_existing=True,
+        )
+
+    # Replace old raw statuses with summaries, when compaction is configured
+    if (
+        settings.THEME_PARK_COMPACT_RAW_AFTER_DAYS
+        or settings.THEME_PARK_COMPACT_QUARTER_HOUR_AFTER_DAYS
+    ):
+        scheduler.add_job(
+            compact_statuses_job,
+            trigger=CronTrigger(hour=4, minute=0),  # Daily
+            id=COMPACTION_JOB_ID,
+            max_instances=1,
+            replace_existing=True,
+        )
+
     logger.info("Starting scheduler...")
-    scheduler.start() 
\ No newline at end of file
+    # Paused until stale jobs are gone, so none of them runs one last time
+    scheduler.start(paused=True)
+    _scheduler = scheduler
+
+    # Drop jobs persisted for parks that are no longer configured, including
+    # the single "fetch_live_data" job used before parks had their own jobs
+    # and the all-parks startup job
+    wanted = {park_job_id(entity_id) for entity_id in settings.THEME_PARK_ENTITY_IDS}
+    for job in scheduler.get_jobs():
+        if job.id.startswith("fetch_live_data") and job.id not in wanted:
+            logger.info(f"Removing stale job {job.id}")
+            job.remove()
+    scheduler.resume()
@@ -1,3 +1,195 @@
-from django.test import TestCase
+import os
+import tempfile
+import threading
+from unittest import mock, skipUnless
+from django.db import DatabaseError, connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from . import scheduler
+from .leader import AdvisoryLock, FileLock, LeaderElection, default_lock
 
-# Create your tests here.
+
+class FakeLock:
+    """Lock whose availability the test controls"""
+
+    backend = "fake"
+
+    def __init__(self):
+        self.available = True
+        self.held = False
+
+    def acquire(self):
+        self.held = self.available
+        return self.held
+
+    def is_held(self):
+        return self.held and self.available
+
+    def release(self):
+        self.held = False
+
+
+class FileLockTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "scheduler.lock")
+
+    def test_only_one_holder_at_a_time(self):
+        first, second = FileLock(self.path), FileLock(self.path)
+        self.addCleanup(first.release)
+        self.addCleanup(second.release)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertFalse(second.is_held())
+
+        first.release()
+        self.assertTrue(second.acquire())
+        with open(self.path) as f:
+            self.assertEqual(f.read(), f"{os.getpid()}\n")
+
+    def test_default_lock_uses_the_configured_file(self):
+        with override_settings(SCHEDULER_LOCK_FILE=self.path):
+            lock = default_lock()
+        self.assertIsInstance(lock, FileLock)
+        self.assertEqual(str(lock.path), self.path)
+
+
+class AdvisoryLockTests(SimpleTestCase):
+    def setUp(self):
+        self.connection = mock.MagicMock()
+        self.cursor = self.connection.cursor.return_value.__enter__.return_value
+        patcher = mock.patch(
+            "scheduler.leader.connections.create_connection",
+            return_value=self.connection,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.lock = AdvisoryLock(key=2**32 + 5)
+
+    def test_follower_closes_its_connection(self):
+        self.cursor.fetchone.return_value = (False,)
+        self.assertFalse(self.lock.acquire())
+        self.connection.close.assert_called_once_with()
+        self.assertIsNone(self.lock.connection)
+        self.assertFalse(self.lock.is_held())
+
+    def test_is_held_looks_the_key_up_in_pg_locks(self):
+        self.cursor.fetchone.return_value = (True,)
+        self.assertTrue(self.lock.acquire())
+        self.assertTrue(self.lock.is_held())
+        sql, params = self.cursor.execute.call_args.args
+        self.assertIn("pg_locks", sql)
+        self.assertEqual(params, [1, 5])
+
+        self.cursor.fetchone.return_value = (False,)
+        self.assertFalse(self.lock.is_held())
+        self.assertIsNone(self.lock.connection)
+
+    def test_broken_connection_is_not_held(self):
+        self.cursor.fetchone.return_value = (True,)
+        self.lock.acquire()
+        self.cursor.execute.side_effect = DatabaseError
+        self.assertFalse(self.lock.is_held())
+        self.assertIsNone(self.lock.connection)
+
+
+@skipUnless(connection.vendor == "postgresql", "advisory locks need PostgreSQL")
+class AdvisoryLockPostgresTests(TransactionTestCase):
+    def test_only_one_holder_at_a_time(self):
+        first, second = AdvisoryLock(key=4242), AdvisoryLock(key=4242)
+        self.addCleanup(first.release)
+        self.addCleanup(second.release)
+        self.assertTrue(first.acquire())
+        self.assertTrue(first.is_held())
+        self.assertFalse(second.acquire())
+        self.assertIsNone(second.connection)
+
+        first.release()
+        self.assertTrue(second.acquire())
+        self.assertTrue(second.is_held())
+
+
+class LeaderElectionTests(SimpleTestCase):
+    def setUp(self):
+        self.lock = FakeLock()
+        self.elected = threading.Event()
+        self.deposed = threading.Event()
+        self.election = LeaderElection(
+            self.lock,
+            on_elected=self.elected.set,
+            on_deposed=self.deposed.set,
+            retry_interval=0.01,
+        )
+        self.addCleanup(self.election.stop)
+
+    def test_leader_steps_down_when_the_lock_is_lost(self):
+        self.election.start()
+        self.assertTrue(self.elected.wait(5))
+        status = self.election.status()
+        self.assertTrue(status["is_leader"])
+        self.assertEqual(status["lock_backend"], "fake")
+        self.assertIsNotNone(status["leader_since"])
+
+        self.elected.clear()
+        self.lock.available = False
+        self.assertTrue(self.deposed.wait(5))
+        self.assertFalse(self.elected.is_set())
+
+        # Followers keep campaigning and take over once the lock is free
+        self.lock.available = True
+        self.assertTrue(self.elected.wait(5))
+
+    def test_stop_steps_down(self):
+        self.election.start()
+        self.assertTrue(self.elected.wait(5))
+        self.election.stop()
+        self.assertTrue(self.deposed.is_set())
+        self.assertFalse(self.election.status()["is_leader"])
+        self.assertFalse(self.lock.held)
+
+    def test_follower_waits_for_the_lock(self):
+        self.lock.available = False
+        self.election.start()
+        self.assertFalse(self.elected.wait(0.1))
+        self.assertFalse(self.election.status()["is_leader"])
+
+
+@override_settings(
+    THEME_PARK_ENTITY_IDS=["park-a", "park-b"],
+    THEME_PARK_COMPACT_RAW_AFTER_DAYS=0,
+    THEME_PARK_COMPACT_QUARTER_HOUR_AFTER_DAYS=0,
+)
+class StartSchedulerTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(scheduler, "BackgroundScheduler")
+        self.scheduler = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.addCleanup(scheduler.stop_scheduler)
+
+    def test_every_park_is_fetched_at_startup(self):
+        scheduler.start_scheduler()
+        jobs = {
+            call.kwargs["id"]: call.kwargs
+            for call in self.scheduler.add_job.call_args_list
+        }
+        self.assertEqual(
+            list(jobs), ["fetch_live_data_park-a", "fetch_live_data_park-b"]
+        )
+        for job in jobs.values():
+            self.assertIsNotNone(job["next_run_time"])
+        self.scheduler.start.assert_called_once_with(paused=True)
+        self.scheduler.resume.assert_called_once_with()
+
+    def test_stale_jobs_are_removed_before_anything_runs(self):
+        stale = mock.Mock(id="fetch_live_data_startup")
+        current = mock.Mock(id="fetch_live_data_park-a")
+        self.scheduler.get_jobs.return_value = [stale, current]
+        self.scheduler.resume.side_effect = lambda: self.assertTrue(stale.remove.called)
+        scheduler.start_scheduler()
+        stale.remove.assert_called_once_with()
+        current.remove.assert_not_called()
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = "scheduler"
+
+urlpatterns = [
+    path("leader/", views.leader_status, name="leader_status"),
+]
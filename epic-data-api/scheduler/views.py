@@ -1,3 +1,7 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from . import scheduler
 
-# Create your views here.
+
+def leader_status(request):
+    """Whether the worker serving this request runs the scheduler"""
+    return JsonResponse(scheduler.leadership_status())
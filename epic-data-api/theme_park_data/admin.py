@@ -1,7 +1,9 @@
 from django.contrib import admin
 from .models import (
     Park, Attraction, Show, AttractionStatus, ShowStatus, 
-    Showtime, OperatingHours, ApiLog
+    AttractionCurrentStatus, ShowCurrentStatus, Showtime, OperatingHours,
+    AttractionWaitRollup, AttractionStatusSummary, StatusTransition, ApiLog,
+    ApiCallMinute, RawPayload
 )
 
 @admin.register(Park)
@@ -24,23 +26,13 @@ class ShowAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
-class OperatingHoursInline(admin.TabularInline):
-    model = OperatingHours
-    extra = 0
-
-
 @admin.register(AttractionStatus)
 class AttractionStatusAdmin(admin.ModelAdmin):
     list_display = ('attraction', 'status', 'standby_wait_time', 'single_rider_wait_time', 'timestamp', 'last_updated')
     list_filter = ('status', 'attraction', 'timestamp')
     search_fields = ('attraction__name',)
     date_hierarchy = 'timestamp'
-    inlines = [OperatingHoursInline]
-
-
-class ShowtimeInline(admin.TabularInline):
-    model = Showtime
-    extra = 0
+    raw_id_fields = ('payload', 'schedule_payload')
 
 
 @admin.register(ShowStatus)
@@ -49,26 +41,82 @@ class ShowStatusAdmin(admin.ModelAdmin):
     list_filter = ('status', 'show', 'timestamp')
     search_fields = ('show__name',)
     date_hierarchy = 'timestamp'
-    inlines = [ShowtimeInline]
+    raw_id_fields = ('payload', 'schedule_payload')
+
+
+@admin.register(AttractionCurrentStatus)
+class AttractionCurrentStatusAdmin(admin.ModelAdmin):
+    list_display = ('attraction', 'park', 'status', 'standby_wait_time', 'single_rider_wait_time', 'timestamp')
+    list_filter = ('park', 'status', 'reports_wait_times')
+    search_fields = ('attraction__name',)
+
+
+@admin.register(ShowCurrentStatus)
+class ShowCurrentStatusAdmin(admin.ModelAdmin):
+    list_display = ('show', 'park', 'status', 'timestamp')
+    list_filter = ('park', 'status')
+    search_fields = ('show__name',)
+    raw_id_fields = ('show_status',)
 
 
 @admin.register(Showtime)
 class ShowtimeAdmin(admin.ModelAdmin):
-    list_display = ('show_status', 'type', 'start_time', 'end_time')
-    list_filter = ('show_status__show', 'type')
+    list_display = ('show', 'type', 'start_time', 'end_time', 'last_seen')
+    list_filter = ('show__park', 'type')
+    search_fields = ('show__name',)
     date_hierarchy = 'start_time'
 
 
 @admin.register(OperatingHours)
 class OperatingHoursAdmin(admin.ModelAdmin):
-    list_display = ('attraction_status', 'type', 'start_time', 'end_time')
-    list_filter = ('attraction_status__attraction', 'type')
+    list_display = ('attraction', 'type', 'start_time', 'end_time', 'last_seen')
+    list_filter = ('attraction__park', 'type')
+    search_fields = ('attraction__name',)
     date_hierarchy = 'start_time'
 
 
+@admin.register(AttractionWaitRollup)
+class AttractionWaitRollupAdmin(admin.ModelAdmin):
+    list_display = ('attraction', 'local_date', 'hour', 'sample_count', 'min_wait', 'max_wait')
+    list_filter = ('attraction__park', 'weekday', 'hour')
+    search_fields = ('attraction__name',)
+    date_hierarchy = 'local_date'
+
+
+@admin.register(AttractionStatusSummary)
+class AttractionStatusSummaryAdmin(admin.ModelAdmin):
+    list_display = ('attraction', 'bucket_start', 'resolution', 'sample_count', 'standby_min', 'standby_max')
+    list_filter = ('attraction__park', 'resolution')
+    search_fields = ('attraction__name',)
+    date_hierarchy = 'bucket_start'
+
+
+@admin.register(StatusTransition)
+class StatusTransitionAdmin(admin.ModelAdmin):
+    list_display = ('attraction', 'from_status', 'to_status', 'started', 'ended')
+    list_filter = ('park', 'from_status', 'to_status')
+    search_fields = ('attraction__name',)
+    date_hierarchy = 'ended'
+
+
+@admin.register(RawPayload)
+class RawPayloadAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'created_at')
+    search_fields = ('digest',)
+    date_hierarchy = 'created_at'
+
+
 @admin.register(ApiLog)
 class ApiLogAdmin(admin.ModelAdmin):
     list_display = ('endpoint', 'timestamp', 'status_code', 'response_time', 'success')
     list_filter = ('success', 'endpoint')
     search_fields = ('endpoint', 'error_message')
     date_hierarchy = 'timestamp'
+
+
+@admin.register(ApiCallMinute)
+class ApiCallMinuteAdmin(admin.ModelAdmin):
+    list_display = ('endpoint', 'minute', 'call_count', 'error_count', 'average_latency', 'latency_max')
+    list_filter = ('endpoint',)
+    search_fields = ('endpoint',)
+    date_hierarchy = 'minute'
@@ -0,0 +1,282 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying; anything else is returned to the caller as is
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that keeps failing"""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures, then probe it again
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    rejects calls for ``reset_timeout`` seconds. The first call after that is
+    let through as a probe: success closes the breaker, failure reopens it.
+    Calls are also rejected while the upstream has asked to be left alone,
+    see hold().
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.held_until = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_call(self):
+        """Raise CircuitOpenError if calls are currently being rejected"""
+        with self._lock:
+            if self.held_until is not None:
+                remaining = self.held_until - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"Upstream asked to retry after {remaining:.0f}s"
+                    )
+                self.held_until = None
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"Circuit open after {self.failures} failures, "
+                    f"retrying in {remaining:.0f}s"
+                )
+            # Let this call through as a probe; a failure reopens the circuit
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def hold(self, seconds):
+        """Reject calls for the next ``seconds``, as asked by a Retry-After"""
+        with self._lock:
+            until = time.monotonic() + seconds
+            self.held_until = max(self.held_until or until, until)
+
+
+def retry_after(response):
+    """Seconds a 429 or 503 response asks to wait before retrying, or None
+
+    Retry-After is either a number of seconds or an HTTP date.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class FetchResult:
+    """Outcome of a successful fetch"""
+
+    def __init__(self, status_code, data, digest, unchanged, attempts):
+        self.status_code = status_code
+        self.data = data
+        self.digest = digest
+        # True for a 304 or a body identical to the previous response
+        self.unchanged = unchanged
+        self.attempts = attempts
+
+
+class ApiClient:
+    """Pooled HTTP client for the theme park API
+
+    One session is kept for the life of the process so connections and TLS
+    sessions are reused between polls. Every request is bounded by connect
+    and read timeouts, transient failures are retried with jittered
+    exponential backoff, and a circuit breaker per URL stops hammering a
+    park whose feed is down without blocking the others. A 429 or 503 with
+    Retry-After is retried after the time it asks for; if that is longer
+    than the backoff allows, the URL is not called again until it has
+    passed. ETag and Last-Modified validators from each response are sent
+    back on the next request for the same URL.
+    """
+
+    def __init__(
+        self,
+        connect_timeout=None,
+        read_timeout=None,
+        max_retries=None,
+        backoff_base=None,
+        backoff_max=None,
+        breaker_threshold=None,
+        breaker_reset_timeout=None,
+        pool_size=None,
+    ):
+        self.timeout = (
+            connect_timeout or settings.THEME_PARK_API_CONNECT_TIMEOUT,
+            read_timeout or settings.THEME_PARK_API_READ_TIMEOUT,
+        )
+        self.max_retries = (
+            settings.THEME_PARK_API_MAX_RETRIES if max_retries is None else max_retries
+        )
+        self.backoff_base = backoff_base or settings.THEME_PARK_API_BACKOFF_BASE
+        self.backoff_max = backoff_max or settings.THEME_PARK_API_BACKOFF_MAX
+        self.breaker_threshold = (
+            breaker_threshold or settings.THEME_PARK_API_BREAKER_THRESHOLD
+        )
+        self.breaker_reset_timeout = (
+            breaker_reset_timeout or settings.THEME_PARK_API_BREAKER_RESET_TIMEOUT
+        )
+
+        pool_size = pool_size or settings.THEME_PARK_API_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Validators and body digest of the last good response, keyed by URL
+        self._cache = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker_for(self, url):
+        """The circuit breaker of one URL, created on first use"""
+        with self._lock:
+            breaker = self._breakers.get(url)
+            if breaker is None:
+                breaker = self._breakers[url] = CircuitBreaker(
+                    self.breaker_threshold, self.breaker_reset_timeout
+                )
+            return breaker
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff delay for a retry attempt"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _conditional_headers(self, url):
+        with self._lock:
+            cached = self._cache.get(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def get_json(self, url):
+        """GET a JSON document, returning a FetchResult
+
+        Raises CircuitOpenError while the URL's breaker is open or a
+        Retry-After is pending, requests' exceptions when every attempt
+        failed, requests.HTTPError for non-retryable error responses, and
+        ValueError for a body that is not JSON.
+        """
+        breaker = self.breaker_for(url)
+        breaker.before_call()
+        headers = self._conditional_headers(url)
+
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+                if response.status_code in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                break
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.HTTPError,
+            ) as e:
+                wait = None if e.response is None else retry_after(e.response)
+                if wait is not None and (
+                    attempt >= self.max_retries or wait > self.backoff_max
+                ):
+                    # The upstream is up but asked for a pause: respect it
+                    # instead of counting it as a failure
+                    breaker.hold(wait)
+                    raise
+                if attempt >= self.max_retries:
+                    breaker.record_failure()
+                    raise
+                delay = self._backoff(attempt) if wait is None else wait
+                attempt += 1
+                logger.warning(
+                    f"Request to {url} failed ({str(e)}), "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+
+        if response.status_code == 304:
+            breaker.record_success()
+            with self._lock:
+                cached = self._cache.get(url)
+            if cached is None:
+                raise requests.HTTPError("304 Not Modified without a cached body")
+            return FetchResult(304, cached["data"], cached["digest"], True, attempt + 1)
+
+        if response.status_code != 200:
+            # A client error such as 404 means the upstream is reachable, so
+            # it does not count towards opening the breaker
+            breaker.record_success()
+            raise requests.HTTPError(
+                f"API returned status code {response.status_code}", response=response
+            )
+
+        try:
+            data = response.json()
+        except ValueError:
+            # A truncated or garbled body is as bad as no response
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        digest = hashlib.sha256(response.content).hexdigest()
+        with self._lock:
+            previous = self._cache.get(url)
+            self._cache[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "digest": digest,
+                "data": data,
+            }
+        unchanged = previous is not None and previous["digest"] == digest
+        return FetchResult(200, data, digest, unchanged, attempt + 1)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """Process-wide ApiClient, created on first use"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = ApiClient()
+        return _default_client
@@ -0,0 +1,313 @@
+import json
+import logging
+import os
+import shutil
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from pathlib import Path
+import numpy as np
+from django.conf import settings
+from .models import AttractionStatus, ShowStatus
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Stand-ins for NULL in the integer columns
+NULL_WAIT = -1
+NULL_INDEX = -1
+NULL_TIME = np.iinfo(np.int64).min
+
+# Archive kind -> status model, entity column and the park lookup from it
+ARCHIVE_KINDS = {
+    "attractions": (AttractionStatus, "attraction_id", "attraction__park_id"),
+    "shows": (ShowStatus, "show_id", "show__park_id"),
+}
+
+# Columns read from the database for each kind, in this order
+BASE_COLUMNS = [
+    "id",
+    "timestamp",
+    "status",
+    "last_updated",
+    "payload_id",
+    "schedule_payload_id",
+]
+WAIT_COLUMNS = ["standby_wait_time", "single_rider_wait_time"]
+
+
+def archive_root():
+    return Path(settings.THEME_PARK_ARCHIVE_DIR)
+
+
+def day_path(kind, park_id, day):
+    return archive_root() / kind / str(park_id) / day.isoformat()
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _micros(value):
+    if value is None:
+        return NULL_TIME
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _datetime(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def source_columns(kind):
+    """Database columns an archive of ``kind`` is built from"""
+    model, entity_column, park_lookup = ARCHIVE_KINDS[kind]
+    columns = [entity_column, *BASE_COLUMNS]
+    if kind == "attractions":
+        columns += WAIT_COLUMNS
+    return columns
+
+
+class ArchiveDay:
+    """One park's statuses of one kind for one UTC day, stored by column
+
+    Each column is a ``.npy`` array opened memory-mapped, so a read only
+    touches the pages it needs. Rows are sorted by entity and then by time:
+    an entity's rows are found by binary search on the entity column and a
+    time range by binary search on the timestamps within them. Entity ids,
+    status names and payload digests are stored once in ``meta.json`` and
+    referenced by index.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.date = date.fromisoformat(self.meta["date"])
+        self._entity_index = {
+            entity_id: index for index, entity_id in enumerate(self.meta["entities"])
+        }
+        self._columns = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def column(self, name):
+        if name not in self._columns:
+            self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return self._columns[name]
+
+    def rows_for(self, entity_id, start=None, end=None):
+        """Row slice of an entity between start and end (datetimes)"""
+        index = self._entity_index.get(str(entity_id))
+        if index is None:
+            return slice(0, 0)
+        entities = self.column("entity")
+        low = int(np.searchsorted(entities, index, side="left"))
+        high = int(np.searchsorted(entities, index, side="right"))
+        timestamps = self.column("timestamp")[low:high]
+        first, last = 0, len(timestamps)
+        if start is not None:
+            first = int(np.searchsorted(timestamps, _micros(start), side="left"))
+        if end is not None:
+            last = int(np.searchsorted(timestamps, _micros(end), side="left"))
+        return slice(low + first, low + max(first, last))
+
+    def statuses(self, rows):
+        names = np.asarray(self.meta["statuses"], dtype=object)
+        return names[self.column("status")[rows]]
+
+    def waits(self, name, rows):
+        values = np.asarray(self.column(name)[rows], dtype=float)
+        values[values == NULL_WAIT] = np.nan
+        return values
+
+    def records(self):
+        """Every row as a tuple of ``source_columns`` values, for rewriting"""
+        kind = self.meta["kind"]
+        entities = self.meta["entities"]
+        statuses = self.meta["statuses"]
+        payloads = self.meta["payloads"]
+        columns = [
+            self.column(name)
+            for name in (
+                "entity",
+                "id",
+                "timestamp",
+                "status",
+                "last_updated",
+                "payload",
+                "schedule_payload",
+            )
+        ]
+        if kind == "attractions":
+            columns += [self.column("standby_wait_time")]
+            columns += [self.column("single_rider_wait_time")]
+        for values in zip(*(column.tolist() for column in columns)):
+            entity, pk, timestamp, status, last_updated, payload, schedule = values[:7]
+            record = [
+                entities[entity],
+                pk,
+                _datetime(timestamp),
+                statuses[status],
+                None if last_updated == NULL_TIME else _datetime(last_updated),
+                None if payload == NULL_INDEX else payloads[payload],
+                None if schedule == NULL_INDEX else payloads[schedule],
+            ]
+            record += [None if wait == NULL_WAIT else wait for wait in values[7:]]
+            yield tuple(record)
+
+
+def write_day(kind, park_id, day, records):
+    """Write (or rewrite) the archive of one park, kind and day
+
+    ``records`` are tuples of ``source_columns(kind)`` values; rows already
+    in the archive are kept and rows with the same primary key are written
+    once, so archiving the same day twice is harmless. The new files are
+    written beside the old ones and swapped in with renames.
+    """
+    path = day_path(kind, park_id, day)
+    by_pk = {}
+    if (path / "meta.json").exists():
+        for record in ArchiveDay(path).records():
+            by_pk[record[1]] = record
+    for record in records:
+        record = (str(record[0]), *record[1:])
+        by_pk[record[1]] = record
+    rows = sorted(by_pk.values(), key=lambda record: (record[0], record[2]))
+
+    entities = sorted({record[0] for record in rows})
+    statuses = sorted({record[3] for record in rows})
+    payloads = sorted(
+        {digest for record in rows for digest in record[5:7] if digest is not None}
+    )
+    entity_index = {entity_id: index for index, entity_id in enumerate(entities)}
+    status_index = {status: index for index, status in enumerate(statuses)}
+    payload_index = {digest: index for index, digest in enumerate(payloads)}
+
+    columns = {
+        "entity": np.array([entity_index[r[0]] for r in rows], dtype=np.int32),
+        "id": np.array([r[1] for r in rows], dtype=np.int64),
+        "timestamp": np.array([_micros(r[2]) for r in rows], dtype=np.int64),
+        "status": np.array([status_index[r[3]] for r in rows], dtype=np.int16),
+        "last_updated": np.array([_micros(r[4]) for r in rows], dtype=np.int64),
+        "payload": np.array(
+            [payload_index.get(r[5], NULL_INDEX) for r in rows], dtype=np.int32
+        ),
+        "schedule_payload": np.array(
+            [payload_index.get(r[6], NULL_INDEX) for r in rows], dtype=np.int32
+        ),
+    }
+    if kind == "attractions":
+        for offset, name in enumerate(WAIT_COLUMNS, start=7):
+            columns[name] = np.array(
+                [NULL_WAIT if r[offset] is None else r[offset] for r in rows],
+                dtype=np.int32,
+            )
+
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+    for name, values in columns.items():
+        with open(tmp_path / f"{name}.npy", "wb") as f:
+            np.save(f, values)
+            f.flush()
+            os.fsync(f.fileno())
+    with open(tmp_path / "meta.json", "w") as f:
+        json.dump(
+            {
+                "version": FORMAT_VERSION,
+                "kind": kind,
+                "park_id": str(park_id),
+                "date": day.isoformat(),
+                "rows": len(rows),
+                "entities": entities,
+                "statuses": statuses,
+                "payloads": payloads,
+            },
+            f,
+        )
+        f.flush()
+        os.fsync(f.fileno())
+
+    old_path = path.with_name(f"{path.name}.old-{os.getpid()}")
+    if path.exists():
+        path.rename(old_path)
+    tmp_path.rename(path)
+    if old_path.exists():
+        shutil.rmtree(old_path)
+    return len(rows)
+
+
+def archived_days(kind, park_id, start=None, end=None):
+    """ArchiveDays of a park overlapping start..end, oldest first"""
+    park_dir = archive_root() / kind / str(park_id)
+    if not park_dir.is_dir():
+        return []
+    first = start.astimezone(dt_timezone.utc).date() if start else date.min
+    last = end.astimezone(dt_timezone.utc).date() if end else date.max
+    days = []
+    for entry in sorted(os.listdir(park_dir)):
+        try:
+            day = date.fromisoformat(entry)
+        except ValueError:
+            # Temporary directories of an interrupted write
+            continue
+        if first <= day <= last:
+            days.append(ArchiveDay(park_dir / entry))
+    return days
+
+
+def read_attraction_history(attraction_id, park_id, start=None, end=None):
+    """An attraction's statuses from start up to end, archived and live
+
+    Archived days are read memory-mapped and rows still in the status table
+    are appended, so callers see one series whatever has been archived.
+    Returns ``(timestamps, statuses, standby_waits, single_rider_waits)``
+    arrays in time order: epoch seconds, status names, and waits in minutes
+    with NaN where no wait was reported.
+    """
+    parts = []
+    for day in archived_days("attractions", park_id, start, end):
+        rows = day.rows_for(attraction_id, start, end)
+        if rows.stop <= rows.start:
+            continue
+        parts.append(
+            (
+                np.asarray(day.column("timestamp")[rows], dtype=float) / 1_000_000,
+                day.statuses(rows),
+                day.waits("standby_wait_time", rows),
+                day.waits("single_rider_wait_time", rows),
+            )
+        )
+
+    live = AttractionStatus.objects.filter(attraction_id=attraction_id)
+    if start is not None:
+        live = live.filter(timestamp__gte=start)
+    if end is not None:
+        live = live.filter(timestamp__lt=end)
+    rows = list(
+        live.order_by("timestamp").values_list("timestamp", "status", *WAIT_COLUMNS)
+    )
+    if rows:
+        timestamps, statuses, standby, single_rider = zip(*rows)
+        parts.append(
+            (
+                np.fromiter((t.timestamp() for t in timestamps), float, len(rows)),
+                np.asarray(statuses, dtype=object),
+                np.array(standby, dtype=float),
+                np.array(single_rider, dtype=float),
+            )
+        )
+
+    if not parts:
+        return np.empty(0), np.empty(0, dtype=object), np.empty(0), np.empty(0)
+    columns = [np.concatenate(column) for column in zip(*parts)]
+    if np.any(np.diff(columns[0]) < 0):
+        order = np.argsort(columns[0], kind="stable")
+        columns = [column[order] for column in columns]
+    return tuple(columns)
+
+
+def archive_cutoff(older_than_days, now):
+    """Start of the oldest UTC day that is kept in the status tables"""
+    day = (now - timedelta(days=older_than_days)).astimezone(dt_timezone.utc).date()
+    return datetime.combine(day, time.min, dt_timezone.utc)
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from .models import IngestGeneration
+
+logger = logging.getLogger(__name__)
+
+# Copy of the IngestGeneration counter, part of every cached response key
+GENERATION_KEY = "theme_park_data:ingest_generation"
+
+# Primary key of the single IngestGeneration row
+GENERATION_ROW = 1
+
+
+def _stored_generation():
+    """The counter row's value, creating the row if there is none"""
+    generation, created = IngestGeneration.objects.get_or_create(
+        pk=GENERATION_ROW,
+        # Start from the clock rather than zero so a new counter never
+        # reuses a generation whose responses clients may still hold
+        defaults={"value": int(time.time() * 1000)},
+    )
+    return generation.value
+
+
+def current_generation():
+    """Current ingest generation, read from the database on a cache miss"""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = _stored_generation()
+        # add, not set: a bump may have stored a newer value meanwhile
+        cache.add(GENERATION_KEY, generation, timeout=None)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def bump_generation(before_visible=None):
+    """Invalidate every cached response after new data has been ingested
+
+    The counter is incremented in the database, so concurrent ingests always
+    get distinct generations. The cache copy is written while the row is
+    still locked, so it only ever moves forward. ``before_visible`` is
+    called with the new generation before the copy is written.
+    """
+    try:
+        with transaction.atomic():
+            _stored_generation()
+            IngestGeneration.objects.filter(pk=GENERATION_ROW).update(
+                value=F("value") + 1
+            )
+            generation = IngestGeneration.objects.get(pk=GENERATION_ROW).value
+            if before_visible is not None:
+                before_visible(generation)
+            cache.set(GENERATION_KEY, generation, timeout=None)
+        return generation
+    except Exception as e:
+        # Cached responses still expire after THEME_PARK_RESPONSE_CACHE_SECONDS
+        logger.error(f"Could not invalidate response cache: {str(e)}")
+        return None
+
+
+def _not_modified(request, etag):
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return "*" in etags or etag in etags
+
+
+def _finish(request, content, content_type, etag):
+    if _not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response["ETag"] = etag
+    # Clients may keep the response but must revalidate it before reuse
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cache_per_generation(prefix):
+    """Serve a GET view from the cache until the next ingest
+
+    Responses are cached under the view, its query string and the current
+    ingest generation, so a hit costs two cache reads and no database
+    queries. Each response carries a strong ETag computed from its body, and
+    requests whose If-None-Match matches it get a 304 without a body.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+
+            query = hashlib.sha256(
+                "&".join(sorted(request.GET.urlencode().split("&"))).encode()
+            ).hexdigest()
+            key = f"theme_park_data:{prefix}:{current_generation()}:{query}"
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type, etag = cached
+                return _finish(request, content, content_type, etag)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+
+            etag = quote_etag(hashlib.sha256(response.content).hexdigest())
+            cache.set(
+                key,
+                (response.content, response["Content-Type"], etag),
+                settings.THEME_PARK_RESPONSE_CACHE_SECONDS,
+            )
+            return _finish(request, response.content, response["Content-Type"], etag)
+
+        return wrapper
+
+    return decorator
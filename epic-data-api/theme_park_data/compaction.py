@@ -0,0 +1,326 @@
+import logging
+import math
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+import numpy as np
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from .archive import EPOCH, read_attraction_history
+from .models import AttractionStatus, AttractionStatusSummary
+from .rollups import status_validity
+
+logger = logging.getLogger(__name__)
+
+QUARTER_HOUR = AttractionStatusSummary.RESOLUTION_QUARTER_HOUR
+HOUR = AttractionStatusSummary.RESOLUTION_HOUR
+
+# Tier name -> bucket length in seconds, finest first
+SUMMARY_TIERS = {"15min": QUARTER_HOUR, "hourly": HOUR}
+
+OPERATING = "OPERATING"
+
+WAIT_PREFIXES = ("standby", "single_rider")
+
+SUMMARY_FIELDS = [
+    "sample_count",
+    "covered_seconds",
+    "operating_seconds",
+    "standby_seconds",
+    "standby_sum",
+    "standby_min",
+    "standby_max",
+    "single_rider_seconds",
+    "single_rider_sum",
+    "single_rider_min",
+    "single_rider_max",
+    "last_timestamp",
+    "last_status",
+    "last_standby_wait_time",
+    "last_single_rider_wait_time",
+]
+
+
+def tier_name(resolution):
+    for name, seconds in SUMMARY_TIERS.items():
+        if seconds == resolution:
+            return name
+    return "raw"
+
+
+def _epoch(moment):
+    return (moment - EPOCH).total_seconds()
+
+
+def _moment(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+
+def _day_bounds(day):
+    start = datetime.combine(day, time.min, dt_timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _empty_bucket():
+    bucket = dict.fromkeys(SUMMARY_FIELDS)
+    bucket["sample_count"] = 0
+    for field in SUMMARY_FIELDS:
+        if field.endswith(("_seconds", "_sum")):
+            bucket[field] = 0.0
+    return bucket
+
+
+def _add_wait(bucket, prefix, wait_time, seconds):
+    if wait_time is None:
+        return
+    bucket[f"{prefix}_seconds"] += seconds
+    bucket[f"{prefix}_sum"] += wait_time * seconds
+    low, high = bucket[f"{prefix}_min"], bucket[f"{prefix}_max"]
+    bucket[f"{prefix}_min"] = wait_time if low is None else min(low, wait_time)
+    bucket[f"{prefix}_max"] = wait_time if high is None else max(high, wait_time)
+
+
+def merge_buckets(target, other):
+    """Add the totals of ``other`` to ``target``; both cover different time"""
+    for field in SUMMARY_FIELDS:
+        if field.endswith(("_seconds", "_sum")) or field == "sample_count":
+            target[field] += other[field]
+    for prefix in WAIT_PREFIXES:
+        for field, pick in ((f"{prefix}_min", min), (f"{prefix}_max", max)):
+            if other[field] is not None:
+                current = target[field]
+                target[field] = (
+                    other[field] if current is None else pick(current, other[field])
+                )
+    if other["last_timestamp"] is not None and (
+        target["last_timestamp"] is None
+        or other["last_timestamp"] > target["last_timestamp"]
+    ):
+        for field in SUMMARY_FIELDS:
+            if field.startswith("last_"):
+                target[field] = other[field]
+    return target
+
+
+def summarize(rows, carry, start, end, resolution):
+    """Buckets of ``resolution`` seconds summarizing statuses in start..end
+
+    ``rows`` are ``(epoch_seconds, status, standby, single_rider)`` tuples in
+    time order with timestamps in the range, ``carry`` the last status before
+    it (or None). Each status holds until the next one, at most the status
+    validity, and never past ``end``; what a status covers beyond ``end`` is
+    counted when the next range is summarized, from its carried status.
+    Returns ``{bucket_start_epoch_seconds: bucket}``.
+    """
+    max_gap = status_validity().total_seconds()
+    start, end = _epoch(start), _epoch(end)
+    states = ([carry] if carry is not None else []) + list(rows)
+    buckets = {}
+    for index, (timestamp, status, standby, single_rider) in enumerate(states):
+        following = states[index + 1][0] if index + 1 < len(states) else math.inf
+        cursor = max(timestamp, start)
+        until = min(following, timestamp + max_gap, end)
+        while cursor < until:
+            bucket_start = cursor - cursor % resolution
+            segment_end = min(bucket_start + resolution, until)
+            seconds = segment_end - cursor
+            bucket = buckets.setdefault(bucket_start, _empty_bucket())
+            bucket["covered_seconds"] += seconds
+            if status == OPERATING:
+                bucket["operating_seconds"] += seconds
+            _add_wait(bucket, "standby", standby, seconds)
+            _add_wait(bucket, "single_rider", single_rider, seconds)
+            cursor = segment_end
+
+        if timestamp >= start:
+            bucket = buckets.setdefault(
+                timestamp - timestamp % resolution, _empty_bucket()
+            )
+            bucket["sample_count"] += 1
+            bucket["last_timestamp"] = _moment(timestamp)
+            bucket["last_status"] = status
+            bucket["last_standby_wait_time"] = standby
+            bucket["last_single_rider_wait_time"] = single_rider
+    return buckets
+
+
+def save_summaries(attraction_id, resolution, buckets):
+    """Merge buckets into the stored summaries of one attraction
+
+    Call inside the transaction that removes the rows they summarize.
+    """
+    if not buckets:
+        return 0
+    existing = AttractionStatusSummary.objects.filter(
+        attraction_id=attraction_id,
+        resolution=resolution,
+        bucket_start__in=[_moment(start) for start in buckets],
+    )
+    for summary in existing:
+        stored = {field: getattr(summary, field) for field in SUMMARY_FIELDS}
+        merge_buckets(buckets[_epoch(summary.bucket_start)], stored)
+
+    AttractionStatusSummary.objects.bulk_create(
+        [
+            AttractionStatusSummary(
+                attraction_id=attraction_id,
+                resolution=resolution,
+                bucket_start=_moment(start),
+                **bucket,
+            )
+            for start, bucket in sorted(buckets.items())
+        ],
+        update_conflicts=True,
+        unique_fields=["attraction", "resolution", "bucket_start"],
+        update_fields=SUMMARY_FIELDS,
+    )
+    return len(buckets)
+
+
+def _carried_status(attraction_id, moment):
+    """Last compacted status before ``moment`` that still applies at it"""
+    max_gap = status_validity()
+    summary = (
+        AttractionStatusSummary.objects.filter(
+            attraction_id=attraction_id,
+            bucket_start__gte=moment - max_gap - timedelta(seconds=HOUR),
+            bucket_start__lt=moment,
+            last_timestamp__gte=moment - max_gap,
+        )
+        .order_by("-last_timestamp")
+        .first()
+    )
+    if summary is None:
+        return None
+    return (
+        _epoch(summary.last_timestamp),
+        summary.last_status,
+        summary.last_standby_wait_time,
+        summary.last_single_rider_wait_time,
+    )
+
+
+def compact_raw_day(attraction_id, park_id, day):
+    """Replace an attraction's raw statuses of one UTC day with summaries
+
+    The 15-minute summaries are written and the raw rows deleted in one
+    transaction, so an interrupted run leaves each day either untouched or
+    fully compacted, and compacting a day again finds nothing left to do.
+    Returns the number of raw rows removed.
+    """
+    start, end = _day_bounds(day)
+    timestamps, statuses, standby, single_rider = read_attraction_history(
+        attraction_id, park_id, start - status_validity(), end
+    )
+    rows = [
+        (
+            timestamp,
+            status,
+            None if math.isnan(standby_wait) else int(standby_wait),
+            None if math.isnan(single_rider_wait) else int(single_rider_wait),
+        )
+        for timestamp, status, standby_wait, single_rider_wait in zip(
+            timestamps.tolist(),
+            statuses.tolist(),
+            standby.tolist(),
+            single_rider.tolist(),
+        )
+    ]
+    day_start = _epoch(start)
+    before = [row for row in rows if row[0] < day_start]
+    rows = [row for row in rows if row[0] >= day_start]
+    if not rows:
+        return 0
+    carry = before[-1] if before else _carried_status(attraction_id, start)
+
+    buckets = summarize(rows, carry, start, end, QUARTER_HOUR)
+    with transaction.atomic():
+        save_summaries(attraction_id, QUARTER_HOUR, buckets)
+        AttractionStatus.objects.filter(
+            attraction_id=attraction_id, timestamp__gte=start, timestamp__lt=end
+        ).delete()
+    return len(rows)
+
+
+def compact_summary_day(attraction_id, day):
+    """Replace an attraction's 15-minute summaries of one UTC day with hours
+
+    Done in one transaction, like ``compact_raw_day``. Returns the number of
+    summaries removed.
+    """
+    start, end = _day_bounds(day)
+    quarters = AttractionStatusSummary.objects.filter(
+        attraction_id=attraction_id,
+        resolution=QUARTER_HOUR,
+        bucket_start__gte=start,
+        bucket_start__lt=end,
+    )
+    with transaction.atomic():
+        hours = {}
+        count = 0
+        for summary in quarters.select_for_update():
+            bucket_start = _epoch(summary.bucket_start)
+            hour = hours.setdefault(bucket_start - bucket_start % HOUR, _empty_bucket())
+            merge_buckets(
+                hour, {field: getattr(summary, field) for field in SUMMARY_FIELDS}
+            )
+            count += 1
+        save_summaries(attraction_id, HOUR, hours)
+        quarters.delete()
+    return count
+
+
+def raw_days(cutoff, attraction_ids=None):
+    """``(attraction_id, park_id, day)`` for raw statuses before ``cutoff``"""
+    statuses = AttractionStatus.objects.filter(timestamp__lt=cutoff)
+    if attraction_ids:
+        statuses = statuses.filter(attraction_id__in=attraction_ids)
+    return (
+        statuses.annotate(day=TruncDate("timestamp", tzinfo=dt_timezone.utc))
+        .values_list("attraction_id", "attraction__park_id", "day")
+        .distinct()
+        .order_by("day", "attraction_id")
+    )
+
+
+def quarter_hour_days(cutoff, attraction_ids=None):
+    """``(attraction_id, day)`` for 15-minute summaries before ``cutoff``"""
+    summaries = AttractionStatusSummary.objects.filter(
+        resolution=QUARTER_HOUR, bucket_start__lt=cutoff
+    )
+    if attraction_ids:
+        summaries = summaries.filter(attraction_id__in=attraction_ids)
+    return (
+        summaries.annotate(day=TruncDate("bucket_start", tzinfo=dt_timezone.utc))
+        .values_list("attraction_id", "day")
+        .distinct()
+        .order_by("day", "attraction_id")
+    )
+
+
+def summary_segments(attraction_id, start, end):
+    """Compacted standby waits overlapping start..end
+
+    Each summary becomes a segment from its bucket start lasting the seconds
+    it has a standby wait for, valued at its average wait. Returns
+    ``(starts, ends, waits, resolutions)`` arrays in time order.
+    """
+    rows = list(
+        AttractionStatusSummary.objects.filter(
+            attraction_id=attraction_id,
+            bucket_start__gte=start - timedelta(seconds=HOUR),
+            bucket_start__lt=end,
+            standby_seconds__gt=0,
+        )
+        .order_by("bucket_start")
+        .values_list("bucket_start", "resolution", "standby_seconds", "standby_sum")
+    )
+    starts = np.array([_epoch(row[0]) for row in rows], dtype=float)
+    resolutions = np.array([row[1] for row in rows], dtype=int)
+    seconds = np.array([row[2] for row in rows], dtype=float)
+    sums = np.array([row[3] for row in rows], dtype=float)
+    overlapping = starts + resolutions > _epoch(start)
+    return (
+        starts[overlapping],
+        (starts + seconds)[overlapping],
+        (sums / np.where(seconds > 0, seconds, 1))[overlapping],
+        resolutions[overlapping],
+    )
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from .cache import bump_generation, current_generation
+
+logger = logging.getLogger(__name__)
+
+# Cache key holding the changes published under one ingest generation
+EVENT_KEY = "theme_park_data:event:{}"
+
+# Events kept in memory by each process for clients resuming a stream
+BUFFER_SIZE = 500
+
+# Frames a client may fall behind by before its stream is closed; it can
+# reconnect with Last-Event-ID and resume from the buffer
+MAX_PENDING = 200
+
+# Largest gap in event ids fetched from the cache before clients are told
+# to reload instead
+MAX_CATCH_UP = 1000
+
+RESET_FRAME = "event: reset\ndata: {{}}\nid: {}\n\n"
+
+
+def attraction_change(status):
+    """Event entry for a newly stored attraction status"""
+    return {
+        "id": str(status.attraction.id),
+        "name": status.attraction.name,
+        "status": status.status,
+        "standby_wait_time": status.standby_wait_time,
+        "single_rider_wait_time": status.single_rider_wait_time,
+        "last_updated": status.last_updated,
+    }
+
+
+def show_change(status):
+    """Event entry for a newly stored show status"""
+    return {
+        "id": str(status.show.id),
+        "name": status.show.name,
+        "status": status.status,
+        "last_updated": status.last_updated,
+    }
+
+
+def publish_changes(park_id, changes):
+    """Start a new ingest generation and record what changed in it
+
+    Called once an ingest has committed. Bumping the generation invalidates
+    cached responses. The changes are kept in the cache under the new
+    generation, which is also their event id, for
+    THEME_PARK_EVENT_RETENTION_SECONDS. Each generation is unique, and its
+    event is stored before streams can see the generation.
+    """
+    event = {
+        "park_id": str(park_id),
+        "timestamp": timezone.now(),
+        "attractions": changes.get("attractions", []),
+        "shows": changes.get("shows", []),
+    }
+
+    def store(generation):
+        try:
+            # add, so an event is never replaced by another park's
+            if not cache.add(
+                EVENT_KEY.format(generation),
+                json.dumps(event, cls=DjangoJSONEncoder),
+                settings.THEME_PARK_EVENT_RETENTION_SECONDS,
+            ):
+                logger.error(f"Ingest event {generation} already exists")
+        except Exception as e:
+            logger.error(f"Could not publish ingest changes: {str(e)}")
+
+    return bump_generation(store)
+
+
+class Subscriber:
+    """One open event stream"""
+
+    def __init__(self, park_id):
+        self.park_id = park_id
+        self.queue = asyncio.Queue()
+        self.dropped = False
+
+    def wants(self, park_id):
+        return self.park_id is None or self.park_id == park_id
+
+    def send(self, frame):
+        if self.dropped:
+            return
+        if self.queue.qsize() >= MAX_PENDING:
+            # Too slow to keep up: end the stream so the client reconnects
+            self.dropped = True
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(frame)
+
+
+class EventBroadcaster:
+    """Fan ingest changes out to every event stream open in this process
+
+    A single task per process watches the ingest generation in the shared
+    cache and reads each new event once, so the cost of an ingest does not
+    depend on how many clients are connected and no client causes a
+    database query. Each event is formatted once and the same frame is
+    queued to every subscriber that wants its park.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        # (event id, park id, frame) for the most recent events
+        self.buffer = deque(maxlen=BUFFER_SIZE)
+        self.last_id = None
+        # Every event after this id is still in the buffer
+        self.covered_from = None
+        self._task = None
+        self._missing_since = None
+
+    async def subscribe(self, park_id=None, last_event_id=None):
+        """Open a stream, replaying events after ``last_event_id`` if given"""
+        await self._ensure_started()
+        subscriber = Subscriber(park_id)
+
+        if last_event_id is not None:
+            if last_event_id < self.covered_from:
+                await self._catch_up(subscriber, last_event_id)
+            elif last_event_id > self.last_id:
+                # An id from a cache that has since been cleared
+                subscriber.send(RESET_FRAME.format(self.last_id))
+            else:
+                for event_id, event_park_id, frame in self.buffer:
+                    if event_id > last_event_id and subscriber.wants(event_park_id):
+                        subscriber.send(frame)
+
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def _catch_up(self, subscriber, last_event_id):
+        """Replay events older than the buffer from the cache, or reset
+
+        Events keep arriving while the cache is read, so the buffer is copied
+        before waiting and only events delivered since are taken from it
+        afterwards.
+        """
+        # Nothing else runs on the loop until the first await
+        buffered = list(self.buffer)
+        covered_from, last_id = self.covered_from, self.last_id
+        if covered_from - last_event_id > MAX_CATCH_UP:
+            subscriber.send(RESET_FRAME.format(last_id))
+            return
+        ids = range(last_event_id + 1, covered_from + 1)
+        events = await sync_to_async(cache.get_many, thread_sensitive=False)(
+            [EVENT_KEY.format(event_id) for event_id in ids]
+        )
+        if (
+            len(events) < len(ids)
+            or self.covered_from > last_id
+            or self.last_id < last_id
+        ):
+            # Some events have expired, or the buffer was reset or moved on
+            # past the copy meanwhile; the client has to reload
+            subscriber.send(RESET_FRAME.format(self.last_id))
+            return
+        for event_id in ids:
+            park_id, frame = self._frame(event_id, events[EVENT_KEY.format(event_id)])
+            if frame and subscriber.wants(park_id):
+                subscriber.send(frame)
+        delivered = [entry for entry in self.buffer if entry[0] > last_id]
+        for event_id, event_park_id, frame in buffered + delivered:
+            if subscriber.wants(event_park_id):
+                subscriber.send(frame)
+
+    async def _ensure_started(self):
+        if self._task is not None and not self._task.done():
+            return
+        self.last_id = await sync_to_async(current_generation, thread_sensitive=False)()
+        self.covered_from = self.last_id
+        self.buffer.clear()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reading ingest events: {str(e)}")
+            await asyncio.sleep(settings.THEME_PARK_EVENT_POLL_SECONDS)
+
+    async def _poll(self):
+        generation = await sync_to_async(current_generation, thread_sensitive=False)()
+        if generation == self.last_id:
+            return
+        if generation < self.last_id or generation - self.last_id > MAX_CATCH_UP:
+            # The cache was cleared or this process fell far behind
+            self._reset(generation)
+            return
+
+        ids = list(range(self.last_id + 1, generation + 1))
+        events = await sync_to_async(cache.get_many, thread_sensitive=False)(
+            [EVENT_KEY.format(event_id) for event_id in ids]
+        )
+        for event_id in ids:
+            data = events.get(EVENT_KEY.format(event_id))
+            if data is None:
+                # The newest event may be published just after its generation;
+                # give it one more poll before skipping it
+                if event_id == generation and self._missing_since != event_id:
+                    self._missing_since = event_id
+                    return
+                logger.warning(f"Ingest event {event_id} is missing, skipping it")
+            else:
+                self._deliver(event_id, data)
+            self.last_id = event_id
+        self._missing_since = None
+
+    def _frame(self, event_id, data):
+        event = json.loads(data)
+        if not event["attractions"] and not event["shows"]:
+            return event["park_id"], None
+        frame = f"id: {event_id}\nevent: update\ndata: {data}\n\n"
+        return event["park_id"], frame
+
+    def _deliver(self, event_id, data):
+        park_id, frame = self._frame(event_id, data)
+        if frame is None:
+            return
+        if len(self.buffer) == self.buffer.maxlen:
+            self.covered_from = self.buffer[0][0]
+        self.buffer.append((event_id, park_id, frame))
+        for subscriber in list(self.subscribers):
+            if subscriber.wants(park_id):
+                subscriber.send(frame)
+
+    def _reset(self, generation):
+        logger.warning("Ingest event ids jumped, asking event clients to reload")
+        self.last_id = generation
+        self.covered_from = generation
+        self.buffer.clear()
+        frame = RESET_FRAME.format(generation)
+        for subscriber in list(self.subscribers):
+            subscriber.send(frame)
+
+
+broadcaster = EventBroadcaster()
@@ -0,0 +1,147 @@
+import csv
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import AttractionStatus, ShowStatus, ApiLog
+
+# Export name -> (model, exported columns, park filter lookup)
+EXPORTS = {
+    "attraction-statuses": (
+        AttractionStatus,
+        [
+            "id",
+            "timestamp",
+            "attraction_id",
+            "attraction__name",
+            "status",
+            "standby_wait_time",
+            "single_rider_wait_time",
+            "last_updated",
+            "local_date",
+            "local_hour",
+            "local_weekday",
+        ],
+        "attraction__park_id",
+    ),
+    "show-statuses": (
+        ShowStatus,
+        [
+            "id",
+            "timestamp",
+            "show_id",
+            "show__name",
+            "status",
+            "last_updated",
+            "local_date",
+            "local_hour",
+            "local_weekday",
+        ],
+        "show__park_id",
+    ),
+    "api-logs": (
+        ApiLog,
+        [
+            "id",
+            "timestamp",
+            "endpoint",
+            "status_code",
+            "response_time",
+            "success",
+            "error_message",
+        ],
+        None,
+    ),
+}
+
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Rows fetched from the database per round trip
+DEFAULT_CHUNK_SIZE = 2000
+
+# Encoded output is written in pieces of about this many bytes
+WRITE_SIZE = 64 * 1024
+
+
+def export_rows(kind, start, end, park_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Rows of an export between start and end, as (columns, row iterator)
+
+    Rows are read with ``iterator(chunk_size=...)``, which uses a server-side
+    cursor on PostgreSQL, so memory use does not grow with the export.
+    """
+    model, columns, park_lookup = EXPORTS[kind]
+    queryset = model.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if park_id and park_lookup:
+        queryset = queryset.filter(**{park_lookup: park_id})
+    rows = queryset.order_by("pk").values_list(*columns).iterator(chunk_size=chunk_size)
+    return columns, rows
+
+
+class _Echo:
+    """File-like object whose write() returns what was written"""
+
+    def write(self, value):
+        return value
+
+
+def _ndjson_lines(columns, rows):
+    names = [column.replace("__", "_") for column in columns]
+    encode = DjangoJSONEncoder().encode
+    for row in rows:
+        yield encode(dict(zip(names, row))) + "\n"
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column.replace("__", "_") for column in columns])
+    for row in rows:
+        yield writer.writerow(
+            ["" if value is None else _csv_value(value) for value in row]
+        )
+
+
+def _csv_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _batched(lines):
+    """Join text lines into UTF-8 chunks of about WRITE_SIZE bytes"""
+    batch = []
+    size = 0
+    for line in lines:
+        encoded = line.encode()
+        batch.append(encoded)
+        size += len(encoded)
+        if size >= WRITE_SIZE:
+            yield b"".join(batch)
+            batch = []
+            size = 0
+    if batch:
+        yield b"".join(batch)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(kind, start, end, export_format="ndjson", gzip=False, **kwargs):
+    """Encoded export as an iterator of byte chunks"""
+    columns, rows = export_rows(kind, start, end, **kwargs)
+    if export_format == "csv":
+        lines = _csv_lines(columns, rows)
+    else:
+        lines = _ndjson_lines(columns, rows)
+    chunks = _batched(lines)
+    if gzip:
+        chunks = _gzipped(chunks)
+    return chunks
+
+
+def export_filename(kind, start, end, export_format="ndjson", gzip=False):
+    name = f"{kind}-{start:%Y%m%dT%H%M}-{end:%Y%m%dT%H%M}.{export_format}"
+    return f"{name}.gz" if gzip else name
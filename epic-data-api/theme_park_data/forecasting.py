@@ -0,0 +1,239 @@
+import logging
+import time
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from .models import AttractionCurrentStatus, AttractionWaitRollup, Park
+from .rollups import park_timezone
+
+logger = logging.getLogger(__name__)
+
+# Cache keys of a park's trained profiles and of its latest forecasts
+PROFILE_KEY = "theme_park_data:forecast_profiles:{}"
+FORECAST_KEY = "theme_park_data:forecasts:{}"
+
+# Seconds of data a weekday-and-hour cell needs to count as much as the
+# all-weekday profile of the same hour; sparser cells lean on the latter
+PRIOR_SECONDS = 2 * 3600
+
+
+class Profiles:
+    """Expected standby wait by attraction, park-local weekday and hour
+
+    ``expected`` has shape ``(attractions, 7, 24)`` and is NaN where an
+    attraction has never reported a wait at that time.
+    """
+
+    def __init__(self, attraction_ids, expected, trained_at, training_seconds):
+        self.attraction_ids = attraction_ids
+        self.index = {
+            attraction_id: index for index, attraction_id in enumerate(attraction_ids)
+        }
+        self.expected = expected
+        self.trained_at = trained_at
+        self.training_seconds = training_seconds
+
+
+def fit_profiles(attraction_index, weekdays, hours, wait_sums, covered, count):
+    """Weekday-and-hour wait profiles for ``count`` attractions at once
+
+    The inputs are parallel arrays of rollup rows: attraction index, local
+    weekday and hour, time-weighted wait sum and covered seconds. Each
+    weekday-and-hour average is shrunk towards the attraction's average for
+    that hour across all weekdays in proportion to how little data it has.
+    Returns a ``(count, 7, 24)`` array.
+    """
+    cells = (attraction_index * 7 + weekdays) * 24 + hours
+    cell_sums = np.bincount(cells, weights=wait_sums, minlength=count * 168)
+    cell_seconds = np.bincount(cells, weights=covered, minlength=count * 168)
+    cell_sums = cell_sums.reshape(count, 7, 24)
+    cell_seconds = cell_seconds.reshape(count, 7, 24)
+
+    hour_sums = cell_sums.sum(axis=1, keepdims=True)
+    hour_seconds = cell_seconds.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hour_average = hour_sums / hour_seconds
+        cell_average = np.where(cell_seconds > 0, cell_sums / cell_seconds, 0.0)
+    weight = cell_seconds / (cell_seconds + PRIOR_SECONDS)
+    return weight * cell_average + (1 - weight) * hour_average
+
+
+def predict(expected, current_waits, origin, targets, horizons, trend_hours):
+    """Forecast waits for every attraction and horizon in one pass
+
+    ``expected`` is a ``(attractions, 7, 24)`` profile array, ``current_waits``
+    the current standby waits (NaN when unknown), ``origin`` a pair of
+    ``(attractions,)`` weekday and hour index arrays for now and ``targets``
+    a pair of ``(attractions, horizons)`` arrays for each horizon. How far the
+    current wait is from the profile is carried forward, fading with a time
+    constant of ``trend_hours``. Where the profile has no value the current
+    wait is used. Returns a ``(attractions, horizons)`` array, NaN where
+    there is nothing to go on.
+    """
+    rows = np.arange(len(expected))
+    now_expected = expected[rows, origin[0], origin[1]]
+    residual = np.nan_to_num(current_waits - now_expected)
+    target_expected = expected[rows[:, None], targets[0], targets[1]]
+    fade = np.exp(-np.asarray(horizons, dtype=float) / trend_hours)
+    forecast = target_expected + residual[:, None] * fade[None, :]
+    forecast = np.where(np.isnan(target_expected), current_waits[:, None], forecast)
+    return np.clip(forecast, 0, None)
+
+
+def local_indices(moments, timezone_name):
+    """Park-local (weekday, hour) of each of ``moments``"""
+    tz = park_timezone(timezone_name)
+    local = [moment.astimezone(tz) for moment in moments]
+    return (
+        np.array([moment.weekday() for moment in local], dtype=int),
+        np.array([moment.hour for moment in local], dtype=int),
+    )
+
+
+def train_park(park, now=None, before=None):
+    """Fit the profiles of a park's attractions from their hourly rollups
+
+    Uses the rollups of the training window up to ``now``, or only those of
+    park-local days before ``before`` when given (for backtesting).
+    """
+    now = now or timezone.now()
+    started = time.perf_counter()
+    # Rollups are dated in park time
+    first_date = (
+        (now - timedelta(days=settings.THEME_PARK_FORECAST_TRAINING_DAYS))
+        .astimezone(park_timezone(park.timezone))
+        .date()
+    )
+    rows = AttractionWaitRollup.objects.filter(
+        attraction__park=park, local_date__gte=first_date, covered_seconds__gt=0
+    )
+    if before is not None:
+        rows = rows.filter(local_date__lt=before)
+    rows = rows.values_list(
+        "attraction_id", "weekday", "hour", "wait_sum", "covered_seconds"
+    )
+    attraction_ids, weekdays, hours, wait_sums, covered = (
+        zip(*rows) if rows else ((), (), (), (), ())
+    )
+    ids = sorted({str(attraction_id) for attraction_id in attraction_ids})
+    index = {attraction_id: position for position, attraction_id in enumerate(ids)}
+    expected = fit_profiles(
+        np.array([index[str(a)] for a in attraction_ids], dtype=int),
+        np.array(weekdays, dtype=int),
+        np.array(hours, dtype=int),
+        np.array(wait_sums, dtype=float),
+        np.array(covered, dtype=float),
+        len(ids),
+    )
+    return Profiles(ids, expected, now, time.perf_counter() - started)
+
+
+def park_profiles(park, now=None):
+    """A park's cached profiles, retrained once they are older than
+    THEME_PARK_FORECAST_RETRAIN_SECONDS"""
+    profiles = cache.get(PROFILE_KEY.format(park.id))
+    now = now or timezone.now()
+    if profiles is None or (now - profiles.trained_at).total_seconds() >= (
+        settings.THEME_PARK_FORECAST_RETRAIN_SECONDS
+    ):
+        profiles = train_park(park, now)
+        cache.set(PROFILE_KEY.format(park.id), profiles, None)
+    return profiles
+
+
+def forecast_park(park, now=None):
+    """Expected standby waits of a park's attractions at each horizon
+
+    Combines the park's profiles with the current statuses of all of its
+    attractions in one ``predict`` call.
+    """
+    now = now or timezone.now()
+    profiles = park_profiles(park, now)
+    horizons = settings.THEME_PARK_FORECAST_HORIZONS_HOURS
+    currents = {
+        str(current.attraction_id): current
+        for current in AttractionCurrentStatus.objects.filter(
+            park=park, reports_wait_times=True
+        ).select_related("attraction")
+    }
+    ids = [
+        attraction_id
+        for attraction_id in profiles.attraction_ids
+        if attraction_id in currents
+    ]
+
+    result = {
+        "park_id": str(park.id),
+        "generated_at": now,
+        "horizons": horizons,
+        "attractions": [],
+    }
+    if not ids:
+        return result
+
+    rows = np.array([profiles.index[attraction_id] for attraction_id in ids])
+    current_waits = np.array(
+        [
+            (
+                np.nan
+                if currents[attraction_id].standby_wait_time is None
+                else currents[attraction_id].standby_wait_time
+            )
+            for attraction_id in ids
+        ],
+        dtype=float,
+    )
+    # Every attraction shares its park's clock
+    weekday, hour = local_indices([now], park.timezone)
+    targets = local_indices([now + timedelta(hours=h) for h in horizons], park.timezone)
+    forecasts = predict(
+        profiles.expected[rows],
+        current_waits,
+        (np.repeat(weekday, len(ids)), np.repeat(hour, len(ids))),
+        (np.tile(targets[0], (len(ids), 1)), np.tile(targets[1], (len(ids), 1))),
+        horizons,
+        settings.THEME_PARK_FORECAST_TREND_HOURS,
+    )
+
+    for attraction_id, values in zip(ids, forecasts.tolist()):
+        current = currents[attraction_id]
+        result["attractions"].append(
+            {
+                "id": attraction_id,
+                "name": current.attraction.name,
+                "status": current.status,
+                "standby_wait_time": current.standby_wait_time,
+                "forecast": [
+                    {
+                        "hours": h,
+                        "time": now + timedelta(hours=h),
+                        "expected_wait": None if np.isnan(value) else round(value, 1),
+                    }
+                    for h, value in zip(horizons, values)
+                ],
+            }
+        )
+    result["attractions"].sort(key=lambda attraction: attraction["name"])
+    return result
+
+
+def refresh_forecasts(park_id):
+    """Recompute and cache a park's forecasts; called after each ingest"""
+    try:
+        park = Park.objects.get(id=park_id)
+        forecasts = forecast_park(park)
+        cache.set(FORECAST_KEY.format(park.id), forecasts, None)
+        return forecasts
+    except Exception as e:
+        logger.error(f"Could not refresh forecasts for park {park_id}: {str(e)}")
+        return None
+
+
+def cached_forecasts(park):
+    """A park's latest forecasts, computing them if none are cached"""
+    forecasts = cache.get(FORECAST_KEY.format(park.id))
+    if forecasts is None:
+        forecasts = refresh_forecasts(park.id)
+    return forecasts
@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connection
+from .polling import PollingPolicy
+from .services import ThemeParkApiService
+from .telemetry import api_calls
+
+logger = logging.getLogger(__name__)
+
+
+class IngestStats:
+    """Lag and throughput counters for a running Ingestor"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.polls = 0
+        self.failures = 0
+        self.unchanged = 0
+        self.rows_written = 0
+        self.busy_seconds = 0.0
+        self.last_lag = {}
+        self.max_lag = 0.0
+        self.last_success = {}
+        self.intervals = {}
+        self._lock = threading.Lock()
+
+    def record_interval(self, entity_id, interval):
+        with self._lock:
+            self.intervals[entity_id] = interval
+
+    def record(self, entity_id, lag, elapsed, service, data):
+        with self._lock:
+            self.polls += 1
+            self.busy_seconds += elapsed
+            self.last_lag[entity_id] = lag
+            self.max_lag = max(self.max_lag, lag)
+            if data is None:
+                self.failures += 1
+                return
+            self.last_success[entity_id] = time.time()
+            if service.last_fetch_unchanged:
+                self.unchanged += 1
+            elif service.last_ingest_stats:
+                self.rows_written += service.last_ingest_stats["rows_written"]
+
+    def snapshot(self):
+        with self._lock:
+            uptime = time.time() - self.started_at
+            now = time.time()
+            return {
+                "uptime_seconds": round(uptime, 1),
+                "polls": self.polls,
+                "failures": self.failures,
+                "unchanged": self.unchanged,
+                "rows_written": self.rows_written,
+                "polls_per_minute": round(self.polls / uptime * 60, 2) if uptime else 0,
+                "rows_per_second": (
+                    round(self.rows_written / uptime, 2) if uptime else 0
+                ),
+                "busy_seconds": round(self.busy_seconds, 3),
+                "max_lag_seconds": round(self.max_lag, 3),
+                "parks": {
+                    entity_id: {
+                        "lag_seconds": round(lag, 3),
+                        "poll_interval_seconds": self.intervals.get(entity_id),
+                        "seconds_since_success": (
+                            round(now - self.last_success[entity_id], 1)
+                            if entity_id in self.last_success
+                            else None
+                        ),
+                    }
+                    for entity_id, lag in self.last_lag.items()
+                },
+            }
+
+
+class Ingestor:
+    """Long-running poll loop that fetches every park on its own cadence
+
+    One ThemeParkApiService per park is kept for the life of the loop, and
+    worker threads keep their database connections between polls (subject
+    to CONN_MAX_AGE). A park's next poll is only scheduled once its current
+    one finishes, using the interval chosen by the PollingPolicy, so a slow
+    park never queues up polls or delays the others. Lag is how late a poll
+    started compared to when it was due.
+    """
+
+    def __init__(self, entity_ids=None, interval=None, max_workers=None, policy=None):
+        entity_ids = entity_ids or settings.THEME_PARK_ENTITY_IDS
+        self.policy = policy or PollingPolicy(base_interval=interval)
+        self.services = {
+            entity_id: ThemeParkApiService(entity_id=entity_id)
+            for entity_id in entity_ids
+        }
+        self.stats = IngestStats()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.THEME_PARK_MAX_CONCURRENT_FETCHES,
+            thread_name_prefix="ingestor",
+        )
+        self._next_due = {entity_id: time.time() for entity_id in entity_ids}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Ask the loop to exit once the polls in flight have finished"""
+        self._stop.set()
+
+    def wait_for_stop(self, timeout):
+        """Block up to ``timeout`` seconds; True once stop has been requested"""
+        return self._stop.wait(timeout)
+
+    def run(self):
+        logger.info(
+            f"Ingestor polling {len(self.services)} parks, "
+            f"every {self.policy.base_interval}s while open"
+        )
+        while not self._stop.is_set():
+            now = time.time()
+            for entity_id in self.services:
+                with self._lock:
+                    due = self._next_due[entity_id]
+                    if due is None or due > now:
+                        continue
+                    # No next poll until this one finishes and picks its delay
+                    self._next_due[entity_id] = None
+                self._executor.submit(self._poll, entity_id, due)
+
+            with self._lock:
+                pending = [due for due in self._next_due.values() if due is not None]
+            wait = min(pending, default=now + 1.0) - time.time()
+            self._stop.wait(max(0.0, min(wait, 1.0)))
+
+        logger.info("Ingestor stopping, waiting for polls in flight...")
+        self._executor.shutdown(wait=True)
+        api_calls.flush()
+        connection.close()
+
+    def _poll(self, entity_id, due):
+        started = time.time()
+        service = self.services[entity_id]
+        data = None
+        try:
+            # Drops the thread's connection only if it is broken or expired
+            close_old_connections()
+            data = service.fetch_live_data()
+        except Exception as e:
+            logger.error(f"Ingestor poll for {entity_id} failed: {str(e)}")
+        finally:
+            self.stats.record(
+                entity_id, started - due, time.time() - started, service, data
+            )
+            delay = self.policy.base_interval
+            try:
+                delay = self.policy.next_interval(entity_id, data)
+            except Exception as e:
+                logger.error(
+                    f"Could not choose poll interval for {entity_id}: {str(e)}"
+                )
+            with self._lock:
+                # Keep to the schedule, but never pick a time already past
+                self._next_due[entity_id] = max(due + delay, time.time())
+            self.stats.record_interval(entity_id, delay)
+            # Again after the fetch, so a connection that broke or expired
+            # during it is not left open until the park's next poll
+            close_old_connections()
@@ -0,0 +1,143 @@
+import logging
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from theme_park_data.archive import (
+    ARCHIVE_KINDS,
+    archive_cutoff,
+    source_columns,
+    write_day,
+)
+from theme_park_data.models import RawPayload, ShowCurrentStatus
+from theme_park_data.payloads import payload_digest, split_item
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Move status rows of closed days into the columnar archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.THEME_PARK_ARCHIVE_AFTER_DAYS,
+            help="Archive UTC days that ended more than this many days ago",
+        )
+        parser.add_argument(
+            "--kind",
+            action="append",
+            dest="kinds",
+            choices=sorted(ARCHIVE_KINDS),
+            help="Status kind to archive (repeatable, defaults to all)",
+        )
+        parser.add_argument(
+            "--delete-chunk-size",
+            type=int,
+            default=2000,
+            help="Archived rows deleted from the status table per query",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the days that would be archived",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options["older_than_days"], timezone.now())
+        try:
+            for kind in options["kinds"] or sorted(ARCHIVE_KINDS):
+                self._archive_kind(kind, cutoff, options)
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in archive_statuses command: {str(e)}")
+
+    def _cold_rows(self, kind, cutoff):
+        model, entity_column, park_lookup = ARCHIVE_KINDS[kind]
+        rows = model.objects.filter(timestamp__lt=cutoff)
+        if kind == "shows":
+            # The current-state table still points at these
+            rows = rows.exclude(
+                pk__in=ShowCurrentStatus.objects.values("show_status_id")
+            )
+        return rows
+
+    def _archive_kind(self, kind, cutoff, options):
+        model, entity_column, park_lookup = ARCHIVE_KINDS[kind]
+        days = (
+            self._cold_rows(kind, cutoff)
+            .annotate(day=TruncDate("timestamp", tzinfo=dt_timezone.utc))
+            .values_list(park_lookup, "day")
+            .distinct()
+            .order_by("day", park_lookup)
+        )
+        for park_id, day in list(days):
+            if options["dry_run"]:
+                self.stdout.write(f"Would archive {kind} of {park_id} on {day}")
+                continue
+            archived = self._archive_day(kind, park_id, day, cutoff, options)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Archived {archived} {kind} statuses of {park_id} on {day}"
+                )
+            )
+
+    def _archive_day(self, kind, park_id, day, cutoff, options):
+        """Write one park's day to the archive, then delete it from the table
+
+        The archive is written and synced before any row is deleted, and
+        rewriting a day keeps what is already archived, so an interrupted run
+        can simply be started again.
+        """
+        model, entity_column, park_lookup = ARCHIVE_KINDS[kind]
+        rows = (
+            self._cold_rows(kind, cutoff)
+            .annotate(day=TruncDate("timestamp", tzinfo=dt_timezone.utc))
+            .filter(day=day, **{park_lookup: park_id})
+            .order_by("pk")
+        )
+        records = list(rows.values_list(*source_columns(kind)))
+        self._store_inline_payloads(model, rows, records)
+        write_day(kind, park_id, day, records)
+
+        pks = [record[1] for record in records]
+        size = options["delete_chunk_size"]
+        for index in range(0, len(pks), size):
+            with transaction.atomic():
+                model.objects.filter(pk__in=pks[index : index + size]).delete()
+        return len(records)
+
+    def _store_inline_payloads(self, model, rows, records):
+        """Move raw_data still stored on the rows into the payload store
+
+        The archive only keeps payload digests, so rows written before the
+        payload store get theirs here.
+        """
+        inline = dict(
+            rows.filter(raw_data__isnull=False, payload__isnull=True).values_list(
+                "pk", "raw_data"
+            )
+        )
+        if not inline:
+            return
+        payloads = {}
+        for index, record in enumerate(records):
+            raw_data = inline.get(record[1])
+            if raw_data is None:
+                continue
+            volatile, schedule = split_item(raw_data)
+            record = list(record)
+            record[5] = payload_digest(volatile)
+            payloads[record[5]] = volatile
+            if schedule is not None:
+                record[6] = payload_digest(schedule)
+                payloads[record[6]] = schedule
+            records[index] = tuple(record)
+        RawPayload.objects.bulk_create(
+            [RawPayload(digest=digest, data=data) for digest, data in payloads.items()],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,224 @@
+import logging
+import time
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from theme_park_data.archive import read_attraction_history
+from theme_park_data.forecasting import fit_profiles, local_indices, predict, train_park
+from theme_park_data.models import AttractionWaitRollup, Park
+from theme_park_data.rollups import park_timezone, status_validity
+
+logger = logging.getLogger(__name__)
+
+
+def _values_at(timestamps, waits, moments, max_gap):
+    """Standby wait in effect at each of ``moments`` (NaN if none was)"""
+    if not len(timestamps):
+        return np.full(len(moments), np.nan)
+    index = np.searchsorted(timestamps, moments, side="right") - 1
+    safe = np.clip(index, 0, None)
+    valid = (index >= 0) & (moments - timestamps[safe] <= max_gap)
+    return np.where(valid, waits[safe], np.nan)
+
+
+class Command(BaseCommand):
+    help = "Backtest the wait forecasts against recorded history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Evaluate forecasts made during the last this many days",
+        )
+        parser.add_argument(
+            "--step-minutes",
+            type=int,
+            default=30,
+            help="Minutes between the evaluated forecast times",
+        )
+        parser.add_argument(
+            "--park",
+            action="append",
+            dest="parks",
+            help="Park ID to backtest (can be repeated; defaults to all)",
+        )
+        parser.add_argument(
+            "--attraction-counts",
+            default="10,100,1000,10000",
+            help="Comma-separated attraction counts to time training and "
+            "prediction at, by repeating the stored rollups",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            now = timezone.now()
+            evaluate_from = now - timedelta(days=options["days"])
+            horizons = settings.THEME_PARK_FORECAST_HORIZONS_HOURS
+            parks = Park.objects.order_by("name")
+            if options["parks"]:
+                parks = parks.filter(id__in=options["parks"])
+
+            # Absolute errors per horizon: forecast, current wait, profile only
+            errors = {
+                name: [[] for _ in horizons]
+                for name in ("forecast", "current", "profile")
+            }
+            for park in parks:
+                self._backtest_park(park, evaluate_from, now, options, horizons, errors)
+
+            self.stdout.write(f"Forecasts made from {evaluate_from:%Y-%m-%d %H:%M} UTC")
+            for position, hours in enumerate(horizons):
+                forecast = np.array(errors["forecast"][position])
+                if not len(forecast):
+                    self.stdout.write(f"+{hours}h: no forecasts to compare")
+                    continue
+                self.stdout.write(
+                    f"+{hours}h: {len(forecast)} forecasts, "
+                    f"MAE {forecast.mean():.1f} min, "
+                    f"RMSE {np.sqrt((forecast ** 2).mean()):.1f} min "
+                    f"(current wait MAE {np.mean(errors['current'][position]):.1f}, "
+                    f"profile only MAE {np.mean(errors['profile'][position]):.1f})"
+                )
+
+            self._time_training(options, horizons)
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in backtest_forecasts command: {str(e)}")
+
+    def _backtest_park(self, park, evaluate_from, now, options, horizons, errors):
+        """Forecast every step of the evaluation window from profiles trained
+        on the days before it, and compare with the recorded waits"""
+        local_start = evaluate_from.astimezone(park_timezone(park.timezone))
+        profiles = train_park(park, now=evaluate_from, before=local_start.date())
+        if not profiles.attraction_ids:
+            return
+        max_gap = status_validity().total_seconds()
+        step = timedelta(minutes=options["step_minutes"])
+        last_origin = now - timedelta(hours=max(horizons))
+        origins = []
+        moment = evaluate_from
+        while moment <= last_origin:
+            origins.append(moment)
+            moment += step
+        if not origins:
+            return
+
+        origin_seconds = np.array([origin.timestamp() for origin in origins])
+        offsets = np.array(horizons, dtype=float) * 3600
+        target_seconds = origin_seconds[:, None] + offsets[None, :]
+        weekday, hour = local_indices(origins, park.timezone)
+        target_moments = [
+            origin + timedelta(hours=hours) for origin in origins for hours in horizons
+        ]
+        target_weekday, target_hour = local_indices(target_moments, park.timezone)
+        target_weekday = target_weekday.reshape(len(origins), len(horizons))
+        target_hour = target_hour.reshape(len(origins), len(horizons))
+
+        # One row per attraction and forecast time, all predicted at once
+        currents, actuals, rows = [], [], []
+        for row, attraction_id in enumerate(profiles.attraction_ids):
+            timestamps, statuses, waits, single_rider_waits = read_attraction_history(
+                attraction_id, park.id, evaluate_from - status_validity(), now
+            )
+            currents.append(_values_at(timestamps, waits, origin_seconds, max_gap))
+            actuals.append(
+                _values_at(timestamps, waits, target_seconds.ravel(), max_gap).reshape(
+                    len(origins), len(horizons)
+                )
+            )
+            rows.append(np.full(len(origins), row))
+        rows = np.concatenate(rows)
+        current = np.concatenate(currents)
+        actual = np.concatenate(actuals)
+        count = len(profiles.attraction_ids)
+        expected = profiles.expected[rows]
+        origin = (np.tile(weekday, count), np.tile(hour, count))
+        targets = (
+            np.tile(target_weekday, (count, 1)),
+            np.tile(target_hour, (count, 1)),
+        )
+
+        forecast = predict(
+            expected,
+            current,
+            origin,
+            targets,
+            horizons,
+            settings.THEME_PARK_FORECAST_TREND_HOURS,
+        )
+        profile_only = predict(
+            expected, np.full(len(current), np.nan), origin, targets, horizons, 1
+        )
+        # Only forecasts made while a wait was being reported are scored
+        for position in range(len(horizons)):
+            scored = ~np.isnan(actual[:, position]) & ~np.isnan(current)
+            for name, values in (
+                ("forecast", forecast[:, position]),
+                ("current", current),
+                ("profile", profile_only[:, position]),
+            ):
+                known = scored & ~np.isnan(values)
+                errors[name][position].extend(
+                    np.abs(values[known] - actual[known, position]).tolist()
+                )
+
+    def _time_training(self, options, horizons):
+        """Time fitting and predicting for growing numbers of attractions"""
+        rows = list(
+            AttractionWaitRollup.objects.filter(covered_seconds__gt=0).values_list(
+                "attraction_id", "weekday", "hour", "wait_sum", "covered_seconds"
+            )[:100000]
+        )
+        if not rows:
+            self.stdout.write("No rollups to time training on")
+            return
+        ids = {
+            attraction_id: index
+            for index, attraction_id in enumerate({row[0] for row in rows})
+        }
+        base = np.array([ids[row[0]] for row in rows], dtype=int)
+        weekdays = np.array([row[1] for row in rows], dtype=int)
+        hours = np.array([row[2] for row in rows], dtype=int)
+        wait_sums = np.array([row[3] for row in rows], dtype=float)
+        covered = np.array([row[4] for row in rows], dtype=float)
+
+        for count in [
+            int(value)
+            for value in options["attraction_counts"].split(",")
+            if value.strip()
+        ]:
+            # Repeat the stored attractions until there are ``count`` of them
+            copies = -(-count // len(ids))
+            index = (base[None, :] + len(ids) * np.arange(copies)[:, None]).ravel()
+            keep = index < count
+            started = time.perf_counter()
+            expected = fit_profiles(
+                index[keep],
+                np.tile(weekdays, copies)[keep],
+                np.tile(hours, copies)[keep],
+                np.tile(wait_sums, copies)[keep],
+                np.tile(covered, copies)[keep],
+                count,
+            )
+            trained = time.perf_counter()
+            predict(
+                expected,
+                np.full(count, 30.0),
+                (np.zeros(count, dtype=int), np.full(count, 12)),
+                (
+                    np.zeros((count, len(horizons)), dtype=int),
+                    np.tile(12 + np.arange(len(horizons)) % 12, (count, 1)),
+                ),
+                horizons,
+                settings.THEME_PARK_FORECAST_TREND_HOURS,
+            )
+            predicted = time.perf_counter()
+            self.stdout.write(
+                f"{count} attractions ({int(keep.sum())} rollup rows): "
+                f"training {(trained - started) * 1000:.1f} ms, "
+                f"forecasting {(predicted - trained) * 1000:.1f} ms"
+            )
@@ -0,0 +1,133 @@
+import logging
+import statistics
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from theme_park_data.models import (
+    Attraction,
+    AttractionCurrentStatus,
+    AttractionStatus,
+    Park,
+)
+from theme_park_data.rollups import park_timezone, stamp_local_time
+from theme_park_data.timeseries import recent_history
+from theme_park_data.views import attraction_detail
+
+logger = logging.getLogger(__name__)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the attraction detail page against synthetic histories of "
+        "growing size (written in a transaction that is rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            default="10000,100000,1000000",
+            help="Comma-separated history sizes (status rows of one attraction)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Days the synthetic history is spread over",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Requests timed at each size (the median is reported)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(value) for value in options["rows"].split(",") if value]
+            for size in sizes:
+                self._benchmark(size, options["days"], options["repeat"])
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in benchmark_attraction_detail command: {str(e)}")
+
+    def _benchmark(self, size, days, repeat):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                attraction = self._create_history(size, days, now)
+                request = RequestFactory().get("/")
+                timings, pipeline_timings = [], []
+                for _ in range(repeat):
+                    # The inserts above can fill the query log under DEBUG
+                    reset_queries()
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        attraction_detail(request, attraction.id)
+                        timings.append(time.perf_counter() - started)
+                    started = time.perf_counter()
+                    recent = recent_history(attraction, now - timedelta(hours=24), now)
+                    pipeline_timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f"{size} rows ({len(recent['labels'])} chart points in 24h): "
+                    f"request {statistics.median(timings) * 1000:.1f} ms, "
+                    f"24h pipeline {statistics.median(pipeline_timings) * 1000:.1f} ms, "
+                    f"{len(queries)} queries"
+                )
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _create_history(self, size, days, now):
+        """An attraction with ``size`` statuses evenly spread over ``days``"""
+        park = Park.objects.create(
+            id=uuid.uuid4(),
+            name="Benchmark park",
+            entity_type="PARK",
+            timezone="America/New_York",
+        )
+        attraction = Attraction.objects.create(
+            id=uuid.uuid4(), park=park, name="Benchmark ride", entity_type="ATTRACTION"
+        )
+        step = timedelta(days=days) / size
+        first = now - timedelta(days=days)
+        tz = park_timezone(park.timezone)
+        batch = []
+        for index in range(size):
+            batch.append(
+                stamp_local_time(
+                    AttractionStatus(
+                        attraction=attraction,
+                        timestamp=first + step * (index + 1),
+                        status="OPERATING" if index % 50 else "DOWN",
+                        standby_wait_time=(
+                            None if index % 50 == 0 else 5 * (index % 24)
+                        ),
+                    ),
+                    tz,
+                )
+            )
+            if len(batch) == 10000:
+                AttractionStatus.objects.bulk_create(batch)
+                batch = []
+        AttractionStatus.objects.bulk_create(batch)
+        last = AttractionStatus.objects.filter(attraction=attraction).latest(
+            "timestamp"
+        )
+        AttractionCurrentStatus.objects.create(
+            attraction=attraction,
+            park=park,
+            timestamp=last.timestamp,
+            status=last.status,
+            standby_wait_time=last.standby_wait_time,
+            status_since=last.timestamp,
+        )
+        return Attraction.objects.get(id=attraction.id)
@@ -0,0 +1,93 @@
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from theme_park_data.archive import archive_cutoff
+from theme_park_data.compaction import (
+    compact_raw_day,
+    compact_summary_day,
+    quarter_hour_days,
+    raw_days,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace old attraction statuses with 15-minute summaries, and old "
+        "15-minute summaries with hourly ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--raw-after-days",
+            type=int,
+            default=settings.THEME_PARK_COMPACT_RAW_AFTER_DAYS,
+            help="Compact raw statuses of UTC days that ended more than this "
+            "many days ago into 15-minute summaries (0 skips this tier)",
+        )
+        parser.add_argument(
+            "--quarter-hour-after-days",
+            type=int,
+            default=settings.THEME_PARK_COMPACT_QUARTER_HOUR_AFTER_DAYS,
+            help="Compact 15-minute summaries older than this many days into "
+            "hourly ones (0 skips this tier)",
+        )
+        parser.add_argument(
+            "--attraction",
+            action="append",
+            dest="attractions",
+            help="Attraction ID to compact (can be repeated; defaults to all)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the days that would be compacted",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        try:
+            if options["raw_after_days"] > 0:
+                cutoff = archive_cutoff(options["raw_after_days"], now)
+                days = list(raw_days(cutoff, options["attractions"]))
+                compacted = 0
+                for attraction_id, park_id, day in days:
+                    if options["dry_run"]:
+                        self.stdout.write(
+                            f"Would compact statuses of {attraction_id} on {day}"
+                        )
+                        continue
+                    compacted += compact_raw_day(attraction_id, park_id, day)
+                if not options["dry_run"]:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"Compacted {compacted} statuses from {len(days)} "
+                            f"attraction days into 15-minute summaries"
+                        )
+                    )
+
+            if options["quarter_hour_after_days"] > 0:
+                cutoff = archive_cutoff(options["quarter_hour_after_days"], now)
+                days = list(quarter_hour_days(cutoff, options["attractions"]))
+                compacted = 0
+                for attraction_id, day in days:
+                    if options["dry_run"]:
+                        self.stdout.write(
+                            f"Would compact 15-minute summaries of {attraction_id} "
+                            f"on {day}"
+                        )
+                        continue
+                    compacted += compact_summary_day(attraction_id, day)
+                if not options["dry_run"]:
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"Compacted {compacted} 15-minute summaries from "
+                            f"{len(days)} attraction days into hourly summaries"
+                        )
+                    )
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in compact_statuses command: {str(e)}")
@@ -0,0 +1,99 @@
+import logging
+import sys
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from theme_park_data.exports import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORTS,
+    EXPORT_FORMATS,
+    export_filename,
+    export_stream,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f"Invalid datetime: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Export status or API log history for a time range as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument(
+            "--from",
+            dest="start",
+            help="Start of the range, ISO 8601 (defaults to a day before --to)",
+        )
+        parser.add_argument(
+            "--to", dest="end", help="End of the range, ISO 8601 (defaults to now)"
+        )
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_FORMATS), default="ndjson"
+        )
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+        parser.add_argument(
+            "--park", metavar="ENTITY_ID", help="Only export statuses of this park"
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write, '-' for standard output (defaults to a file "
+            "named after the export and range)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Rows fetched from the database per round trip",
+        )
+
+    def handle(self, *args, **options):
+        end = _parse_datetime(options["end"]) if options["end"] else timezone.now()
+        start = (
+            _parse_datetime(options["start"])
+            if options["start"]
+            else end - timedelta(days=1)
+        )
+        kind = options["kind"]
+        output = options["output"] or export_filename(
+            kind, start, end, options["format"], options["gzip"]
+        )
+
+        try:
+            chunks = export_stream(
+                kind,
+                start,
+                end,
+                options["format"],
+                options["gzip"],
+                park_id=options["park"],
+                chunk_size=options["chunk_size"],
+            )
+            written = 0
+            if output == "-":
+                for chunk in chunks:
+                    sys.stdout.buffer.write(chunk)
+                    written += len(chunk)
+                sys.stdout.buffer.flush()
+                return
+
+            with open(output, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    written += len(chunk)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote {written} bytes of {kind} to {output}")
+            )
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in export_history command: {str(e)}")
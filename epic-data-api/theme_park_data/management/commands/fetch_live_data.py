@@ -1,7 +1,7 @@
 import logging
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from theme_park_data.services import ThemeParkApiService
+from theme_park_data.services import fetch_parks
 
 logger = logging.getLogger(__name__)
 
@@ -9,50 +9,80 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = "Fetch live data from the theme park API"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ingest-mode",
+            choices=["bulk", "row"],
+            help="Override THEME_PARK_BULK_INGEST for this run",
+        )
+        parser.add_argument(
+            "--park",
+            action="append",
+            dest="parks",
+            metavar="ENTITY_ID",
+            help="Park entity ID to fetch (repeatable, defaults to THEME_PARK_ENTITY_IDS)",
+        )
+
     def handle(self, *args, **options):
-        service = ThemeParkApiService()
+        bulk_ingest = None
+        if options["ingest_mode"]:
+            bulk_ingest = options["ingest_mode"] == "bulk"
 
         try:
             self.stdout.write(f"Fetching live data at {timezone.now()}")
-            data = service.fetch_live_data()
-
-            if data:
-                self.stdout.write(
-                    self.style.SUCCESS(f"Successfully fetched data for {data['name']}")
-                )
-
-                # Display some stats
-                if "liveData" in data:
-                    attractions = [
-                        item
-                        for item in data["liveData"]
-                        if item["entityType"] == "ATTRACTION"
-                    ]
-                    shows = [
-                        item
-                        for item in data["liveData"]
-                        if item["entityType"] == "SHOW"
-                    ]
-
-                    self.stdout.write(f"Processed {len(attractions)} attractions")
-                    self.stdout.write(f"Processed {len(shows)} shows")
-
-                    # Show attractions with wait times
-                    self.stdout.write("\nCurrent wait times:")
-                    for attraction in attractions:
-                        if (
-                            "queue" in attraction
-                            and "STANDBY" in attraction["queue"]
-                            and attraction["queue"]["STANDBY"]
-                        ):
-                            wait_time = attraction["queue"]["STANDBY"].get("waitTime")
-                            if wait_time is not None:
-                                self.stdout.write(
-                                    f"{attraction['name']}: {wait_time} minutes"
-                                )
-            else:
-                self.stdout.write(self.style.ERROR("Failed to fetch data from API"))
+            results = fetch_parks(options["parks"], bulk_ingest=bulk_ingest)
+
+            for service, data in results:
+                if data:
+                    self._write_summary(service, data)
+                else:
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f"Failed to fetch data from API for {service.entity_id}"
+                        )
+                    )
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
             logger.error(f"Error in fetch_live_data command: {str(e)}")
+
+    def _write_summary(self, service, data):
+        """Print what was fetched and written for one park"""
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully fetched data for {data['name']}")
+        )
+
+        # Display some stats
+        attractions = [
+            item
+            for item in data.get("liveData", [])
+            if item["entityType"] == "ATTRACTION"
+        ]
+        shows = [
+            item for item in data.get("liveData", []) if item["entityType"] == "SHOW"
+        ]
+
+        self.stdout.write(f"Processed {len(attractions)} attractions")
+        self.stdout.write(f"Processed {len(shows)} shows")
+
+        stats = service.last_ingest_stats
+        if service.last_fetch_unchanged:
+            self.stdout.write("Payload unchanged since the last poll, nothing written")
+        elif stats:
+            self.stdout.write(
+                f"Wrote {stats['rows_written']} rows in "
+                f"{stats['elapsed']:.3f}s ({stats['mode']} ingest)"
+            )
+
+        # Show attractions with wait times
+        self.stdout.write("\nCurrent wait times:")
+        for attraction in attractions:
+            if (
+                "queue" in attraction
+                and "STANDBY" in attraction["queue"]
+                and attraction["queue"]["STANDBY"]
+            ):
+                wait_time = attraction["queue"]["STANDBY"].get("waitTime")
+                if wait_time is not None:
+                    self.stdout.write(f"{attraction['name']}: {wait_time} minutes")
+        self.stdout.write("")
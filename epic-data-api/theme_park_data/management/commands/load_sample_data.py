@@ -2,16 +2,18 @@ import logging
 import uuid
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta, datetime
+from datetime import timedelta
 from theme_park_data.models import (
     Park,
     Attraction,
     Show,
     AttractionStatus,
     ShowStatus,
+    AttractionCurrentStatus,
+    ShowCurrentStatus,
     Showtime,
-    OperatingHours,
 )
+from theme_park_data.rollups import park_timezone, stamp_local_time
 
 logger = logging.getLogger(__name__)
 
@@ -121,10 +123,12 @@ class Command(BaseCommand):
 
             # Create historical data for the past 24 hours
             now = timezone.now()
+            tz = park_timezone(park.timezone)
 
-            # For each attraction, create 24 hourly status updates
+            # For each attraction, create 24 hourly status updates, oldest
+            # first so the last one saved is the current status
             for attraction in attraction_objects:
-                for i in range(24):
+                for i in reversed(range(24)):
                     time_point = now - timedelta(hours=i)
                     status = (
                         "OPERATING" if i % 8 != 0 else "CLOSED"
@@ -140,43 +144,84 @@ class Command(BaseCommand):
                     if status == "CLOSED":
                         wait_time = None
 
-                    AttractionStatus.objects.create(
-                        attraction=attraction,
-                        timestamp=time_point,
-                        status=status,
-                        standby_wait_time=wait_time,
-                        single_rider_wait_time=(
-                            wait_time // 2 if wait_time and wait_time > 20 else None
+                    attraction_status = stamp_local_time(
+                        AttractionStatus(
+                            attraction=attraction,
+                            timestamp=time_point,
+                            status=status,
+                            standby_wait_time=wait_time,
+                            single_rider_wait_time=(
+                                wait_time // 2 if wait_time and wait_time > 20 else None
+                            ),
+                            last_updated=time_point,
                         ),
-                        last_updated=time_point,
+                        tz,
                     )
+                    attraction_status.save()
+
+                # The pages and APIs read the current-state tables. Hourly
+                # statuses are further apart than the status validity, so
+                # the newest one starts its own status period.
+                AttractionCurrentStatus.objects.update_or_create(
+                    attraction=attraction,
+                    defaults={
+                        "park": park,
+                        "timestamp": attraction_status.timestamp,
+                        "status": attraction_status.status,
+                        "standby_wait_time": attraction_status.standby_wait_time,
+                        "single_rider_wait_time": (
+                            attraction_status.single_rider_wait_time
+                        ),
+                        "last_updated": attraction_status.last_updated,
+                        "reports_wait_times": True,
+                        "status_since": attraction_status.timestamp,
+                    },
+                )
 
             # For shows, create statuses and showtimes
             for show in show_objects:
-                # Create hourly statuses
-                for i in range(12):
+                # Create hourly statuses, oldest first
+                for i in reversed(range(12)):
                     time_point = now - timedelta(hours=i)
                     status = "OPERATING"
 
-                    show_status = ShowStatus.objects.create(
-                        show=show,
-                        timestamp=time_point,
-                        status=status,
-                        last_updated=time_point,
+                    show_status = stamp_local_time(
+                        ShowStatus(
+                            show=show,
+                            timestamp=time_point,
+                            status=status,
+                            last_updated=time_point,
+                        ),
+                        tz,
                     )
+                    show_status.save()
 
                     # Add showtimes for the next 6 hours
                     for j in range(3):
                         start_time = time_point + timedelta(hours=j + 1)
                         end_time = start_time + timedelta(minutes=30)
 
-                        Showtime.objects.create(
-                            show_status=show_status,
+                        Showtime.objects.update_or_create(
+                            show=show,
                             type="Performance Time",
                             start_time=start_time,
-                            end_time=end_time,
+                            defaults={
+                                "end_time": end_time,
+                                "last_seen": time_point,
+                            },
                         )
 
+                ShowCurrentStatus.objects.update_or_create(
+                    show=show,
+                    defaults={
+                        "park": park,
+                        "show_status": show_status,
+                        "timestamp": show_status.timestamp,
+                        "status": show_status.status,
+                        "last_updated": show_status.last_updated,
+                    },
+                )
+
             self.stdout.write(self.style.SUCCESS("Successfully loaded sample data!"))
 
         except Exception as e:
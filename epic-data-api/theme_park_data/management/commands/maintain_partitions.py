@@ -0,0 +1,105 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from theme_park_data.partitions import (
+    EXPIRED_ACTIONS,
+    PARTITION_INTERVALS,
+    PARTITIONED_MODELS,
+    ensure_partitions,
+    expire_partitions,
+    supports_partitioning,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Create upcoming history table partitions and expire old ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=settings.THEME_PARK_PARTITION_PRECREATE,
+            help="Number of future partitions to keep ready",
+        )
+        parser.add_argument(
+            "--interval",
+            choices=PARTITION_INTERVALS,
+            default=settings.THEME_PARK_PARTITION_INTERVAL,
+            help="Size of new partitions",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=settings.THEME_PARK_PARTITION_RETENTION_DAYS,
+            help="Expire partitions that ended more than this many days ago "
+            "(0 keeps every partition)",
+        )
+        parser.add_argument(
+            "--action",
+            choices=EXPIRED_ACTIONS,
+            default=settings.THEME_PARK_PARTITION_EXPIRED_ACTION,
+            help="What to do with expired partitions",
+        )
+        parser.add_argument(
+            "--table",
+            action="append",
+            dest="tables",
+            choices=sorted(model.__name__ for model in PARTITIONED_MODELS),
+            help="Limit maintenance to this model's table (repeatable)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be created and expired",
+        )
+
+    def handle(self, *args, **options):
+        if not supports_partitioning():
+            self.stdout.write(
+                self.style.WARNING("History tables are only partitioned on PostgreSQL")
+            )
+            return
+
+        now = timezone.now()
+        try:
+            for model in PARTITIONED_MODELS:
+                if options["tables"] and model.__name__ not in options["tables"]:
+                    continue
+                created = ensure_partitions(
+                    model,
+                    now,
+                    options["ahead"],
+                    options["interval"],
+                    dry_run=options["dry_run"],
+                )
+                for name in created:
+                    if options["dry_run"]:
+                        self.stdout.write(f"Would create partition {name}")
+                    else:
+                        self.stdout.write(
+                            self.style.SUCCESS(f"Created partition {name}")
+                        )
+
+                if options["retention_days"] > 0:
+                    cutoff = now - timedelta(days=options["retention_days"])
+                    expired = expire_partitions(
+                        model, cutoff, options["action"], dry_run=options["dry_run"]
+                    )
+                    done = "Dropped" if options["action"] == "drop" else "Detached"
+                    for name in expired:
+                        if options["dry_run"]:
+                            self.stdout.write(
+                                f"Would {options['action']} partition {name}"
+                            )
+                        else:
+                            self.stdout.write(
+                                self.style.SUCCESS(f"{done} partition {name}")
+                            )
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in maintain_partitions command: {str(e)}")
@@ -0,0 +1,83 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from theme_park_data.models import AttractionStatus, ShowStatus, RawPayload
+from theme_park_data.payloads import payload_digest, split_item
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Move inline raw_data on status rows into the deduplicated payload store"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of status rows migrated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+
+        try:
+            for model in (AttractionStatus, ShowStatus):
+                migrated = self._migrate_model(model, chunk_size)
+                self.stdout.write(
+                    self.style.SUCCESS(f"Migrated {migrated} {model.__name__} rows")
+                )
+
+            self.stdout.write(
+                "On PostgreSQL, run VACUUM on the status tables to reclaim the freed space"
+            )
+
+        except Exception as e:
+            logger.error(f"Error in migrate_raw_payloads command: {str(e)}")
+            # A non-zero exit, so a deploy script does not carry on regardless
+            raise CommandError(f"Error: {str(e)}") from e
+
+    def _migrate_model(self, model, chunk_size):
+        """Migrate one status model in primary key order, one chunk at a time
+
+        Each chunk commits on its own, so an interrupted run can simply be
+        started again and picks up the rows that still have inline raw_data.
+        """
+        migrated = 0
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                statuses = list(
+                    model.objects.filter(raw_data__isnull=False, pk__gt=last_pk)
+                    .order_by("pk")
+                    .only("pk", "raw_data")[:chunk_size]
+                )
+                if not statuses:
+                    return migrated
+
+                payloads = {}
+                for status in statuses:
+                    volatile, schedule = split_item(status.raw_data)
+                    status.payload_id = payload_digest(volatile)
+                    payloads[status.payload_id] = volatile
+                    status.schedule_payload_id = None
+                    if schedule is not None:
+                        status.schedule_payload_id = payload_digest(schedule)
+                        payloads[status.schedule_payload_id] = schedule
+
+                RawPayload.objects.bulk_create(
+                    [
+                        RawPayload(digest=digest, data=data)
+                        for digest, data in payloads.items()
+                    ],
+                    ignore_conflicts=True,
+                )
+                model.objects.bulk_update(statuses, ["payload", "schedule_payload"])
+                # update() stores SQL NULL, where bulk_update would store JSON null
+                model.objects.filter(pk__in=[status.pk for status in statuses]).update(
+                    raw_data=None
+                )
+
+            migrated += len(statuses)
+            last_pk = statuses[-1].pk
+            self.stdout.write(f"{model.__name__}: {migrated} rows migrated")
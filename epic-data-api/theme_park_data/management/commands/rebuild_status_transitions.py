@@ -0,0 +1,109 @@
+import logging
+from datetime import timedelta
+from types import SimpleNamespace
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from theme_park_data.archive import EPOCH, read_attraction_history
+from theme_park_data.models import (
+    Attraction,
+    AttractionCurrentStatus,
+    StatusTransition,
+)
+from theme_park_data.transitions import period_start, status_transition
+
+logger = logging.getLogger(__name__)
+
+
+def history_transitions(attraction_id, park_id):
+    """Transitions of an attraction's recorded history, oldest first
+
+    Replays the statuses (archived days included) through the same state
+    machine ingest uses. Returns the transitions, the timestamps of the first
+    and last statuses, and when the last status period began.
+    """
+    timestamps, statuses, waits, single_rider_waits = read_attraction_history(
+        attraction_id, park_id
+    )
+    transitions = []
+    previous = first = None
+    for timestamp, status_name in zip(timestamps.tolist(), statuses.tolist()):
+        status = SimpleNamespace(
+            attraction_id=attraction_id,
+            timestamp=EPOCH + timedelta(seconds=timestamp),
+            status=status_name,
+        )
+        first = first or status.timestamp
+        transition = status_transition(previous, status)
+        if transition is not None:
+            transitions.append(transition)
+        previous = SimpleNamespace(
+            park_id=park_id,
+            timestamp=status.timestamp,
+            status=status.status,
+            status_since=period_start(previous, status),
+        )
+    if previous is None:
+        return transitions, None, None, None
+    return transitions, first, previous.timestamp, previous.status_since
+
+
+class Command(BaseCommand):
+    help = "Rebuild the status transition log from the attraction status history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--attraction",
+            action="append",
+            dest="attractions",
+            help="Attraction ID to rebuild (can be repeated; defaults to all)",
+        )
+        parser.add_argument(
+            "--park",
+            action="append",
+            dest="parks",
+            help="Only rebuild attractions of this park (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            attractions = Attraction.objects.all()
+            if options["attractions"]:
+                attractions = attractions.filter(id__in=options["attractions"])
+            if options["parks"]:
+                attractions = attractions.filter(park_id__in=options["parks"])
+            attractions = list(attractions.values_list("id", "park_id"))
+
+            total = 0
+            for attraction_id, park_id in attractions:
+                transitions, first, last, since = history_transitions(
+                    attraction_id, park_id
+                )
+                if first is None:
+                    self.stdout.write(f"{attraction_id}: no statuses to replay")
+                    continue
+                # Timestamps come back as float seconds, so allow for rounding
+                slack = timedelta(milliseconds=1)
+                with transaction.atomic():
+                    # Compacted days have no statuses left to replay, so the
+                    # transitions before the oldest remaining status are kept
+                    StatusTransition.objects.filter(
+                        attraction_id=attraction_id, ended__gt=first - slack
+                    ).delete()
+                    StatusTransition.objects.bulk_create(transitions)
+                    AttractionCurrentStatus.objects.filter(
+                        attraction_id=attraction_id,
+                        timestamp__range=(last - slack, last + slack),
+                    ).update(status_since=since)
+                total += len(transitions)
+                self.stdout.write(f"{attraction_id}: {len(transitions)} transitions")
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rebuilt {total} status transitions for "
+                    f"{len(attractions)} attractions"
+                )
+            )
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in rebuild_status_transitions command: {str(e)}")
@@ -0,0 +1,129 @@
+import logging
+import math
+import os
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from theme_park_data.archive import EPOCH, read_attraction_history
+from theme_park_data.models import (
+    Attraction,
+    AttractionStatusSummary,
+    AttractionWaitRollup,
+)
+from theme_park_data.rollups import (
+    add_interval,
+    closed_intervals,
+    park_timezone,
+    save_buckets,
+    status_validity,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    # Forked workers must not share the parent's database connections
+    django.setup()
+    connections.close_all()
+
+
+def _compute_rollups(attraction_id, park_id, timezone_name):
+    """Rollup buckets for one attraction, computed from its raw statuses"""
+    # Includes days that have been moved to the columnar archive
+    timestamps, statuses, waits, single_rider_waits = read_attraction_history(
+        attraction_id, park_id
+    )
+    rows = [
+        (EPOCH + timedelta(seconds=timestamp), None if math.isnan(wait) else int(wait))
+        for timestamp, wait in zip(timestamps.tolist(), waits.tolist())
+    ]
+    tz = park_timezone(timezone_name)
+    buckets = {}
+    for start, end, wait_time in closed_intervals(rows, status_validity()):
+        add_interval(buckets, attraction_id, start, end, wait_time, tz)
+
+    # Compacted history has no raw rows left to rebuild from, so the rollups
+    # up to the local day of the oldest raw row are kept as they are
+    keep_through = None
+    if AttractionStatusSummary.objects.filter(attraction_id=attraction_id).exists():
+        keep_through = rows[0][0].astimezone(tz).date() if rows else date.max
+        buckets = {
+            key: bucket for key, bucket in buckets.items() if key[1] > keep_through
+        }
+    return attraction_id, len(rows), buckets, keep_through
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly wait rollups from the raw attraction status history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--attraction",
+            action="append",
+            dest="attractions",
+            help="Attraction ID to rebuild (can be repeated; defaults to all)",
+        )
+        parser.add_argument(
+            "--park",
+            action="append",
+            dest="parks",
+            help="Only rebuild attractions of this park (can be repeated)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes reading and rolling up history",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            attractions = Attraction.objects.all()
+            if options["attractions"]:
+                attractions = attractions.filter(id__in=options["attractions"])
+            if options["parks"]:
+                attractions = attractions.filter(park_id__in=options["parks"])
+            attractions = list(
+                attractions.values_list("id", "park_id", "park__timezone")
+            )
+
+            # Workers are forked from this process, so close its connections
+            # first rather than let every worker inherit the same socket
+            connections.close_all()
+
+            rebuilt = 0
+            with ProcessPoolExecutor(
+                max_workers=max(1, options["workers"]), initializer=_init_worker
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _compute_rollups, attraction_id, park_id, timezone_name
+                    )
+                    for attraction_id, park_id, timezone_name in attractions
+                ]
+                for future in as_completed(futures):
+                    attraction_id, status_count, buckets, keep_through = future.result()
+                    # Writes stay in this process, one transaction per attraction
+                    with transaction.atomic():
+                        rollups = AttractionWaitRollup.objects.filter(
+                            attraction_id=attraction_id
+                        )
+                        if keep_through is not None:
+                            rollups = rollups.filter(local_date__gt=keep_through)
+                        rollups.delete()
+                        written = save_buckets(buckets)
+                    rebuilt += 1
+                    self.stdout.write(
+                        f"{attraction_id}: {status_count} statuses, "
+                        f"{written} hourly rollups ({rebuilt}/{len(attractions)})"
+                    )
+
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt wait rollups for {rebuilt} attractions")
+            )
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
+            logger.error(f"Error in rebuild_wait_rollups command: {str(e)}")
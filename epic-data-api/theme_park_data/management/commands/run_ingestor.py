@@ -0,0 +1,90 @@
+import json
+import logging
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand
+from theme_park_data.ingestor import Ingestor
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run the live data poll loop as a standalone, long-running process"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--park",
+            action="append",
+            dest="parks",
+            metavar="ENTITY_ID",
+            help="Park entity ID to poll (repeatable, defaults to THEME_PARK_ENTITY_IDS)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            help="Seconds between polls of an open park (defaults to THEME_PARK_POLL_INTERVAL_SECONDS)",
+        )
+        parser.add_argument(
+            "--stats-port",
+            type=int,
+            help="Serve lag and throughput counters as JSON on this port",
+        )
+        parser.add_argument(
+            "--report-interval",
+            type=float,
+            default=300,
+            help="Seconds between counter summaries in the log",
+        )
+
+    def handle(self, *args, **options):
+        ingestor = Ingestor(options["parks"], interval=options["interval"])
+
+        def shutdown(signum, frame):
+            self.stdout.write(f"Received signal {signum}, shutting down...")
+            ingestor.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        stats_server = None
+        if options["stats_port"]:
+            stats_server = self._serve_stats(ingestor, options["stats_port"])
+
+        reporter = threading.Thread(
+            target=self._report,
+            args=(ingestor, options["report_interval"]),
+            daemon=True,
+        )
+        reporter.start()
+
+        try:
+            ingestor.run()
+        finally:
+            if stats_server:
+                stats_server.shutdown()
+
+        self.stdout.write(json.dumps(ingestor.stats.snapshot()))
+        self.stdout.write(self.style.SUCCESS("Ingestor stopped"))
+
+    def _report(self, ingestor, interval):
+        while not ingestor.wait_for_stop(interval):
+            logger.info(f"Ingestor stats: {json.dumps(ingestor.stats.snapshot())}")
+
+    def _serve_stats(self, ingestor, port):
+        class StatsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(ingestor.stats.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), StatsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.stdout.write(f"Serving ingestor stats on port {port}")
+        return server
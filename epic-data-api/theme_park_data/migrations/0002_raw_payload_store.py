@@ -0,0 +1,70 @@
+# Generated by Django 5.2 on 2026-10-18 11:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RawPayload",
+            fields=[
+                (
+                    "digest",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("data", models.JSONField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="attractionstatus",
+            name="payload",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="theme_park_data.rawpayload",
+            ),
+        ),
+        migrations.AddField(
+            model_name="attractionstatus",
+            name="schedule_payload",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="theme_park_data.rawpayload",
+            ),
+        ),
+        migrations.AddField(
+            model_name="showstatus",
+            name="payload",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="theme_park_data.rawpayload",
+            ),
+        ),
+        migrations.AddField(
+            model_name="showstatus",
+            name="schedule_payload",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="theme_park_data.rawpayload",
+            ),
+        ),
+    ]
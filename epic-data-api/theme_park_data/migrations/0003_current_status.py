@@ -0,0 +1,150 @@
+# Generated by Django 5.2 on 2026-10-18 11:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+
+def backfill_current_status(apps, schema_editor):
+    """Seed the current-state tables from the latest stored statuses"""
+    Attraction = apps.get_model("theme_park_data", "Attraction")
+    Show = apps.get_model("theme_park_data", "Show")
+    AttractionStatus = apps.get_model("theme_park_data", "AttractionStatus")
+    ShowStatus = apps.get_model("theme_park_data", "ShowStatus")
+    AttractionCurrentStatus = apps.get_model(
+        "theme_park_data", "AttractionCurrentStatus"
+    )
+    ShowCurrentStatus = apps.get_model("theme_park_data", "ShowCurrentStatus")
+
+    attractions = Attraction.objects.annotate(
+        latest_status_id=Subquery(
+            AttractionStatus.objects.filter(attraction=OuterRef("pk"))
+            .order_by("-timestamp")
+            .values("pk")[:1]
+        ),
+        reports_wait_times=Exists(
+            AttractionStatus.objects.filter(attraction=OuterRef("pk")).filter(
+                Q(standby_wait_time__isnull=False)
+                | Q(single_rider_wait_time__isnull=False)
+            )
+        ),
+    ).filter(latest_status_id__isnull=False)
+    reports = dict(attractions.values_list("latest_status_id", "reports_wait_times"))
+    AttractionCurrentStatus.objects.bulk_create(
+        AttractionCurrentStatus(
+            attraction_id=status.attraction_id,
+            park_id=status.attraction.park_id,
+            timestamp=status.timestamp,
+            status=status.status,
+            standby_wait_time=status.standby_wait_time,
+            single_rider_wait_time=status.single_rider_wait_time,
+            last_updated=status.last_updated,
+            reports_wait_times=reports[status.pk],
+        )
+        for status in AttractionStatus.objects.filter(pk__in=reports)
+        .select_related("attraction")
+        .defer("raw_data")
+    )
+
+    shows = Show.objects.annotate(
+        latest_status_id=Subquery(
+            ShowStatus.objects.filter(show=OuterRef("pk"))
+            .order_by("-timestamp")
+            .values("pk")[:1]
+        )
+    ).filter(latest_status_id__isnull=False)
+    ShowCurrentStatus.objects.bulk_create(
+        ShowCurrentStatus(
+            show_id=status.show_id,
+            park_id=status.show.park_id,
+            show_status_id=status.pk,
+            timestamp=status.timestamp,
+            status=status.status,
+            last_updated=status.last_updated,
+        )
+        for status in ShowStatus.objects.filter(
+            pk__in=shows.values_list("latest_status_id", flat=True)
+        )
+        .select_related("show")
+        .defer("raw_data")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0002_raw_payload_store"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttractionCurrentStatus",
+            fields=[
+                (
+                    "attraction",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="current_status",
+                        serialize=False,
+                        to="theme_park_data.attraction",
+                    ),
+                ),
+                ("timestamp", models.DateTimeField()),
+                ("status", models.CharField(max_length=50)),
+                ("standby_wait_time", models.IntegerField(blank=True, null=True)),
+                ("single_rider_wait_time", models.IntegerField(blank=True, null=True)),
+                ("last_updated", models.DateTimeField(blank=True, null=True)),
+                ("reports_wait_times", models.BooleanField(default=False)),
+                (
+                    "park",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="theme_park_data.park",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Attraction current statuses",
+            },
+        ),
+        migrations.CreateModel(
+            name="ShowCurrentStatus",
+            fields=[
+                (
+                    "show",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="current_status",
+                        serialize=False,
+                        to="theme_park_data.show",
+                    ),
+                ),
+                ("timestamp", models.DateTimeField()),
+                ("status", models.CharField(max_length=50)),
+                ("last_updated", models.DateTimeField(blank=True, null=True)),
+                (
+                    "park",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="theme_park_data.park",
+                    ),
+                ),
+                (
+                    "show_status",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="theme_park_data.showstatus",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Show current statuses",
+            },
+        ),
+        migrations.RunPython(backfill_current_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-18 11:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0003_current_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttractionWaitRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("local_date", models.DateField()),
+                ("hour", models.PositiveSmallIntegerField()),
+                ("weekday", models.PositiveSmallIntegerField()),
+                ("sample_count", models.IntegerField(default=0)),
+                ("covered_seconds", models.FloatField(default=0)),
+                ("wait_sum", models.FloatField(default=0)),
+                ("min_wait", models.IntegerField(blank=True, null=True)),
+                ("max_wait", models.IntegerField(blank=True, null=True)),
+                (
+                    "attraction",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="wait_rollups",
+                        to="theme_park_data.attraction",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["local_date", "hour"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("attraction", "local_date", "hour"),
+                        name="unique_attraction_wait_rollup",
+                    )
+                ],
+            },
+        ),
+    ]
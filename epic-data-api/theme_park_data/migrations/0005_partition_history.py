@@ -0,0 +1,76 @@
+# Generated by Django 5.2 on 2026-10-18 11:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+from theme_park_data.partitions import partition_table
+
+# Model -> column it is partitioned on
+PARTITIONED = [
+    ("AttractionStatus", "timestamp"),
+    ("ShowStatus", "timestamp"),
+    ("OperatingHours", "start_time"),
+    ("Showtime", "start_time"),
+    ("ApiLog", "timestamp"),
+]
+
+
+def partition_history_tables(apps, schema_editor):
+    """Range-partition the history tables on PostgreSQL
+
+    Other databases keep plain tables.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    now = timezone.now()
+    for model_name, column in PARTITIONED:
+        partition_table(
+            schema_editor,
+            apps.get_model("theme_park_data", model_name),
+            column,
+            settings.THEME_PARK_PARTITION_INTERVAL,
+            settings.THEME_PARK_PARTITION_PRECREATE,
+            now,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0004_wait_rollups"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="operatinghours",
+            name="attraction_status",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="operating_hours",
+                to="theme_park_data.attractionstatus",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="showcurrentstatus",
+            name="show_status",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="theme_park_data.showstatus",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="showtime",
+            name="show_status",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="showtimes",
+                to="theme_park_data.showstatus",
+            ),
+        ),
+        migrations.RunPython(partition_history_tables, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0005_partition_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttractionStatusSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("resolution", models.PositiveIntegerField()),
+                ("bucket_start", models.DateTimeField()),
+                ("sample_count", models.IntegerField(default=0)),
+                ("covered_seconds", models.FloatField(default=0)),
+                ("operating_seconds", models.FloatField(default=0)),
+                ("standby_seconds", models.FloatField(default=0)),
+                ("standby_sum", models.FloatField(default=0)),
+                ("standby_min", models.IntegerField(blank=True, null=True)),
+                ("standby_max", models.IntegerField(blank=True, null=True)),
+                ("single_rider_seconds", models.FloatField(default=0)),
+                ("single_rider_sum", models.FloatField(default=0)),
+                ("single_rider_min", models.IntegerField(blank=True, null=True)),
+                ("single_rider_max", models.IntegerField(blank=True, null=True)),
+                ("last_timestamp", models.DateTimeField(blank=True, null=True)),
+                ("last_status", models.CharField(blank=True, max_length=50, null=True)),
+                ("last_standby_wait_time", models.IntegerField(blank=True, null=True)),
+                (
+                    "last_single_rider_wait_time",
+                    models.IntegerField(blank=True, null=True),
+                ),
+                (
+                    "attraction",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_summaries",
+                        to="theme_park_data.attraction",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Attraction status summaries",
+                "ordering": ["bucket_start"],
+                "indexes": [
+                    models.Index(
+                        fields=["attraction", "bucket_start"],
+                        name="theme_park__attract_f2721b_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("attraction", "resolution", "bucket_start"),
+                        name="unique_attraction_status_summary",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0006_status_summaries"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attractionwaitrollup",
+            name="wait_sketch",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
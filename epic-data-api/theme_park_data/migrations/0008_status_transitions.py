@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0007_wait_sketches"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attractioncurrentstatus",
+            name="status_since",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="StatusTransition",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("from_status", models.CharField(max_length=50)),
+                ("to_status", models.CharField(blank=True, max_length=50, null=True)),
+                ("started", models.DateTimeField()),
+                ("ended", models.DateTimeField()),
+                (
+                    "attraction",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_transitions",
+                        to="theme_park_data.attraction",
+                    ),
+                ),
+                (
+                    "park",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="theme_park_data.park",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["ended"],
+                "indexes": [
+                    models.Index(
+                        fields=["attraction", "ended"],
+                        name="transition_attraction_ended",
+                    ),
+                    models.Index(
+                        fields=["park", "ended"], name="transition_park_ended"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,154 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max, Min, Value
+from django.db.models.functions import Coalesce
+
+# Schedule model -> (status field it hangs off, entity field it moves to)
+SCHEDULES = {
+    "OperatingHours": ("attraction_status", "attraction"),
+    "Showtime": ("show_status", "show"),
+}
+
+
+def deduplicate_schedules(apps, schema_editor):
+    """Keep one row per entity, type and start time
+
+    Every poll used to copy the schedule onto its status row. The newest
+    copy of each entry is kept, pointed at the entity, and given the first
+    and last status times it was seen at; the other copies, and rows whose
+    status no longer exists, are deleted.
+    """
+    for model_name, (status_field, entity_field) in SCHEDULES.items():
+        model = apps.get_model("theme_park_data", model_name)
+        entity_key = f"{status_field}__{entity_field}"
+        groups = (
+            model.objects.annotate(key_type=Coalesce("type", Value("")))
+            .values(entity_key, "key_type", "start_time")
+            .annotate(
+                keep=Max("id"),
+                first=Min(f"{status_field}__timestamp"),
+                last=Max(f"{status_field}__timestamp"),
+            )
+            .order_by()
+        )
+        for group in groups.iterator():
+            if group[entity_key] is None:
+                continue
+            model.objects.filter(id=group["keep"]).update(
+                **{f"{entity_field}_id": group[entity_key]},
+                type=group["key_type"],
+                first_seen=group["first"],
+                last_seen=group["last"],
+            )
+        model.objects.filter(**{f"{entity_field}__isnull": True}).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0008_status_transitions"),
+    ]
+
+    operations = [
+        # Added without database constraints so the data migration leaves no
+        # deferred constraint checks pending before the table is altered
+        migrations.AddField(
+            model_name="operatinghours",
+            name="attraction",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="operating_hours",
+                to="theme_park_data.attraction",
+            ),
+        ),
+        migrations.AddField(
+            model_name="showtime",
+            name="show",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="showtimes",
+                to="theme_park_data.show",
+            ),
+        ),
+        migrations.AddField(
+            model_name="operatinghours",
+            name="first_seen",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="operatinghours",
+            name="last_seen",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="showtime",
+            name="first_seen",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="showtime",
+            name="last_seen",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(deduplicate_schedules, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="operatinghours",
+            name="attraction_status",
+        ),
+        migrations.RemoveField(
+            model_name="showtime",
+            name="show_status",
+        ),
+        migrations.AlterField(
+            model_name="operatinghours",
+            name="attraction",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="operating_hours",
+                to="theme_park_data.attraction",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="showtime",
+            name="show",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="showtimes",
+                to="theme_park_data.show",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="operatinghours",
+            name="type",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="showtime",
+            name="type",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AddConstraint(
+            model_name="operatinghours",
+            constraint=models.UniqueConstraint(
+                fields=("attraction", "type", "start_time"),
+                name="unique_operating_hours",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="showtime",
+            constraint=models.UniqueConstraint(
+                fields=("show", "type", "start_time"), name="unique_showtime"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="showtime",
+            index=models.Index(
+                fields=["show", "start_time"], name="showtime_show_start"
+            ),
+        ),
+    ]
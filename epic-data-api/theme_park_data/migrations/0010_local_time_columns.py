@@ -0,0 +1,99 @@
+# Generated by Django 5.2 on 2026-10-18 12:18
+
+import zoneinfo
+from django.db import migrations, models
+from django.utils import timezone
+
+# Status model -> entity field that leads to its park
+STATUS_MODELS = {"AttractionStatus": "attraction", "ShowStatus": "show"}
+
+BATCH_SIZE = 2000
+
+
+def stamp_local_time(apps, schema_editor):
+    """Fill in the park-local date, hour and weekday of existing statuses
+
+    Each park's statuses are read in primary key order, a batch at a time,
+    and written back with bulk_update, so memory use does not grow with the
+    history.
+    """
+    Park = apps.get_model("theme_park_data", "Park")
+    for model_name, entity_field in STATUS_MODELS.items():
+        model = apps.get_model("theme_park_data", model_name)
+        for park_id, timezone_name in Park.objects.values_list("id", "timezone"):
+            try:
+                tz = zoneinfo.ZoneInfo(timezone_name)
+            except (zoneinfo.ZoneInfoNotFoundError, ValueError, TypeError):
+                tz = timezone.get_default_timezone()
+            statuses = (
+                model.objects.filter(
+                    **{f"{entity_field}__park_id": park_id}, local_date__isnull=True
+                )
+                .only("id", "timestamp")
+                .order_by("pk")
+            )
+            last_pk = 0
+            while batch := list(statuses.filter(pk__gt=last_pk)[:BATCH_SIZE]):
+                for status in batch:
+                    local = status.timestamp.astimezone(tz)
+                    status.local_date = local.date()
+                    status.local_hour = local.hour
+                    status.local_weekday = local.weekday()
+                model.objects.bulk_update(
+                    batch, ["local_date", "local_hour", "local_weekday"]
+                )
+                last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0009_normalized_schedules"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attractionstatus",
+            name="local_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="attractionstatus",
+            name="local_hour",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="attractionstatus",
+            name="local_weekday",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="showstatus",
+            name="local_date",
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="showstatus",
+            name="local_hour",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="showstatus",
+            name="local_weekday",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(stamp_local_time, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="attractionstatus",
+            index=models.Index(
+                fields=["attraction", "local_date", "local_hour"],
+                name="attraction_status_local",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="showstatus",
+            index=models.Index(
+                fields=["show", "local_date", "local_hour"], name="show_status_local"
+            ),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2 on 2026-10-18 12:22
+
+import bisect
+from django.db import migrations, models
+
+# telemetry.LATENCY_BUCKETS when the histograms were introduced
+LATENCY_BUCKETS = (
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.2,
+    0.3,
+    0.4,
+    0.5,
+    0.75,
+    1,
+    1.5,
+    2,
+    3,
+    4,
+    5,
+    7.5,
+    10,
+    15,
+    20,
+    30,
+)
+
+# Minutes held in memory before they are written
+BATCH_SIZE = 2000
+
+
+def aggregate_api_logs(apps, schema_editor):
+    """Count the logged API calls per endpoint and minute, keeping only failures
+
+    The calls are read in time order, so every minute before the current
+    call's is complete and can be written once enough have built up.
+    """
+    ApiLog = apps.get_model("theme_park_data", "ApiLog")
+    ApiCallMinute = apps.get_model("theme_park_data", "ApiCallMinute")
+
+    minutes = {}
+    calls = ApiLog.objects.order_by("timestamp", "pk").values_list(
+        "endpoint", "timestamp", "response_time", "success"
+    )
+    for endpoint, timestamp, response_time, success in calls.iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        minute = timestamp.replace(second=0, microsecond=0)
+        if len(minutes) >= BATCH_SIZE and (endpoint, minute) not in minutes:
+            done = [key for key in minutes if key[1] < minute]
+            ApiCallMinute.objects.bulk_create([minutes.pop(key) for key in done])
+        row = minutes.get((endpoint, minute))
+        if row is None:
+            row = minutes[(endpoint, minute)] = ApiCallMinute(
+                endpoint=endpoint,
+                minute=minute,
+                latency_histogram=[0] * (len(LATENCY_BUCKETS) + 1),
+            )
+        row.call_count += 1
+        row.error_count += 0 if success else 1
+        if response_time is not None:
+            row.latency_sum += response_time
+            row.latency_max = max(row.latency_max or 0.0, response_time)
+            row.latency_histogram[
+                bisect.bisect_left(LATENCY_BUCKETS, response_time)
+            ] += 1
+    ApiCallMinute.objects.bulk_create(minutes.values())
+    ApiLog.objects.filter(success=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0010_local_time_columns"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ApiCallMinute",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("endpoint", models.CharField(max_length=255)),
+                ("minute", models.DateTimeField()),
+                ("call_count", models.IntegerField(default=0)),
+                ("error_count", models.IntegerField(default=0)),
+                ("latency_sum", models.FloatField(default=0)),
+                ("latency_max", models.FloatField(blank=True, null=True)),
+                ("latency_histogram", models.JSONField(default=list)),
+            ],
+            options={
+                "ordering": ["-minute"],
+                "indexes": [models.Index(fields=["minute"], name="api_call_minute")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("endpoint", "minute"), name="unique_api_call_minute"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(aggregate_api_logs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("theme_park_data", "0011_api_call_minutes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestGeneration",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.BigIntegerField()),
+            ],
+        ),
+    ]
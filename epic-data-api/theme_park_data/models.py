@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils import timezone
 import json
+from .payloads import join_payloads
 
 
 class Park(models.Model):
@@ -41,6 +42,17 @@ class Show(models.Model):
         return f"{self.name} at {self.park.name}"
 
 
+class RawPayload(models.Model):
+    """Distinct live data payload, stored once and keyed by its content hash"""
+
+    digest = models.CharField(max_length=64, primary_key=True)
+    data = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.digest
+
+
 class AttractionStatus(models.Model):
     """Historical record of attraction status"""
 
@@ -52,14 +64,34 @@ class AttractionStatus(models.Model):
     standby_wait_time = models.IntegerField(null=True, blank=True)
     single_rider_wait_time = models.IntegerField(null=True, blank=True)
     last_updated = models.DateTimeField(null=True, blank=True)
+    # Park-local time of the timestamp, stamped at ingest so hourly and daily
+    # aggregations group on indexed columns instead of converting every row
+    local_date = models.DateField(null=True, blank=True)
+    local_hour = models.PositiveSmallIntegerField(null=True, blank=True)
+    # 0 is Monday, as in date.weekday()
+    local_weekday = models.PositiveSmallIntegerField(null=True, blank=True)
     raw_data = models.JSONField(null=True, blank=True)
+    payload = models.ForeignKey(
+        RawPayload, on_delete=models.PROTECT, null=True, blank=True, related_name="+"
+    )
+    schedule_payload = models.ForeignKey(
+        RawPayload, on_delete=models.PROTECT, null=True, blank=True, related_name="+"
+    )
 
     class Meta:
         ordering = ["-timestamp"]
         indexes = [
             models.Index(fields=["attraction", "timestamp"]),
+            models.Index(
+                fields=["attraction", "local_date", "local_hour"],
+                name="attraction_status_local",
+            ),
         ]
 
+    def get_raw_data(self):
+        """The live data item this status was recorded from"""
+        return join_payloads(self.raw_data, self.payload, self.schedule_payload)
+
     def __str__(self):
         return f"{self.attraction.name} - {self.status} - {self.timestamp}"
 
@@ -71,55 +103,306 @@ class ShowStatus(models.Model):
     timestamp = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=50)
     last_updated = models.DateTimeField(null=True, blank=True)
+    # Park-local time of the timestamp, stamped at ingest so hourly and daily
+    # aggregations group on indexed columns instead of converting every row
+    local_date = models.DateField(null=True, blank=True)
+    local_hour = models.PositiveSmallIntegerField(null=True, blank=True)
+    # 0 is Monday, as in date.weekday()
+    local_weekday = models.PositiveSmallIntegerField(null=True, blank=True)
     raw_data = models.JSONField(null=True, blank=True)
+    payload = models.ForeignKey(
+        RawPayload, on_delete=models.PROTECT, null=True, blank=True, related_name="+"
+    )
+    schedule_payload = models.ForeignKey(
+        RawPayload, on_delete=models.PROTECT, null=True, blank=True, related_name="+"
+    )
 
     class Meta:
         ordering = ["-timestamp"]
         indexes = [
             models.Index(fields=["show", "timestamp"]),
+            models.Index(
+                fields=["show", "local_date", "local_hour"], name="show_status_local"
+            ),
         ]
 
+    def get_raw_data(self):
+        """The live data item this status was recorded from"""
+        return join_payloads(self.raw_data, self.payload, self.schedule_payload)
+
     def __str__(self):
         return f"{self.show.name} - {self.status} - {self.timestamp}"
 
 
-class Showtime(models.Model):
-    """Individual showtime for a show"""
+class AttractionCurrentStatus(models.Model):
+    """Latest recorded status of an attraction, kept up to date at ingest"""
+
+    attraction = models.OneToOneField(
+        Attraction,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="current_status",
+    )
+    park = models.ForeignKey(Park, on_delete=models.CASCADE, related_name="+")
+    timestamp = models.DateTimeField()
+    status = models.CharField(max_length=50)
+    standby_wait_time = models.IntegerField(null=True, blank=True)
+    single_rider_wait_time = models.IntegerField(null=True, blank=True)
+    last_updated = models.DateTimeField(null=True, blank=True)
+    # Whether the attraction has ever reported a standby or single rider wait
+    reports_wait_times = models.BooleanField(default=False)
+    # When the current status began: the end of the last StatusTransition,
+    # or the first status recorded after a gap in the data
+    status_since = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Attraction current statuses"
 
+    def __str__(self):
+        return f"{self.attraction.name} - {self.status}"
+
+
+class ShowCurrentStatus(models.Model):
+    """Latest recorded status of a show, kept up to date at ingest"""
+
+    show = models.OneToOneField(
+        Show, on_delete=models.CASCADE, primary_key=True, related_name="current_status"
+    )
+    park = models.ForeignKey(Park, on_delete=models.CASCADE, related_name="+")
+    # Status tables are range-partitioned on PostgreSQL, where a primary key
+    # must include the partition column, so their ids cannot be referenced by
+    # database-level foreign keys; cascades are done by the ORM
     show_status = models.ForeignKey(
-        ShowStatus, on_delete=models.CASCADE, related_name="showtimes"
+        ShowStatus, on_delete=models.CASCADE, related_name="+", db_constraint=False
     )
-    type = models.CharField(max_length=100, null=True, blank=True)
+    timestamp = models.DateTimeField()
+    status = models.CharField(max_length=50)
+    last_updated = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Show current statuses"
+
+    def __str__(self):
+        return f"{self.show.name} - {self.status}"
+
+
+class Showtime(models.Model):
+    """A scheduled showtime of a show
+
+    Stored once per show, type and start time and upserted by every ingest
+    that records the show, rather than copied onto each status row.
+    ``first_seen`` and ``last_seen`` are when a payload last listed it.
+    """
+
+    show = models.ForeignKey(Show, on_delete=models.CASCADE, related_name="showtimes")
+    type = models.CharField(max_length=100, blank=True, default="")
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(null=True, blank=True)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["start_time"]
+        constraints = [
+            # Includes start_time, the partition column on PostgreSQL
+            models.UniqueConstraint(
+                fields=["show", "type", "start_time"], name="unique_showtime"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["show", "start_time"], name="showtime_show_start"),
+        ]
 
     def __str__(self):
-        return f"{self.show_status.show.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
+        return f"{self.show.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
 
 
 class OperatingHours(models.Model):
-    """Operating hours for an attraction"""
+    """A scheduled operating period of an attraction
 
-    attraction_status = models.ForeignKey(
-        AttractionStatus, on_delete=models.CASCADE, related_name="operating_hours"
+    Stored once per attraction, type and start time, like Showtime.
+    """
+
+    attraction = models.ForeignKey(
+        Attraction, on_delete=models.CASCADE, related_name="operating_hours"
     )
-    type = models.CharField(max_length=100, null=True, blank=True)
+    type = models.CharField(max_length=100, blank=True, default="")
     start_time = models.DateTimeField()
     end_time = models.DateTimeField(null=True, blank=True)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ["start_time"]
         verbose_name_plural = "Operating hours"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["attraction", "type", "start_time"],
+                name="unique_operating_hours",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.attraction.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
+
+
+class AttractionWaitRollup(models.Model):
+    """Standby wait statistics for an attraction over one park-local hour
+
+    Each status row counts from its timestamp until the next row (at most the
+    status validity), split across the hours it spans, so averages are time
+    weighted: ``wait_sum`` is wait minutes times seconds and
+    ``covered_seconds`` the seconds with a known wait. ``wait_sketch`` is a
+    mergeable quantile sketch of the waits weighted the same way (see
+    ``sketches``), so percentiles over any range of hours come from merging
+    sketches rather than reading statuses.
+    """
+
+    attraction = models.ForeignKey(
+        Attraction, on_delete=models.CASCADE, related_name="wait_rollups"
+    )
+    local_date = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    # 0 is Monday, as in date.weekday()
+    weekday = models.PositiveSmallIntegerField()
+    sample_count = models.IntegerField(default=0)
+    covered_seconds = models.FloatField(default=0)
+    wait_sum = models.FloatField(default=0)
+    min_wait = models.IntegerField(null=True, blank=True)
+    max_wait = models.IntegerField(null=True, blank=True)
+    wait_sketch = models.BinaryField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["local_date", "hour"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["attraction", "local_date", "hour"],
+                name="unique_attraction_wait_rollup",
+            ),
+        ]
+
+    @property
+    def average_wait(self):
+        if not self.covered_seconds:
+            return None
+        return self.wait_sum / self.covered_seconds
+
+    def __str__(self):
+        return f"{self.attraction.name} - {self.local_date} {self.hour:02d}:00"
+
+
+class AttractionStatusSummary(models.Model):
+    """Compacted attraction statuses over one 15-minute or one-hour UTC bucket
+
+    Written by the compaction job in place of raw AttractionStatus rows that
+    are old enough. Like the rollups, totals are time weighted: each status
+    holds until the next one (at most the status validity), ``*_sum`` fields
+    are wait minutes times seconds and ``*_seconds`` fields the seconds they
+    cover. The ``last_*`` fields keep the last status recorded in the bucket,
+    which still applies at the start of the next one.
+    """
+
+    RESOLUTION_QUARTER_HOUR = 900
+    RESOLUTION_HOUR = 3600
+
+    attraction = models.ForeignKey(
+        Attraction, on_delete=models.CASCADE, related_name="status_summaries"
+    )
+    # Bucket length in seconds
+    resolution = models.PositiveIntegerField()
+    bucket_start = models.DateTimeField()
+    sample_count = models.IntegerField(default=0)
+    covered_seconds = models.FloatField(default=0)
+    operating_seconds = models.FloatField(default=0)
+    standby_seconds = models.FloatField(default=0)
+    standby_sum = models.FloatField(default=0)
+    standby_min = models.IntegerField(null=True, blank=True)
+    standby_max = models.IntegerField(null=True, blank=True)
+    single_rider_seconds = models.FloatField(default=0)
+    single_rider_sum = models.FloatField(default=0)
+    single_rider_min = models.IntegerField(null=True, blank=True)
+    single_rider_max = models.IntegerField(null=True, blank=True)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=50, null=True, blank=True)
+    last_standby_wait_time = models.IntegerField(null=True, blank=True)
+    last_single_rider_wait_time = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["bucket_start"]
+        verbose_name_plural = "Attraction status summaries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["attraction", "resolution", "bucket_start"],
+                name="unique_attraction_status_summary",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["attraction", "bucket_start"]),
+        ]
+
+    @property
+    def average_standby_wait(self):
+        if not self.standby_seconds:
+            return None
+        return self.standby_sum / self.standby_seconds
+
+    @property
+    def average_single_rider_wait(self):
+        if not self.single_rider_seconds:
+            return None
+        return self.single_rider_sum / self.single_rider_seconds
+
+    @property
+    def operating_fraction(self):
+        if not self.covered_seconds:
+            return None
+        return self.operating_seconds / self.covered_seconds
+
+    def __str__(self):
+        return f"{self.attraction.name} - {self.bucket_start} ({self.resolution}s)"
+
+
+class StatusTransition(models.Model):
+    """A period an attraction spent in one status, written when it ended
+
+    Ingest writes one row each time an attraction's status flips, covering
+    ``started`` to ``ended`` in ``from_status``. When no status arrives within
+    the status validity the period ends there with ``to_status`` empty, so
+    gaps in the data are not counted as time in any status. The period still
+    in progress is the attraction's current status, from ``status_since``.
+    """
+
+    attraction = models.ForeignKey(
+        Attraction, on_delete=models.CASCADE, related_name="status_transitions"
+    )
+    park = models.ForeignKey(Park, on_delete=models.CASCADE, related_name="+")
+    from_status = models.CharField(max_length=50)
+    to_status = models.CharField(max_length=50, null=True, blank=True)
+    started = models.DateTimeField()
+    ended = models.DateTimeField()
+
+    class Meta:
+        ordering = ["ended"]
+        indexes = [
+            models.Index(
+                fields=["attraction", "ended"], name="transition_attraction_ended"
+            ),
+            models.Index(fields=["park", "ended"], name="transition_park_ended"),
+        ]
+
+    @property
+    def duration(self):
+        return self.ended - self.started
 
     def __str__(self):
-        return f"{self.attraction_status.attraction.name} - {self.start_time.strftime('%Y-%m-%d %H:%M')}"
+        return f"{self.attraction.name} - {self.from_status} -> {self.to_status} at {self.ended}"
 
 
 class ApiLog(models.Model):
-    """Log of API calls"""
+    """Log of failed API calls
+
+    Successful calls are only counted in ApiCallMinute.
+    """
 
     timestamp = models.DateTimeField(default=timezone.now)
     endpoint = models.CharField(max_length=255)
@@ -133,3 +416,54 @@ class ApiLog(models.Model):
 
     def __str__(self):
         return f"{self.endpoint} - {self.timestamp} - {'Success' if self.success else 'Failed'}"
+
+
+class ApiCallMinute(models.Model):
+    """API calls to one endpoint during one UTC minute
+
+    ``latency_histogram`` holds the number of calls in each of the
+    ``telemetry.LATENCY_BUCKETS`` response time buckets, plus one count for
+    slower calls.
+    """
+
+    endpoint = models.CharField(max_length=255)
+    minute = models.DateTimeField()
+    call_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    latency_sum = models.FloatField(default=0)  # in seconds
+    latency_max = models.FloatField(null=True, blank=True)
+    latency_histogram = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ["-minute"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["endpoint", "minute"], name="unique_api_call_minute"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["minute"], name="api_call_minute"),
+        ]
+
+    @property
+    def average_latency(self):
+        if not self.call_count:
+            return None
+        return self.latency_sum / self.call_count
+
+    def __str__(self):
+        return f"{self.endpoint} - {self.minute} - {self.call_count} calls"
+
+
+class IngestGeneration(models.Model):
+    """Counter bumped by every ingest, the source of the cache generation
+
+    A single row. The shared cache holds a copy for cheap reads, and is
+    refilled from here when the copy is evicted, so the counter never
+    restarts or hands out the same value twice.
+    """
+
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return str(self.value)
@@ -0,0 +1,313 @@
+import logging
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from .models import ApiLog, AttractionStatus, OperatingHours, ShowStatus, Showtime
+
+logger = logging.getLogger(__name__)
+
+# Model -> column its table is range-partitioned on (PostgreSQL only)
+PARTITIONED_MODELS = {
+    AttractionStatus: "timestamp",
+    ShowStatus: "timestamp",
+    OperatingHours: "start_time",
+    Showtime: "start_time",
+    ApiLog: "timestamp",
+}
+
+PARTITION_INTERVALS = ("day", "month")
+EXPIRED_ACTIONS = ("detach", "drop")
+
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def supports_partitioning(conn=None):
+    return (conn or connection).vendor == "postgresql"
+
+
+def interval_start(moment, interval):
+    """Start of the UTC day or month containing ``moment``"""
+    moment = moment.astimezone(dt_timezone.utc)
+    day = moment.date()
+    if interval == "month":
+        day = day.replace(day=1)
+    return datetime.combine(day, time.min, dt_timezone.utc)
+
+
+def next_interval(start, interval):
+    if interval == "month":
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def partition_name(table, start):
+    return f"{table}_p{start:%Y%m%d}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = %s AND pg_table_is_visible(c.oid))",
+        [table],
+    )
+    return cursor.fetchone()[0]
+
+
+def list_partitions(cursor, table):
+    """Range partitions of a table as ``(name, start, end)``, oldest first
+
+    The default partition is left out.
+    """
+    cursor.execute(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass",
+        [table],
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        match = _BOUND.search(bound or "")
+        if match is None:
+            continue
+        start, end = (parse_datetime(value) for value in match.groups())
+        partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def planned_ranges(existing, first, last, interval):
+    """Partition ranges needed so that ``first`` up to ``last`` is covered
+
+    Ranges follow ``interval`` boundaries but are trimmed around existing
+    partitions, which may have been created with another interval.
+    """
+    ranges = []
+    start = interval_start(first, interval)
+    while start < last:
+        end = next_interval(start, interval)
+        range_start, range_end = start, end
+        for _, existing_start, existing_end in existing:
+            if existing_start <= range_start < existing_end:
+                range_start = existing_end
+        for _, existing_start, existing_end in existing:
+            if range_start < existing_start < range_end:
+                range_end = existing_start
+        if range_start < range_end:
+            ranges.append((range_start, range_end))
+        start = end
+    return ranges
+
+
+def create_partition(cursor, table, column, start, end):
+    """Add a partition for start..end to a partitioned table
+
+    The partition is built as a separate table, filled with any rows for its
+    range that had landed in the default partition, and then attached, which
+    only takes a SHARE UPDATE EXCLUSIVE lock on the parent so reads and
+    inserts carry on. Attaching also creates its primary key, indexes and
+    foreign keys from the parent's.
+    """
+    quote = connection.ops.quote_name
+    name = partition_name(table, start)
+    default = default_partition_name(table)
+    with transaction.atomic():
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} "
+            f"(LIKE {quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(default)} "
+            f"WHERE {quote(column)} >= %s AND {quote(column)} < %s RETURNING *) "
+            f"INSERT INTO {quote(name)} SELECT * FROM moved",
+            [start, end],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    return name
+
+
+def ensure_partitions(model, now, ahead, interval, dry_run=False):
+    """Create the partitions of the current and the next ``ahead`` intervals
+
+    Returns the names of the partitions created (or that would be).
+    """
+    table = model._meta.db_table
+    column = model._meta.get_field(PARTITIONED_MODELS[model]).column
+    last = interval_start(now, interval)
+    for _ in range(ahead + 1):
+        last = next_interval(last, interval)
+    created = []
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return created
+        existing = list_partitions(cursor, table)
+        for start, end in planned_ranges(existing, now, last, interval):
+            if not dry_run:
+                create_partition(cursor, table, column, start, end)
+            created.append(partition_name(table, start))
+    return created
+
+
+def unconstrained_references(model):
+    """Foreign keys to ``model`` that the database does not enforce
+
+    Partitioned ids cannot be referenced by database-level foreign keys, so
+    nothing stops a partition holding a referenced row from being dropped.
+    """
+    return [
+        relation.field
+        for relation in model._meta.get_fields(include_hidden=True)
+        if relation.one_to_many
+        and relation.auto_created
+        and not relation.field.db_constraint
+    ]
+
+
+def is_referenced(cursor, model, partition):
+    """Whether a row of ``partition`` is still the target of such a key"""
+    quote = connection.ops.quote_name
+    pk_column = model._meta.pk.column
+    for field in unconstrained_references(model):
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {quote(partition)} "
+            f"WHERE {quote(pk_column)} IN (SELECT {quote(field.column)} "
+            f"FROM {quote(field.model._meta.db_table)}))"
+        )
+        if cursor.fetchone()[0]:
+            return True
+    return False
+
+
+def expire_partitions(model, cutoff, action, dry_run=False):
+    """Detach or drop the partitions that end on or before ``cutoff``
+
+    Detached partitions are left as ordinary tables, to be archived or
+    dropped by hand. Partitions holding a row that is still referenced,
+    such as a show's current status, are kept until it is replaced.
+    Returns the names of the partitions affected.
+    """
+    table = model._meta.db_table
+    quote = connection.ops.quote_name
+    expired = []
+    with connection.cursor() as cursor:
+        if not is_partitioned(cursor, table):
+            return expired
+        for name, start, end in list_partitions(cursor, table):
+            if end > cutoff:
+                continue
+            if is_referenced(cursor, model, name):
+                logger.info(f"Keeping partition {name}, its rows are still in use")
+                continue
+            if not dry_run:
+                if action == "drop":
+                    cursor.execute(f"DROP TABLE {quote(name)}")
+                else:
+                    cursor.execute(
+                        f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}"
+                    )
+            expired.append(name)
+    return expired
+
+
+def partition_table(schema_editor, model, column, interval, ahead, now):
+    """Turn an existing table into one range-partitioned on ``column``
+
+    The rows are copied into a new partitioned table with a partition per
+    interval from the oldest row up to ``ahead`` intervals from now, plus a
+    default partition for anything outside them. Indexes and foreign keys
+    are recreated under their old names on the partitioned table, so each
+    partition gets its own copy of them, and the primary key becomes
+    ``(id, column)`` as PostgreSQL requires. Ids keep coming from a sequence
+    that continues after the highest copied id.
+    """
+    table = model._meta.db_table
+    pk_column = model._meta.pk.column
+    old_table = f"{table}_unpartitioned"
+    quote = schema_editor.quote_name
+
+    with schema_editor.connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return
+        cursor.execute(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'p'",
+            [table],
+        )
+        pk_name = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname <> %s",
+            [table, pk_name],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            f"SELECT MIN({quote(column)}), MAX({quote(column)}), "
+            f"MAX({quote(pk_column)}) FROM {quote(table)}"
+        )
+        first, last, max_id = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(old_table)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({quote(column)})"
+        )
+        # The old id default belongs to the old table's sequence
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk_column)} DROP DEFAULT"
+        )
+        cursor.execute(
+            f"CREATE TABLE {quote(default_partition_name(table))} "
+            f"PARTITION OF {quote(table)} DEFAULT"
+        )
+        horizon = interval_start(now, interval)
+        for _ in range(ahead + 1):
+            horizon = next_interval(horizon, interval)
+        if last is not None and last >= horizon:
+            horizon = next_interval(interval_start(last, interval), interval)
+        for start, end in planned_ranges([], first or now, horizon, interval):
+            cursor.execute(
+                f"CREATE TABLE {quote(partition_name(table, start))} "
+                f"PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+                [start, end],
+            )
+
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old_table)}")
+        cursor.execute(f"DROP TABLE {quote(old_table)}")
+
+        sequence = f"{table}_{pk_column}_seq"
+        cursor.execute(
+            f"CREATE SEQUENCE {quote(sequence)} "
+            f"OWNED BY {quote(table)}.{quote(pk_column)}"
+        )
+        if max_id is not None:
+            cursor.execute("SELECT setval(%s, %s)", [sequence, max_id])
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk_column)} "
+            f"SET DEFAULT nextval(%s)",
+            [sequence],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(pk_name)} "
+            f"PRIMARY KEY ({quote(pk_column)}, {quote(column)})"
+        )
+        for name, definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(
+                f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}"
+            )
@@ -0,0 +1,38 @@
+import hashlib
+import json
+
+# Item keys whose values only change when the park publishes a new schedule,
+# stored apart from the rest of the item so a whole day shares one copy
+SCHEDULE_KEYS = ("operatingHours", "showtimes", "forecast")
+
+
+def canonical_json(data):
+    """Serialize data to a stable string so equal payloads hash equally"""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def payload_digest(data):
+    """SHA-256 hex digest of the canonical JSON form of data"""
+    return hashlib.sha256(canonical_json(data).encode("utf-8")).hexdigest()
+
+
+def split_item(item):
+    """Split a live data item into its volatile part and its schedule part
+
+    The schedule part is None when the item carries no schedule keys.
+    """
+    volatile = {key: value for key, value in item.items() if key not in SCHEDULE_KEYS}
+    schedule = {key: item[key] for key in SCHEDULE_KEYS if key in item}
+    return volatile, schedule or None
+
+
+def join_payloads(raw_data, payload, schedule_payload):
+    """Rebuild a live data item from inline raw data or its stored payloads"""
+    if raw_data is not None:
+        return raw_data
+    if payload is None:
+        return None
+    item = dict(payload.data)
+    if schedule_payload is not None:
+        item.update(schedule_payload.data)
+    return item
@@ -0,0 +1,120 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (ValueError, TypeError):
+        return None
+
+
+def operating_windows(data):
+    """(start, end) pairs from every operatingHours entry in a live payload"""
+    windows = set()
+    for item in data.get("liveData", []):
+        for hours in item.get("operatingHours") or []:
+            start = _parse_datetime(hours.get("startTime"))
+            end = _parse_datetime(hours.get("endTime"))
+            if start and end and start.tzinfo and end.tzinfo:
+                windows.add((start, end))
+    return sorted(windows)
+
+
+class PollingPolicy:
+    """Choose how long to wait before polling a park again
+
+    Polls run at the base interval while the park is open, as read from the
+    operatingHours in its latest payload (widened by a margin on both
+    sides), and at the fast interval when a large share of attractions
+    changed status or wait since the previous poll. Outside operating hours
+    the interval stretches to the closed interval, but never past the
+    margin before the next known opening. Parks whose payload carries no
+    operating hours are polled at the base interval.
+    """
+
+    def __init__(
+        self,
+        base_interval=None,
+        fast_interval=None,
+        closed_interval=None,
+        margin=None,
+        change_fraction=None,
+        adaptive=None,
+    ):
+        self.adaptive = (
+            settings.THEME_PARK_ADAPTIVE_POLLING if adaptive is None else adaptive
+        )
+        self.base_interval = base_interval or settings.THEME_PARK_POLL_INTERVAL_SECONDS
+        self.fast_interval = (
+            fast_interval or settings.THEME_PARK_FAST_POLL_INTERVAL_SECONDS
+        )
+        self.closed_interval = (
+            closed_interval or settings.THEME_PARK_CLOSED_POLL_INTERVAL_SECONDS
+        )
+        self.margin = timedelta(
+            minutes=margin or settings.THEME_PARK_POLL_HOURS_MARGIN_MINUTES
+        )
+        self.change_fraction = (
+            change_fraction or settings.THEME_PARK_FAST_POLL_CHANGE_FRACTION
+        )
+        # Status and standby wait per attraction from each park's last payload
+        self._last_states = {}
+        self._lock = threading.Lock()
+
+    def next_interval(self, entity_id, data, now=None):
+        """Seconds until the next poll of a park, given the payload just fetched
+
+        ``data`` is None when the fetch failed, in which case the park is
+        retried at the base interval.
+        """
+        if not data or not self.adaptive:
+            return self.base_interval
+        now = now or timezone.now()
+
+        changed = self._changed_fraction(entity_id, data)
+        windows = operating_windows(data)
+        if not windows:
+            return self.base_interval
+
+        for start, end in windows:
+            if start - self.margin <= now < end + self.margin:
+                if changed >= self.change_fraction:
+                    return self.fast_interval
+                return self.base_interval
+
+        interval = self.closed_interval
+        upcoming = [start - self.margin for start, end in windows if start > now]
+        if upcoming:
+            until_open = (min(upcoming) - now).total_seconds()
+            interval = min(interval, max(until_open, self.base_interval))
+        return interval
+
+    def _changed_fraction(self, entity_id, data):
+        """Share of attractions whose status or standby wait changed"""
+        states = {}
+        for item in data.get("liveData", []):
+            if item.get("entityType") != "ATTRACTION":
+                continue
+            standby = (item.get("queue") or {}).get("STANDBY") or {}
+            states[item.get("id")] = (item.get("status"), standby.get("waitTime"))
+
+        with self._lock:
+            previous = self._last_states.get(entity_id)
+            self._last_states[entity_id] = states
+
+        if not previous or not states:
+            return 0.0
+        changed = sum(
+            1
+            for attraction_id, state in states.items()
+            if previous.get(attraction_id) != state
+        )
+        return changed / len(states)
@@ -0,0 +1,72 @@
+import threading
+from django.db import transaction
+from .models import Attraction, Park, Show
+
+# Entity model -> metadata columns written from live data payloads
+ENTITY_FIELDS = {
+    Park: ["name", "entity_type", "timezone"],
+    Attraction: ["park", "name", "entity_type", "external_id"],
+    Show: ["park", "name", "entity_type", "external_id"],
+}
+
+
+def fingerprint(entity):
+    """The metadata of an entity as it would be written, comparable by value"""
+    return tuple(
+        str(entity.serializable_value(field)) for field in ENTITY_FIELDS[type(entity)]
+    )
+
+
+class EntityRegistry:
+    """Metadata fingerprints of the parks, attractions and shows this process wrote
+
+    Names, types and external ids almost never change, so ingest only writes
+    an entity when it is new to the process or its fingerprint differs from
+    the one last written. Everything else reuses the primary key from the
+    payload, and statuses are created against it without loading the entity.
+    Fingerprints are recorded once the write commits, so a rolled back
+    ingest writes its entities again next time.
+    """
+
+    def __init__(self):
+        self._fingerprints = {}
+        # Parks are ingested on several threads at once
+        self._lock = threading.Lock()
+
+    def save(self, model, entities):
+        """Upsert the entities whose metadata changed; returns the number written"""
+        changed = {}
+        with self._lock:
+            for entity in entities:
+                key = (model, str(entity.pk))
+                value = fingerprint(entity)
+                if self._fingerprints.get(key) != value:
+                    changed[key] = (entity, value)
+        if not changed:
+            return 0
+
+        model.objects.bulk_create(
+            [entity for entity, value in changed.values()],
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=ENTITY_FIELDS[model],
+        )
+        transaction.on_commit(lambda: self._remember(changed))
+        return len(changed)
+
+    def _remember(self, changed):
+        with self._lock:
+            for key, (entity, value) in changed.items():
+                self._fingerprints[key] = value
+
+    def forget(self, model, pk):
+        """Write the entity again next time, e.g. after a write against it failed"""
+        with self._lock:
+            self._fingerprints.pop((model, str(pk)), None)
+
+    def clear(self):
+        with self._lock:
+            self._fingerprints.clear()
+
+
+entity_registry = EntityRegistry()
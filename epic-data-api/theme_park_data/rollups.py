@@ -0,0 +1,307 @@
+import logging
+import zoneinfo
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+from . import sketches
+from .models import AttractionStatus, AttractionWaitRollup
+
+logger = logging.getLogger(__name__)
+
+# Report grouping -> park-local column of the status rows it groups on
+REPORT_GROUPS = {"date": "local_date", "hour": "local_hour", "weekday": "local_weekday"}
+
+# Polls drift by a few seconds, so a heartbeat row is written by a poll
+# arriving up to this long before the heartbeat is due, and a row stays
+# valid for this long after it
+HEARTBEAT_TOLERANCE = timedelta(minutes=1)
+
+
+def heartbeat_due():
+    """How long after the last stored row an unchanged status is stored again"""
+    return (
+        timedelta(minutes=settings.THEME_PARK_STATUS_HEARTBEAT_MINUTES)
+        - HEARTBEAT_TOLERANCE
+    )
+
+
+def status_validity():
+    """How long a status row is assumed to hold when no newer row follows it
+
+    With delta recording a row stays valid until the next one, and a heartbeat
+    row is written at least this often, so longer gaps mean missing data.
+    """
+    return (
+        timedelta(minutes=settings.THEME_PARK_STATUS_HEARTBEAT_MINUTES)
+        + HEARTBEAT_TOLERANCE
+    )
+
+
+def park_timezone(name):
+    """Time zone with the given name, falling back to the project time zone"""
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError, TypeError):
+        return timezone.get_default_timezone()
+
+
+def stamp_local_time(status, tz):
+    """Set a status row's park-local date, hour and weekday from its timestamp"""
+    local = status.timestamp.astimezone(tz)
+    status.local_date = local.date()
+    status.local_hour = local.hour
+    status.local_weekday = local.weekday()
+    return status
+
+
+def hour_segments(start, end, tz):
+    """Split ``start``..``end`` at local hour boundaries
+
+    Yields ``(local_date, hour, weekday, seconds)`` for each hour the span
+    touches.
+    """
+    cursor = start
+    while cursor < end:
+        local = cursor.astimezone(tz)
+        next_hour = cursor + timedelta(
+            minutes=60 - local.minute,
+            seconds=-local.second,
+            microseconds=-local.microsecond,
+        )
+        segment_end = min(next_hour, end)
+        yield (
+            local.date(),
+            local.hour,
+            local.weekday(),
+            (segment_end - cursor).total_seconds(),
+        )
+        cursor = segment_end
+
+
+def add_interval(buckets, attraction_id, start, end, wait_time, tz):
+    """Add one status interval to in-memory rollup buckets
+
+    ``buckets`` maps ``(attraction_id, local_date, hour)`` to
+    ``[weekday, sample_count, covered_seconds, wait_sum, min_wait, max_wait,
+    seconds_by_wait]``, the last a ``{wait_time: seconds}`` dict that becomes
+    the hour's quantile sketch. Intervals without a standby wait are not
+    counted.
+    """
+    if wait_time is None:
+        return
+    for local_date, hour, weekday, seconds in hour_segments(start, end, tz):
+        if seconds <= 0:
+            continue
+        bucket = buckets.get((attraction_id, local_date, hour))
+        if bucket is None:
+            buckets[(attraction_id, local_date, hour)] = [
+                weekday,
+                1,
+                seconds,
+                wait_time * seconds,
+                wait_time,
+                wait_time,
+                {wait_time: seconds},
+            ]
+        else:
+            bucket[1] += 1
+            bucket[2] += seconds
+            bucket[3] += wait_time * seconds
+            bucket[4] = min(bucket[4], wait_time)
+            bucket[5] = max(bucket[5], wait_time)
+            bucket[6][wait_time] = bucket[6].get(wait_time, 0) + seconds
+
+
+def closed_intervals(rows, max_gap):
+    """``(start, end, wait_time)`` for each row that has a successor
+
+    ``rows`` are ``(timestamp, wait_time)`` pairs in ascending order. Each row
+    holds until the next one, at most ``max_gap``. The last row is still
+    current, so its interval is only closed once the next row arrives.
+    """
+    for (timestamp, wait_time), (next_timestamp, _) in zip(rows, rows[1:]):
+        yield timestamp, min(next_timestamp, timestamp + max_gap), wait_time
+
+
+def save_buckets(buckets):
+    """Merge in-memory buckets into the stored rollups
+
+    Existing rows for the same attraction, date and hour are read once and
+    combined with the new totals and their sketches merged with the new
+    waits, then everything is written with a single upsert. Call inside the
+    transaction that stores the statuses.
+    """
+    if not buckets:
+        return 0
+
+    attraction_ids = {key[0] for key in buckets}
+    dates = {key[1] for key in buckets}
+    # Ingest builds attractions with string ids, so compare ids as strings
+    existing = {
+        (str(rollup.attraction_id), rollup.local_date, rollup.hour): rollup
+        for rollup in AttractionWaitRollup.objects.filter(
+            attraction_id__in=attraction_ids, local_date__in=dates
+        )
+    }
+
+    rollups = []
+    for key, bucket in buckets.items():
+        weekday, count, seconds, wait_sum, min_wait, max_wait, waits = bucket
+        attraction_id, local_date, hour = key
+        sketch = sketches.from_weights(waits)
+        rollup = existing.get((str(attraction_id), local_date, hour))
+        if rollup is not None:
+            count += rollup.sample_count
+            seconds += rollup.covered_seconds
+            wait_sum += rollup.wait_sum
+            if rollup.min_wait is not None:
+                min_wait = min(min_wait, rollup.min_wait)
+            if rollup.max_wait is not None:
+                max_wait = max(max_wait, rollup.max_wait)
+            sketch = sketches.merge([sketch, sketches.decode(rollup.wait_sketch)])
+        rollups.append(
+            AttractionWaitRollup(
+                attraction_id=attraction_id,
+                local_date=local_date,
+                hour=hour,
+                weekday=weekday,
+                sample_count=count,
+                covered_seconds=seconds,
+                wait_sum=wait_sum,
+                min_wait=min_wait,
+                max_wait=max_wait,
+                wait_sketch=sketches.encode(sketch),
+            )
+        )
+
+    AttractionWaitRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=["attraction", "local_date", "hour"],
+        update_fields=[
+            "weekday",
+            "sample_count",
+            "covered_seconds",
+            "wait_sum",
+            "min_wait",
+            "max_wait",
+            "wait_sketch",
+        ],
+    )
+    return len(rollups)
+
+
+def wait_profile(
+    attraction, days=7, group_by="hour", now=None, percentiles=(), end_date=None
+):
+    """Average, minimum and maximum standby wait by local hour or weekday
+
+    Reads the rollups for the ``days`` park-local days up to ``end_date``
+    (default today, included) and, when the window reaches today, adds the
+    still-open interval of the attraction's current status, so the result is
+    current without scanning raw history. ``percentiles`` (0 to 100) are
+    answered by merging the rollups' quantile sketches of each group.
+    Returns ``{hour_or_weekday: {"average", "min", "max", "percentiles"}}``
+    in key order, ``percentiles`` mapping each requested percentile to a wait.
+    """
+    now = now or timezone.now()
+    tz = park_timezone(attraction.park.timezone)
+    today = now.astimezone(tz).date()
+    last_date = min(end_date or today, today)
+    first_date = last_date - timedelta(days=days - 1)
+    rollups = AttractionWaitRollup.objects.filter(
+        attraction=attraction, local_date__gte=first_date, local_date__lte=last_date
+    )
+
+    totals = {
+        row[group_by]: [
+            row["seconds"],
+            row["wait_sum"],
+            row["min_wait"],
+            row["max_wait"],
+        ]
+        for row in rollups.values(group_by)
+        .annotate(
+            seconds=Sum("covered_seconds"),
+            wait_sum=Sum("wait_sum"),
+            min_wait=Min("min_wait"),
+            max_wait=Max("max_wait"),
+        )
+        .order_by()
+    }
+    groups = {}
+    if percentiles:
+        rows = list(
+            rollups.filter(wait_sketch__isnull=False).values_list(
+                group_by, "wait_sketch"
+            )
+        )
+        groups = {
+            key: [sketch]
+            for key, sketch in sketches.merge_groups(
+                [row[0] for row in rows], [row[1] for row in rows]
+            ).items()
+        }
+
+    current = getattr(attraction, "current_status", None)
+    if current is not None and last_date == today:
+        buckets = {}
+        add_interval(
+            buckets,
+            attraction.id,
+            current.timestamp,
+            min(now, current.timestamp + status_validity()),
+            current.standby_wait_time,
+            tz,
+        )
+        for (_, local_date, hour), bucket in buckets.items():
+            if local_date < first_date:
+                continue
+            key = hour if group_by == "hour" else bucket[0]
+            total = totals.setdefault(key, [0, 0, None, None])
+            total[0] += bucket[2]
+            total[1] += bucket[3]
+            total[2] = bucket[4] if total[2] is None else min(total[2], bucket[4])
+            total[3] = bucket[5] if total[3] is None else max(total[3], bucket[5])
+            groups.setdefault(key, []).append(sketches.from_weights(bucket[6]))
+
+    fractions = [percentile / 100 for percentile in percentiles]
+    profile = {}
+    for key, total in sorted(totals.items()):
+        if not total[0]:
+            continue
+        values = sketches.quantiles(sketches.merge(groups.get(key, [])), fractions)
+        profile[key] = {
+            "average": total[1] / total[0],
+            "min": total[2],
+            "max": total[3],
+            "percentiles": dict(zip(percentiles, values)),
+        }
+    return profile
+
+
+def status_reports(attraction, first_date, last_date, group_by="date"):
+    """Status rows recorded per park-local date, hour or weekday, by status
+
+    Groups on the local time columns stamped at ingest, so the count is a
+    range scan of the (attraction, local_date, local_hour) index rather than
+    a time zone conversion of every row. With delta recording a row is a
+    change or a heartbeat, so the counts show when statuses changed and
+    where recording had gaps. Returns ``{key: {status: rows}}`` in key order.
+    """
+    column = REPORT_GROUPS[group_by]
+    rows = (
+        AttractionStatus.objects.filter(
+            attraction=attraction,
+            local_date__gte=first_date,
+            local_date__lte=last_date,
+        )
+        .values_list(column, "status")
+        .annotate(rows=Count("id"))
+        .order_by(column, "status")
+    )
+    reports = {}
+    for key, status, count in rows:
+        reports.setdefault(key, {})[status] = count
+    return reports
@@ -0,0 +1,63 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from .models import OperatingHours, Showtime
+
+# Model -> entity field its entries are keyed by, with type and start time
+SCHEDULE_ENTITY_FIELDS = {OperatingHours: "attraction", Showtime: "show"}
+
+# Refreshed when an entry that is already stored is seen again
+SCHEDULE_UPDATE_FIELDS = ["end_time", "last_seen"]
+
+
+def save_schedule(model, entries):
+    """Upsert OperatingHours or Showtime entries
+
+    Entries are keyed by entity, type and start time, so the schedule a
+    payload repeats every poll is stored once and only its end time and
+    ``last_seen`` move. Returns the number of entries written.
+    """
+    entity_field = SCHEDULE_ENTITY_FIELDS[model]
+    # One row per key: the database rejects an upsert that touches a row twice
+    unique = {
+        (str(getattr(entry, f"{entity_field}_id")), entry.type, entry.start_time): entry
+        for entry in entries
+    }
+    if not unique:
+        return 0
+    model.objects.bulk_create(
+        unique.values(),
+        update_conflicts=True,
+        unique_fields=[entity_field, "type", "start_time"],
+        update_fields=SCHEDULE_UPDATE_FIELDS,
+    )
+    return len(unique)
+
+
+def upcoming_showtimes(shows, now, limit):
+    """The next ``limit`` showtimes of each of ``shows`` after ``now``
+
+    Only showtimes in the show's latest stored payload count: their
+    ``last_seen`` is the time of the show's current status, so entries a
+    later payload moved or dropped are left out. Uses one query: the
+    showtimes are numbered per show in start order by a window function,
+    which the (show, start_time) index serves.
+    Returns ``{show_id: [Showtime, ...]}``.
+    """
+    showtimes = (
+        Showtime.objects.filter(
+            show__in=shows,
+            start_time__gt=now,
+            last_seen__gte=F("show__current_status__timestamp"),
+        )
+        .annotate(
+            position=Window(
+                RowNumber(), partition_by=[F("show_id")], order_by=F("start_time").asc()
+            )
+        )
+        .filter(position__lte=limit)
+        .order_by("show_id", "start_time")
+    )
+    upcoming = {}
+    for showtime in showtimes:
+        upcoming.setdefault(showtime.show_id, []).append(showtime)
+    return upcoming
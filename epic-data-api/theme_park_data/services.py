@@ -2,7 +2,9 @@ import requests
 import logging
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from django.db import connection, transaction
 from django.utils import timezone
 from django.conf import settings
 from .models import (
@@ -11,20 +13,76 @@ from .models import (
     Show,
     AttractionStatus,
     ShowStatus,
+    AttractionCurrentStatus,
+    ShowCurrentStatus,
     Showtime,
     OperatingHours,
-    ApiLog,
+    RawPayload,
+    StatusTransition,
 )
+from .payloads import payload_digest, split_item
+from .registry import entity_registry
+from .api_client import get_default_client
+from .events import attraction_change, publish_changes, show_change
+from .forecasting import refresh_forecasts
+from .rollups import (
+    add_interval,
+    heartbeat_due,
+    park_timezone,
+    save_buckets,
+    stamp_local_time,
+    status_validity,
+)
+from .schedules import save_schedule
+from .telemetry import api_calls
+from .transitions import period_start, status_transition
 
 logger = logging.getLogger(__name__)
 
+# Status fields compared when deciding whether a new status row is needed
+ATTRACTION_DELTA_FIELDS = (
+    "status",
+    "standby_wait_time",
+    "single_rider_wait_time",
+    "last_updated",
+)
+SHOW_DELTA_FIELDS = ("status", "last_updated")
+
+# Columns refreshed on the current-state rows whenever a new status is stored
+ATTRACTION_CURRENT_FIELDS = [
+    "park",
+    "timestamp",
+    "status",
+    "standby_wait_time",
+    "single_rider_wait_time",
+    "last_updated",
+    "reports_wait_times",
+    "status_since",
+]
+SHOW_CURRENT_FIELDS = ["park", "show_status", "timestamp", "status", "last_updated"]
+
+# When each park's payload was last processed, kept for the life of the
+# process so unchanged payloads can be skipped between heartbeats
+_last_processed = {}
+
 
 class ThemeParkApiService:
     """Service to interact with the theme park API"""
 
-    def __init__(self):
+    def __init__(self, bulk_ingest=None, client=None, entity_id=None):
+        self.client = client or get_default_client()
         self.base_url = settings.THEME_PARK_API_BASE_URL
-        self.entity_id = settings.THEME_PARK_ENTITY_ID
+        self.entity_id = entity_id or settings.THEME_PARK_ENTITY_ID
+        self.bulk_ingest = (
+            settings.THEME_PARK_BULK_INGEST if bulk_ingest is None else bulk_ingest
+        )
+        self.delta_recording = settings.THEME_PARK_DELTA_RECORDING
+        self.heartbeat = heartbeat_due()
+        # Rows written and wall time of the most recent _process_park_data call
+        self.last_ingest_stats = None
+        self.last_changes = {"attractions": [], "shows": []}
+        # Whether the most recent fetch returned the same payload as before
+        self.last_fetch_unchanged = False
 
     def _log_api_call(
         self,
@@ -34,8 +92,11 @@ class ThemeParkApiService:
         success=False,
         error_message=None,
     ):
-        """Log API call to database"""
-        ApiLog.objects.create(
+        """Count an API call in the per-minute telemetry
+
+        Failed calls are also logged individually.
+        """
+        api_calls.record(
             endpoint=endpoint,
             status_code=status_code,
             response_time=response_time,
@@ -48,33 +109,31 @@ class ThemeParkApiService:
         endpoint = f"entity/{self.entity_id}/live"
         url = f"{self.base_url}/{endpoint}"
 
+        self.last_ingest_stats = None
+        self.last_fetch_unchanged = False
         start_time = time.time()
         try:
-            response = requests.get(url)
+            result = self.client.get_json(url)
             response_time = time.time() - start_time
+            self._log_api_call(
+                endpoint=endpoint,
+                status_code=result.status_code,
+                response_time=response_time,
+                success=True,
+            )
 
-            if response.status_code == 200:
-                self._log_api_call(
-                    endpoint=endpoint,
-                    status_code=response.status_code,
-                    response_time=response_time,
-                    success=True,
-                )
-                data = response.json()
-                self._process_park_data(data)
-                return data
-            else:
-                self._log_api_call(
-                    endpoint=endpoint,
-                    status_code=response.status_code,
-                    response_time=response_time,
-                    success=False,
-                    error_message=f"API returned status code {response.status_code}",
-                )
-                logger.error(
-                    f"API request failed with status code {response.status_code}"
-                )
-                return None
+        except requests.HTTPError as e:
+            response_time = time.time() - start_time
+            status_code = e.response.status_code if e.response is not None else None
+            self._log_api_call(
+                endpoint=endpoint,
+                status_code=status_code,
+                response_time=response_time,
+                success=False,
+                error_message=str(e),
+            )
+            logger.error(f"API request failed: {str(e)}")
+            return None
 
         except Exception as e:
             response_time = time.time() - start_time
@@ -87,6 +146,23 @@ class ThemeParkApiService:
             logger.error(f"API request failed with error: {str(e)}")
             return None
 
+        # An unchanged payload has nothing new to store, except that it is
+        # still processed once per heartbeat so the heartbeat rows get written
+        last_processed = _last_processed.get(self.entity_id)
+        if (
+            result.unchanged
+            and last_processed is not None
+            and timezone.now() - last_processed < self.heartbeat
+        ):
+            self.last_fetch_unchanged = True
+            logger.info(f"Payload for {self.entity_id} unchanged, skipping processing")
+            return result.data
+
+        # A payload that failed to store is processed again on the next poll
+        if self._process_park_data(result.data):
+            _last_processed[self.entity_id] = timezone.now()
+        return result.data
+
     def _parse_datetime(self, datetime_str):
         """Parse a datetime string into a datetime object"""
         if not datetime_str:
@@ -101,114 +177,541 @@ class ThemeParkApiService:
             return None
 
     def _process_park_data(self, data):
-        """Process park data and save to database"""
+        """Process park data and save to database
+
+        Returns True when the payload was stored, False when it failed.
+        """
+        start_time = time.monotonic()
+        # Statuses stored by this ingest, published to event streams
+        self.last_changes = {"attractions": [], "shows": []}
         try:
-            # Create or update park
-            park, created = Park.objects.update_or_create(
-                id=data["id"],
-                defaults={
-                    "name": data["name"],
-                    "entity_type": data["entityType"],
-                    "timezone": data["timezone"],
-                },
-            )
+            previous = self._latest_statuses(data)
+            if self.bulk_ingest:
+                rows_written = self._process_park_data_bulk(data, previous)
+            else:
+                rows_written = self._process_park_data_rows(data, previous)
 
-            # Process all live data items
-            for item in data["liveData"]:
-                if item["entityType"] == "ATTRACTION":
-                    self._process_attraction(park, item)
-                elif item["entityType"] == "SHOW":
-                    self._process_show(park, item)
-                else:
-                    logger.warning(f"Unknown entity type: {item['entityType']}")
+            elapsed = time.monotonic() - start_time
+            self.last_ingest_stats = {
+                "mode": "bulk" if self.bulk_ingest else "row",
+                "rows_written": rows_written,
+                "elapsed": elapsed,
+            }
+            logger.info(
+                f"Wrote {rows_written} rows in {elapsed:.3f}s "
+                f"({self.last_ingest_stats['mode']} ingest)"
+            )
+            # Before the generation moves on, so no response cached under the
+            # new one can hold the previous forecasts
+            refresh_forecasts(data["id"])
+            publish_changes(data["id"], self.last_changes)
 
         except Exception as e:
             logger.error(f"Error processing park data: {str(e)}")
+            return False
+        return True
 
-    def _process_attraction(self, park, item):
-        """Process attraction data and save to database"""
-        try:
-            # Create or update attraction
-            attraction, created = Attraction.objects.update_or_create(
-                id=item["id"],
-                defaults={
-                    "park": park,
-                    "name": item["name"],
-                    "entity_type": item["entityType"],
-                    "external_id": item.get("externalId"),
-                },
+    def _build_park(self, data):
+        """Build an unsaved Park from a live data payload"""
+        return Park(
+            id=data["id"],
+            name=data["name"],
+            entity_type=data["entityType"],
+            timezone=data["timezone"],
+        )
+
+    def _latest_statuses(self, data):
+        """Current status row for each entity in a payload, keyed by entity id"""
+        attraction_ids = []
+        show_ids = []
+        for item in data["liveData"]:
+            if item.get("entityType") == "ATTRACTION":
+                attraction_ids.append(item.get("id"))
+            elif item.get("entityType") == "SHOW":
+                show_ids.append(item.get("id"))
+
+        latest = {}
+        for current in AttractionCurrentStatus.objects.filter(
+            attraction_id__in=attraction_ids
+        ):
+            latest[str(current.attraction_id)] = current
+        for current in ShowCurrentStatus.objects.filter(show_id__in=show_ids):
+            latest[str(current.show_id)] = current
+        return latest
+
+    def _build_attraction_current(self, status, previous):
+        """Current-state row for an attraction from its newest status"""
+        return AttractionCurrentStatus(
+            attraction=status.attraction,
+            park=status.attraction.park,
+            timestamp=status.timestamp,
+            status=status.status,
+            standby_wait_time=status.standby_wait_time,
+            single_rider_wait_time=status.single_rider_wait_time,
+            last_updated=status.last_updated,
+            reports_wait_times=(
+                (previous is not None and previous.reports_wait_times)
+                or status.standby_wait_time is not None
+                or status.single_rider_wait_time is not None
+            ),
+            status_since=period_start(previous, status),
+        )
+
+    def _build_show_current(self, status):
+        """Current-state row for a show from its newest status"""
+        return ShowCurrentStatus(
+            show=status.show,
+            park=status.show.park,
+            show_status=status,
+            timestamp=status.timestamp,
+            status=status.status,
+            last_updated=status.last_updated,
+        )
+
+    def _save_rollups(self, park, statuses, previous):
+        """Add the intervals closed by new attraction statuses to the rollups
+
+        Each new status ends the interval of the attraction's current status,
+        which is added to the hourly rollups. Returns the rollup rows written.
+        """
+        tz = park_timezone(park.timezone)
+        max_gap = status_validity()
+        buckets = {}
+        for status in statuses:
+            current = previous.get(str(status.attraction_id))
+            if current is None or status.timestamp <= current.timestamp:
+                continue
+            add_interval(
+                buckets,
+                status.attraction_id,
+                current.timestamp,
+                min(status.timestamp, current.timestamp + max_gap),
+                current.standby_wait_time,
+                tz,
             )
+        return save_buckets(buckets)
 
-            # Create attraction status entry
-            status_data = {
-                "attraction": attraction,
-                "status": item["status"],
-                "last_updated": self._parse_datetime(item.get("lastUpdated")),
-                "raw_data": item,
-            }
+    def _build_transitions(self, statuses, previous):
+        """Unsaved StatusTransitions for the status periods new statuses end
+
+        The current-state row of each attraction holds its status and since
+        when, so a transition is only written when the status flips or the
+        data has a gap, never by rereading the status history.
+        """
+        transitions = []
+        for status in statuses:
+            transition = status_transition(
+                previous.get(str(status.attraction_id)), status
+            )
+            if transition is not None:
+                transitions.append(transition)
+        return transitions
 
-            # Process queue data if available
-            if "queue" in item:
-                queue = item["queue"]
-                if "STANDBY" in queue and queue["STANDBY"] is not None:
-                    status_data["standby_wait_time"] = queue["STANDBY"].get("waitTime")
+    def _is_unchanged(self, previous, status, fields):
+        """Whether a status repeats the previous one within the heartbeat interval
 
-                if "SINGLE_RIDER" in queue and queue["SINGLE_RIDER"] is not None:
-                    status_data["single_rider_wait_time"] = queue["SINGLE_RIDER"].get(
-                        "waitTime"
-                    )
+        Unchanged statuses are not recorded; readers treat each stored row as
+        valid until the next one, and a heartbeat row is still written once
+        the interval has passed so long gaps can be told apart from outages.
+        """
+        if previous is None or not self.delta_recording:
+            return False
+        if status.timestamp - previous.timestamp >= self.heartbeat:
+            return False
+        return all(
+            getattr(previous, field) == getattr(status, field) for field in fields
+        )
 
-            # Create attraction status
-            attraction_status = AttractionStatus.objects.create(**status_data)
+    def _process_park_data_rows(self, data, previous):
+        """Save a payload one row at a time, committing each write separately"""
+        park = self._build_park(data)
+        rows_written = entity_registry.save(Park, [park])
 
-            # Process operating hours if available
-            if "operatingHours" in item and item["operatingHours"]:
-                for oh in item["operatingHours"]:
-                    OperatingHours.objects.create(
-                        attraction_status=attraction_status,
-                        type=oh.get("type"),
-                        start_time=self._parse_datetime(oh.get("startTime")),
-                        end_time=self._parse_datetime(oh.get("endTime")),
+        # Process all live data items
+        for item in data["liveData"]:
+            if item["entityType"] == "ATTRACTION":
+                rows_written += self._process_attraction(
+                    park, item, previous.get(item.get("id"))
+                )
+            elif item["entityType"] == "SHOW":
+                rows_written += self._process_show(
+                    park, item, previous.get(item.get("id"))
+                )
+            else:
+                logger.warning(f"Unknown entity type: {item['entityType']}")
+
+        return rows_written
+
+    def _process_park_data_bulk(self, data, previous):
+        """Save a payload with bulk writes inside a single transaction
+
+        Rows for every item are built in memory first, so an item that cannot
+        be parsed is logged and skipped without affecting the others. If the
+        bulk write itself fails, the payload is replayed row by row so one bad
+        item cannot discard the whole poll.
+        """
+        attractions = {}
+        shows = {}
+        attraction_rows = []
+        show_rows = []
+        tz = park_timezone(data["timezone"])
+
+        for item in data["liveData"]:
+            if item["entityType"] == "ATTRACTION":
+                try:
+                    attraction = self._build_attraction(item)
+                    status, hours = self._build_attraction_status(attraction, item, tz)
+                    attractions[attraction.id] = attraction
+                    if not self._is_unchanged(
+                        previous.get(item["id"]), status, ATTRACTION_DELTA_FIELDS
+                    ):
+                        attraction_rows.append((status, hours))
+                except Exception as e:
+                    logger.error(
+                        f"Error processing attraction {item.get('name', 'unknown')}: {str(e)}"
+                    )
+            elif item["entityType"] == "SHOW":
+                try:
+                    show = self._build_show(item)
+                    status, times = self._build_show_status(show, item, tz)
+                    shows[show.id] = show
+                    if not self._is_unchanged(
+                        previous.get(item["id"]), status, SHOW_DELTA_FIELDS
+                    ):
+                        show_rows.append((status, times))
+                except Exception as e:
+                    logger.error(
+                        f"Error processing show {item.get('name', 'unknown')}: {str(e)}"
                     )
+            else:
+                logger.warning(f"Unknown entity type: {item['entityType']}")
+
+        try:
+            with transaction.atomic():
+                park = self._build_park(data)
+                for entity in [*attractions.values(), *shows.values()]:
+                    entity.park = park
+
+                # Only entities that are new or changed are written
+                entities_written = (
+                    entity_registry.save(Park, [park])
+                    + entity_registry.save(Attraction, attractions.values())
+                    + entity_registry.save(Show, shows.values())
+                )
+
+                payloads_written = self._save_payloads(
+                    [status for status, children in [*attraction_rows, *show_rows]]
+                )
+
+                # Statuses are inserted first so their primary keys are known
+                # when the current-state rows that reference them are inserted.
+                AttractionStatus.objects.bulk_create(
+                    [status for status, hours in attraction_rows]
+                )
+                ShowStatus.objects.bulk_create([status for status, times in show_rows])
+                AttractionCurrentStatus.objects.bulk_create(
+                    [
+                        self._build_attraction_current(
+                            status, previous.get(str(status.attraction_id))
+                        )
+                        for status, hours in attraction_rows
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["attraction"],
+                    update_fields=ATTRACTION_CURRENT_FIELDS,
+                )
+                rollups_written = self._save_rollups(
+                    park, [status for status, hours in attraction_rows], previous
+                )
+                transitions = self._build_transitions(
+                    [status for status, hours in attraction_rows], previous
+                )
+                StatusTransition.objects.bulk_create(transitions)
+                ShowCurrentStatus.objects.bulk_create(
+                    [self._build_show_current(status) for status, times in show_rows],
+                    update_conflicts=True,
+                    unique_fields=["show"],
+                    update_fields=SHOW_CURRENT_FIELDS,
+                )
+                operating_hours = [
+                    oh for status, hours in attraction_rows for oh in hours
+                ]
+                showtimes = [st for status, times in show_rows for st in times]
+                schedule_written = save_schedule(
+                    OperatingHours, operating_hours
+                ) + save_schedule(Showtime, showtimes)
 
         except Exception as e:
-            logger.error(
-                f"Error processing attraction {item.get('name', 'unknown')}: {str(e)}"
+            logger.warning(
+                f"Bulk write failed, falling back to row-by-row ingest: {str(e)}"
             )
+            # The failure may come from an entity removed behind the
+            # registry's back, so the replay writes every entity again
+            entity_registry.clear()
+            return self._process_park_data_rows(data, previous)
 
-    def _process_show(self, park, item):
-        """Process show data and save to database"""
-        try:
-            # Create or update show
-            show, created = Show.objects.update_or_create(
-                id=item["id"],
-                defaults={
-                    "park": park,
-                    "name": item["name"],
-                    "entity_type": item["entityType"],
-                    "external_id": item.get("externalId"),
-                },
+        self.last_changes["attractions"].extend(
+            attraction_change(status) for status, hours in attraction_rows
+        )
+        self.last_changes["shows"].extend(
+            show_change(status) for status, times in show_rows
+        )
+
+        return (
+            entities_written
+            + payloads_written
+            + rollups_written
+            + len(transitions)
+            + 2 * len(attraction_rows)
+            + 2 * len(show_rows)
+            + schedule_written
+        )
+
+    def _build_payloads(self, item):
+        """Unsaved RawPayloads for the volatile and schedule parts of an item"""
+        volatile, schedule = split_item(item)
+        payload = RawPayload(digest=payload_digest(volatile), data=volatile)
+        schedule_payload = None
+        if schedule is not None:
+            schedule_payload = RawPayload(
+                digest=payload_digest(schedule), data=schedule
+            )
+        return payload, schedule_payload
+
+    def _save_payloads(self, statuses):
+        """Store the payloads referenced by statuses that are not stored yet
+
+        Returns the number of payload rows written.
+        """
+        payloads = {}
+        for status in statuses:
+            for payload in (status.payload, status.schedule_payload):
+                if payload is not None:
+                    payloads[payload.digest] = payload
+
+        existing = set(
+            RawPayload.objects.filter(digest__in=payloads).values_list(
+                "digest", flat=True
             )
+        )
+        new_payloads = [
+            payload for digest, payload in payloads.items() if digest not in existing
+        ]
+        RawPayload.objects.bulk_create(new_payloads, ignore_conflicts=True)
+        return len(new_payloads)
 
-            # Create show status entry
-            show_status = ShowStatus.objects.create(
+    def _build_attraction(self, item):
+        """Build an unsaved Attraction from a live data item"""
+        return Attraction(
+            id=item["id"],
+            name=item["name"],
+            entity_type=item["entityType"],
+            external_id=item.get("externalId"),
+        )
+
+    def _build_show(self, item):
+        """Build an unsaved Show from a live data item"""
+        return Show(
+            id=item["id"],
+            name=item["name"],
+            entity_type=item["entityType"],
+            external_id=item.get("externalId"),
+        )
+
+    def _build_attraction_status(self, attraction, item, tz):
+        """Build an unsaved AttractionStatus and its OperatingHours
+
+        ``tz`` is the park's time zone, which the status's local date, hour
+        and weekday are stamped in.
+        """
+        payload, schedule_payload = self._build_payloads(item)
+        status_data = {
+            "attraction": attraction,
+            "status": item["status"],
+            "last_updated": self._parse_datetime(item.get("lastUpdated")),
+            "payload": payload,
+            "schedule_payload": schedule_payload,
+        }
+
+        # Process queue data if available
+        if "queue" in item:
+            queue = item["queue"]
+            if "STANDBY" in queue and queue["STANDBY"] is not None:
+                status_data["standby_wait_time"] = queue["STANDBY"].get("waitTime")
+
+            if "SINGLE_RIDER" in queue and queue["SINGLE_RIDER"] is not None:
+                status_data["single_rider_wait_time"] = queue["SINGLE_RIDER"].get(
+                    "waitTime"
+                )
+
+        attraction_status = stamp_local_time(AttractionStatus(**status_data), tz)
+
+        operating_hours = []
+        if "operatingHours" in item and item["operatingHours"]:
+            for oh in item["operatingHours"]:
+                start_time = self._parse_datetime(oh.get("startTime"))
+                if start_time is None:
+                    # _parse_datetime has already logged the bad value
+                    continue
+                operating_hours.append(
+                    OperatingHours(
+                        attraction=attraction,
+                        type=oh.get("type") or "",
+                        start_time=start_time,
+                        end_time=self._parse_datetime(oh.get("endTime")),
+                        first_seen=attraction_status.timestamp,
+                        last_seen=attraction_status.timestamp,
+                    )
+                )
+
+        return attraction_status, operating_hours
+
+    def _build_show_status(self, show, item, tz):
+        """Build an unsaved ShowStatus and its Showtimes, stamped in park time"""
+        payload, schedule_payload = self._build_payloads(item)
+        show_status = stamp_local_time(
+            ShowStatus(
                 show=show,
                 status=item["status"],
                 last_updated=self._parse_datetime(item.get("lastUpdated")),
-                raw_data=item,
-            )
+                payload=payload,
+                schedule_payload=schedule_payload,
+            ),
+            tz,
+        )
 
-            # Process showtimes if available
-            if "showtimes" in item and item["showtimes"]:
-                for st in item["showtimes"]:
-                    Showtime.objects.create(
-                        show_status=show_status,
-                        type=st.get("type"),
-                        start_time=self._parse_datetime(st.get("startTime")),
+        showtimes = []
+        if "showtimes" in item and item["showtimes"]:
+            for st in item["showtimes"]:
+                start_time = self._parse_datetime(st.get("startTime"))
+                if start_time is None:
+                    # _parse_datetime has already logged the bad value
+                    continue
+                showtimes.append(
+                    Showtime(
+                        show=show,
+                        type=st.get("type") or "",
+                        start_time=start_time,
                         end_time=self._parse_datetime(st.get("endTime")),
+                        first_seen=show_status.timestamp,
+                        last_seen=show_status.timestamp,
                     )
+                )
+
+        return show_status, showtimes
+
+    def _process_attraction(self, park, item, previous=None):
+        """Process attraction data and save to database
+
+        Returns the number of rows written.
+        """
+        rows_written = 0
+        try:
+            # Written only when new or changed since this process last wrote it
+            attraction = self._build_attraction(item)
+            attraction.park = park
+            rows_written += entity_registry.save(Attraction, [attraction])
+
+            attraction_status, operating_hours = self._build_attraction_status(
+                attraction, item, park_timezone(park.timezone)
+            )
+            if self._is_unchanged(previous, attraction_status, ATTRACTION_DELTA_FIELDS):
+                return rows_written
+            rows_written += self._save_payloads([attraction_status])
+            with transaction.atomic():
+                attraction_status.save()
+                self._build_attraction_current(attraction_status, previous).save()
+                rows_written += self._save_rollups(
+                    park,
+                    [attraction_status],
+                    {str(attraction.id): previous} if previous else {},
+                )
+                for transition in self._build_transitions(
+                    [attraction_status],
+                    {str(attraction.id): previous} if previous else {},
+                ):
+                    transition.save()
+                    rows_written += 1
+            rows_written += 2
+            self.last_changes["attractions"].append(
+                attraction_change(attraction_status)
+            )
+
+            rows_written += save_schedule(OperatingHours, operating_hours)
+
+        except Exception as e:
+            logger.error(
+                f"Error processing attraction {item.get('name', 'unknown')}: {str(e)}"
+            )
+            entity_registry.forget(Attraction, item.get("id"))
+
+        return rows_written
+
+    def _process_show(self, park, item, previous=None):
+        """Process show data and save to database
+
+        Returns the number of rows written.
+        """
+        rows_written = 0
+        try:
+            # Written only when new or changed since this process last wrote it
+            show = self._build_show(item)
+            show.park = park
+            rows_written += entity_registry.save(Show, [show])
+
+            show_status, showtimes = self._build_show_status(
+                show, item, park_timezone(park.timezone)
+            )
+            if self._is_unchanged(previous, show_status, SHOW_DELTA_FIELDS):
+                return rows_written
+            rows_written += self._save_payloads([show_status])
+            with transaction.atomic():
+                show_status.save()
+                self._build_show_current(show_status).save()
+            rows_written += 2
+            self.last_changes["shows"].append(show_change(show_status))
+
+            rows_written += save_schedule(Showtime, showtimes)
 
         except Exception as e:
             logger.error(
                 f"Error processing show {item.get('name', 'unknown')}: {str(e)}"
             )
+            entity_registry.forget(Show, item.get("id"))
+
+        return rows_written
+
+
+def fetch_parks(entity_ids=None, max_workers=None, bulk_ingest=None):
+    """Fetch and process several parks concurrently
+
+    Each park is fetched and written on its own worker thread (and so its own
+    database connection and transaction), with at most ``max_workers`` parks
+    in flight at once. ``entity_ids`` defaults to THEME_PARK_ENTITY_IDS.
+    Returns ``(service, data)`` pairs in the order of ``entity_ids``; ``data``
+    is None for parks that failed.
+    """
+    if entity_ids is None:
+        entity_ids = settings.THEME_PARK_ENTITY_IDS
+    if not entity_ids:
+        return []
+    max_workers = max_workers or settings.THEME_PARK_MAX_CONCURRENT_FETCHES
+    services = [
+        ThemeParkApiService(bulk_ingest=bulk_ingest, entity_id=entity_id)
+        for entity_id in entity_ids
+    ]
+
+    def fetch(service):
+        try:
+            return service.fetch_live_data()
+        finally:
+            # Worker threads do not go through Django's request cycle, so
+            # their connections have to be closed by hand
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(services))) as executor:
+        results = list(executor.map(fetch, services))
+    # Write this round's API call counts now rather than on the next call
+    api_calls.flush()
+
+    return list(zip(services, results))
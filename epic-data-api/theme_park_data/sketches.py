@@ -0,0 +1,124 @@
+import math
+import numpy as np
+
+# Upper bound on the centroids a sketch keeps. Standby waits are whole
+# minutes, usually in steps of five, so an hour of one attraction rarely has
+# this many distinct values and its sketch is exact; only merges of long
+# windows with many distinct values are compressed.
+COMPRESSION = 100
+
+# Stored as little-endian float32 (mean, weight) pairs
+_DTYPE = np.dtype("<f4")
+
+
+def empty():
+    return np.empty(0), np.empty(0)
+
+
+def from_weights(weights):
+    """Sketch of a ``{wait_time: seconds}`` mapping"""
+    if not weights:
+        return empty()
+    values = np.fromiter(weights.keys(), float, len(weights))
+    seconds = np.fromiter(weights.values(), float, len(weights))
+    return compress(values, seconds)
+
+
+def encode(sketch):
+    """Bytes of a sketch for a BinaryField (8 bytes per centroid)"""
+    means, weights = sketch
+    return np.column_stack([means, weights]).astype(_DTYPE).tobytes()
+
+
+def decode(data):
+    """Sketch stored by ``encode``; empty for None"""
+    if not data:
+        return empty()
+    pairs = np.frombuffer(bytes(data), dtype=_DTYPE).reshape(-1, 2)
+    return pairs[:, 0].astype(float), pairs[:, 1].astype(float)
+
+
+def _scale(q, compression):
+    # t-digest's k1 scale function: centroids are kept small near the tails
+    # so the extreme percentiles stay accurate
+    return compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+
+def compress(means, weights, compression=COMPRESSION):
+    """Merge centroids until at most about ``compression`` remain
+
+    Centroids with equal means are combined exactly; beyond that, neighbours
+    are merged in value order as long as the merged centroid spans less than
+    one unit of the scale function, as in a merging t-digest.
+    """
+    means = np.asarray(means, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    keep = weights > 0
+    means, weights = means[keep], weights[keep]
+    if not len(means):
+        return empty()
+    means, inverse = np.unique(means, return_inverse=True)
+    weights = np.bincount(inverse, weights=weights, minlength=len(means))
+    if len(means) <= compression:
+        return means, weights
+
+    total = weights.sum()
+    merged_means, merged_weights = [], []
+    mean, weight = means[0], weights[0]
+    before = 0.0
+    for next_mean, next_weight in zip(means[1:].tolist(), weights[1:].tolist()):
+        low = _scale(before / total, compression)
+        high = _scale(min(1.0, (before + weight + next_weight) / total), compression)
+        if high - low <= 1:
+            mean += (next_mean - mean) * next_weight / (weight + next_weight)
+            weight += next_weight
+        else:
+            merged_means.append(mean)
+            merged_weights.append(weight)
+            before += weight
+            mean, weight = next_mean, next_weight
+    merged_means.append(mean)
+    merged_weights.append(weight)
+    return np.array(merged_means), np.array(merged_weights)
+
+
+def merge(sketches, compression=COMPRESSION):
+    """One sketch summarizing everything the given sketches do"""
+    sketches = list(sketches)
+    if not sketches:
+        return empty()
+    return compress(
+        np.concatenate([means for means, weights in sketches]),
+        np.concatenate([weights for means, weights in sketches]),
+        compression,
+    )
+
+
+def quantiles(sketch, qs):
+    """Values below which the given fractions of the weight fall
+
+    Interpolates between centroid centres; returns None for each fraction
+    when the sketch is empty.
+    """
+    means, weights = sketch
+    if not len(means):
+        return [None for _ in qs]
+    if len(means) == 1:
+        return [float(means[0]) for _ in qs]
+    total = weights.sum()
+    centres = np.cumsum(weights) - weights / 2
+    targets = np.clip(np.asarray(qs, dtype=float), 0, 1) * total
+    return np.interp(targets, centres, means).tolist()
+
+
+def merge_groups(keys, blobs, compression=COMPRESSION):
+    """Decode stored sketches and merge those with the same key
+
+    Returns ``{key: sketch}``.
+    """
+    grouped = {}
+    for key, blob in zip(keys, blobs):
+        sketch = decode(blob)
+        if len(sketch[0]):
+            grouped.setdefault(key, []).append(sketch)
+    return {key: merge(sketches, compression) for key, sketches in grouped.items()}
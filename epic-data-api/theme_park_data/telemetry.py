@@ -0,0 +1,236 @@
+import bisect
+import logging
+import threading
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ApiCallMinute, ApiLog
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the response time histogram buckets. Slower
+# calls are counted in one more bucket, bounded by the slowest call.
+LATENCY_BUCKETS = (
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.2,
+    0.3,
+    0.4,
+    0.5,
+    0.75,
+    1,
+    1.5,
+    2,
+    3,
+    4,
+    5,
+    7.5,
+    10,
+    15,
+    20,
+    30,
+)
+
+# Columns merged into an ApiCallMinute row when buffered counts are written
+MINUTE_FIELDS = [
+    "call_count",
+    "error_count",
+    "latency_sum",
+    "latency_max",
+    "latency_histogram",
+]
+
+
+def _empty_totals():
+    """[calls, errors, latency sum, latency max, histogram] of no calls"""
+    return [0, 0, 0.0, None, [0] * (len(LATENCY_BUCKETS) + 1)]
+
+
+def _merge_totals(total, calls, errors, latency_sum, latency_max, histogram):
+    """Add one set of call totals to another in place"""
+    total[0] += calls
+    total[1] += errors
+    total[2] += latency_sum
+    if latency_max is not None:
+        total[3] = max(total[3] or 0.0, latency_max)
+    for index, count in enumerate(histogram):
+        total[4][index] += count
+    return total
+
+
+class ApiCallRecorder:
+    """Per-minute API call counts, buffered in memory until the minute ends
+
+    Each call is added to the counts of its endpoint for the current UTC
+    minute. Minutes that have ended are merged into ApiCallMinute rows in
+    one transaction, either by the first call recorded in a later minute,
+    which waits for that write, or when ``flush`` is called. Other successful
+    calls only update the buffer. Failed calls are also stored as an ApiLog
+    row straight away, on the calling thread, with their status code and
+    error message. Counts that cannot be written stay buffered for the next
+    flush.
+    """
+
+    def __init__(self):
+        # (endpoint, minute) -> totals, as made by _empty_totals
+        self._buffer = {}
+        # Parks are fetched on several threads at once
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        endpoint,
+        status_code=None,
+        response_time=None,
+        success=False,
+        error_message=None,
+    ):
+        now = timezone.now()
+        if not success:
+            ApiLog.objects.create(
+                timestamp=now,
+                endpoint=endpoint,
+                status_code=status_code,
+                response_time=response_time,
+                success=success,
+                error_message=error_message,
+            )
+
+        minute = now.replace(second=0, microsecond=0)
+        with self._lock:
+            totals = self._buffer.setdefault((endpoint, minute), _empty_totals())
+            totals[0] += 1
+            totals[1] += 0 if success else 1
+            if response_time is not None:
+                totals[2] += response_time
+                totals[3] = max(totals[3] or 0.0, response_time)
+                totals[4][bisect.bisect_left(LATENCY_BUCKETS, response_time)] += 1
+            ended = any(key[1] < minute for key in self._buffer)
+        if ended:
+            self.flush(before=minute)
+
+    def flush(self, before=None):
+        """Write the buffered minutes that start before ``before`` (default all)
+
+        Returns the number of ApiCallMinute rows written.
+        """
+        with self._lock:
+            pending = {
+                key: self._buffer.pop(key)
+                for key in list(self._buffer)
+                if before is None or key[1] < before
+            }
+        if not pending:
+            return 0
+
+        try:
+            # Another process may be writing the same minutes, so the rows
+            # are created empty first and then merged into under a lock
+            ApiCallMinute.objects.bulk_create(
+                [
+                    ApiCallMinute(endpoint=endpoint, minute=minute)
+                    for endpoint, minute in pending
+                ],
+                ignore_conflicts=True,
+            )
+            query = Q()
+            for endpoint, minute in pending:
+                query |= Q(endpoint=endpoint, minute=minute)
+            with transaction.atomic():
+                rows = list(ApiCallMinute.objects.select_for_update().filter(query))
+                for row in rows:
+                    totals = _merge_totals(
+                        _empty_totals(),
+                        *(getattr(row, field) for field in MINUTE_FIELDS),
+                    )
+                    _merge_totals(totals, *pending[(row.endpoint, row.minute)])
+                    for field, value in zip(MINUTE_FIELDS, totals):
+                        setattr(row, field, value)
+                ApiCallMinute.objects.bulk_update(rows, MINUTE_FIELDS)
+        except Exception as e:
+            logger.error(f"Could not write API call counts: {str(e)}")
+            with self._lock:
+                for key, totals in pending.items():
+                    _merge_totals(
+                        self._buffer.setdefault(key, _empty_totals()), *totals
+                    )
+            return 0
+        return len(rows)
+
+
+api_calls = ApiCallRecorder()
+
+
+def histogram_quantiles(histogram, fractions, max_latency):
+    """Response times at ``fractions`` (0 to 1) of a latency histogram
+
+    Interpolates linearly within the bucket each quantile falls in, taking
+    the slowest call as the bound of the last bucket. None when empty.
+    """
+    counts = np.asarray(histogram, dtype=float)
+    total = counts.sum()
+    if not total:
+        return [None] * len(fractions)
+    slowest = max(max_latency or 0.0, LATENCY_BUCKETS[-1])
+    lower = np.array((0.0, *LATENCY_BUCKETS))
+    upper = np.array((*LATENCY_BUCKETS, slowest))
+    cumulative = np.cumsum(counts)
+
+    values = []
+    for fraction in fractions:
+        target = fraction * total
+        index = min(int(np.searchsorted(cumulative, target)), len(counts) - 1)
+        before = cumulative[index] - counts[index]
+        share = (target - before) / counts[index] if counts[index] else 0.0
+        value = lower[index] + share * (upper[index] - lower[index])
+        if max_latency is not None:
+            value = min(value, max_latency)
+        values.append(float(value))
+    return values
+
+
+def _health(calls, errors, latency_sum, latency_max, histogram, percentiles):
+    fractions = [percentile / 100 for percentile in percentiles]
+    return {
+        "calls": calls,
+        "errors": errors,
+        "success_rate": (round(100 * (calls - errors) / calls, 2) if calls else None),
+        "average_latency": latency_sum / calls if calls else None,
+        "max_latency": latency_max,
+        "latency_percentiles": dict(
+            zip(
+                percentiles,
+                histogram_quantiles(histogram, fractions, latency_max),
+            )
+        ),
+    }
+
+
+def fetch_health(start, end, endpoint=None, percentiles=(50, 90, 99)):
+    """Success rate and response time percentiles of API calls in start..end
+
+    Reads the per-minute counts of the minutes starting in the window, so
+    the current minute is only included once it has been written. Returns
+    the figures over all endpoints and ``{endpoint: figures}``, each a dict
+    of call and error counts, success rate in percent, average and maximum
+    response time and ``latency_percentiles`` mapping each percentile to
+    seconds.
+    """
+    minutes = ApiCallMinute.objects.filter(minute__gte=start, minute__lt=end)
+    if endpoint:
+        minutes = minutes.filter(endpoint=endpoint)
+
+    totals = {}
+    for name, *row in minutes.values_list("endpoint", *MINUTE_FIELDS).order_by():
+        _merge_totals(totals.setdefault(name, _empty_totals()), *row)
+    overall = _empty_totals()
+    for total in totals.values():
+        _merge_totals(overall, *total)
+
+    return _health(*overall, percentiles), {
+        name: _health(*total, percentiles) for name, total in sorted(totals.items())
+    }
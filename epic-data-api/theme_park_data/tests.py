@@ -1,3 +1,1894 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipUnless
+import numpy as np
+import requests
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from . import services, sketches, timeseries
+from .api_client import ApiClient, CircuitOpenError, FetchResult, retry_after
+from .archive import ArchiveDay, day_path, read_attraction_history, write_day
+from .cache import GENERATION_KEY, bump_generation, current_generation
+from .compaction import (
+    HOUR,
+    QUARTER_HOUR,
+    compact_raw_day,
+    compact_summary_day,
+    summary_segments,
+)
+from .events import (
+    EVENT_KEY,
+    MAX_CATCH_UP,
+    EventBroadcaster,
+    Subscriber,
+    broadcaster,
+    publish_changes,
+)
+from .exports import export_stream
+from .ingestor import Ingestor
+from .forecasting import fit_profiles, predict, train_park
+from .models import (
+    ApiCallMinute,
+    ApiLog,
+    Attraction,
+    AttractionCurrentStatus,
+    AttractionStatus,
+    AttractionStatusSummary,
+    AttractionWaitRollup,
+    OperatingHours,
+    Park,
+    RawPayload,
+    Show,
+    ShowCurrentStatus,
+    ShowStatus,
+    Showtime,
+    StatusTransition,
+)
+from .partitions import (
+    PARTITIONED_MODELS,
+    create_partition,
+    expire_partitions,
+    is_partitioned,
+    partition_table,
+    unconstrained_references,
+)
+from .payloads import join_payloads, payload_digest, split_item
+from .polling import PollingPolicy
+from .registry import EntityRegistry, entity_registry, fingerprint
+from .rollups import park_timezone, stamp_local_time, status_reports, wait_profile
+from .schedules import save_schedule, upcoming_showtimes
+from .services import ThemeParkApiService, fetch_parks
+from .telemetry import ApiCallRecorder, fetch_health, histogram_quantiles
+from .timeseries import attraction_history, recent_history
+from .transitions import downtime_events, uptime
 
-# Create your tests here.
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+PARK_ID = "12dbb85b-265f-44e6-bccf-f1faa17211fc"
+OTHER_PARK_ID = str(uuid.UUID(int=100))
+RIDE_ID = str(uuid.UUID(int=1))
+SHOW_ID = str(uuid.UUID(int=2))
+
+START = datetime(2025, 6, 1, 14, 0, tzinfo=dt_timezone.utc)
+
+
+def _iso(moment):
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def attraction_item(status="OPERATING", wait=30, updated=START):
+    return {
+        "id": RIDE_ID,
+        "name": "Ride",
+        "entityType": "ATTRACTION",
+        "externalId": "ride",
+        "status": status,
+        "lastUpdated": _iso(updated),
+        "queue": {"STANDBY": {"waitTime": wait}},
+        "operatingHours": [
+            {
+                "type": "OPERATING",
+                "startTime": _iso(START.replace(hour=9)),
+                "endTime": _iso(START.replace(hour=21)),
+            }
+        ],
+    }
+
+
+def show_item(showtimes, status="OPERATING", updated=START):
+    return {
+        "id": SHOW_ID,
+        "name": "Show",
+        "entityType": "SHOW",
+        "externalId": "show",
+        "status": status,
+        "lastUpdated": _iso(updated),
+        "showtimes": [
+            {
+                "type": "Performance Time",
+                "startTime": _iso(start),
+                "endTime": _iso(start + timedelta(minutes=30)),
+            }
+            for start in showtimes
+        ],
+    }
+
+
+def live_payload(*items, park_id=PARK_ID, name="Park"):
+    return {
+        "id": park_id,
+        "name": name,
+        "entityType": "PARK",
+        "timezone": "America/New_York",
+        "liveData": list(items),
+    }
+
+
+@contextmanager
+def frozen(at):
+    """Make ``at`` the current time, including for status timestamp defaults"""
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("django.utils.timezone.now", return_value=at))
+        for model in (AttractionStatus, ShowStatus):
+            stack.enter_context(
+                mock.patch.object(
+                    model._meta.get_field("timestamp"), "_get_default", lambda: at
+                )
+            )
+        yield
+
+
+def ingest(data, at, bulk_ingest=True):
+    """Process a live data payload as if it arrived at ``at``"""
+    service = ThemeParkApiService(client=object(), bulk_ingest=bulk_ingest)
+    with frozen(at):
+        service._process_park_data(data)
+    return service
+
+
+def minutes(count):
+    return START + timedelta(minutes=count)
+
+
+def ride_status(status="OPERATING", wait=30, at=0):
+    """Payload of the ride only, as polled ``at`` minutes after START"""
+    return live_payload(attraction_item(status, wait, updated=minutes(at)))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BulkIngestTests(TestCase):
+    def payload(self):
+        showtimes = [START + timedelta(hours=1), START + timedelta(hours=2)]
+        return live_payload(attraction_item(), show_item(showtimes))
+
+    def counts(self):
+        return [
+            model.objects.count()
+            for model in (
+                Attraction,
+                Show,
+                AttractionStatus,
+                ShowStatus,
+                OperatingHours,
+                Showtime,
+            )
+        ]
+
+    def test_bulk_and_row_ingest_write_the_same_rows(self):
+        written = {}
+        for bulk_ingest in (True, False):
+            with self.subTest(bulk_ingest=bulk_ingest):
+                AttractionStatus.objects.all().delete()
+                ShowStatus.objects.all().delete()
+                AttractionCurrentStatus.objects.all().delete()
+                ShowCurrentStatus.objects.all().delete()
+                RawPayload.objects.all().delete()
+                service = ingest(self.payload(), START, bulk_ingest)
+                self.assertEqual(self.counts(), [1, 1, 1, 1, 1, 2])
+                stats = service.last_ingest_stats
+                self.assertEqual(stats["mode"], "bulk" if bulk_ingest else "row")
+                written[bulk_ingest] = stats["rows_written"]
+        self.assertEqual(written[True], written[False])
+
+    def test_unparseable_item_is_skipped(self):
+        broken = {"id": str(uuid.UUID(int=3)), "name": "Broken"}
+        broken["entityType"] = "ATTRACTION"
+        ingest(live_payload(broken, attraction_item()), START)
+        self.assertEqual(
+            list(AttractionStatus.objects.values_list("attraction_id", flat=True)),
+            [uuid.UUID(RIDE_ID)],
+        )
+
+    def test_failed_bulk_write_is_replayed_row_by_row(self):
+        with mock.patch.object(
+            AttractionStatus.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            service = ingest(self.payload(), START)
+        self.assertEqual(self.counts(), [1, 1, 1, 1, 1, 2])
+        self.assertIsNotNone(service.last_ingest_stats)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE,
+    THEME_PARK_DELTA_RECORDING=True,
+    THEME_PARK_STATUS_HEARTBEAT_MINUTES=15,
+)
+class DeltaRecordingTests(TestCase):
+    def waits(self):
+        return list(
+            AttractionStatus.objects.order_by("timestamp").values_list(
+                "standby_wait_time", flat=True
+            )
+        )
+
+    def test_unchanged_status_is_not_stored_before_the_heartbeat(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=30), minutes(5))
+        self.assertEqual(self.waits(), [30])
+
+    def test_changed_wait_is_stored(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=45, at=1), minutes(1))
+        self.assertEqual(self.waits(), [30, 45])
+
+    def test_unchanged_status_is_stored_again_at_the_heartbeat(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=30), minutes(15))
+        self.assertEqual(self.waits(), [30, 30])
+
+    def test_early_poll_still_stores_the_heartbeat(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=30), START + timedelta(seconds=899))
+        self.assertEqual(self.waits(), [30, 30])
+
+    def test_row_ingest_records_the_same_rows(self):
+        for bulk_ingest in (True, False):
+            with self.subTest(bulk_ingest=bulk_ingest):
+                AttractionStatus.objects.all().delete()
+                AttractionCurrentStatus.objects.all().delete()
+                ingest(ride_status(wait=30), START, bulk_ingest)
+                ingest(ride_status(wait=30), minutes(5), bulk_ingest)
+                ingest(ride_status(wait=45, at=6), minutes(6), bulk_ingest)
+                self.assertEqual(self.waits(), [30, 45])
+                current = AttractionCurrentStatus.objects.get(attraction_id=RIDE_ID)
+                self.assertEqual(current.standby_wait_time, 45)
+                self.assertEqual(current.timestamp, minutes(6))
+
+    @override_settings(THEME_PARK_DELTA_RECORDING=False)
+    def test_every_poll_is_stored_without_delta_recording(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=30), minutes(1))
+        self.assertEqual(self.waits(), [30, 30])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PayloadStoreTests(TestCase):
+    def test_split_item_keeps_the_schedule_apart(self):
+        item = attraction_item()
+        volatile, schedule = split_item(item)
+        self.assertEqual(list(schedule), ["operatingHours"])
+        self.assertNotIn("operatingHours", volatile)
+        self.assertEqual(
+            join_payloads(None, RawPayload(data=volatile), RawPayload(data=schedule)),
+            item,
+        )
+        self.assertIs(join_payloads(item, None, None), item)
+        self.assertEqual(split_item({"id": RIDE_ID}), ({"id": RIDE_ID}, None))
+
+    def test_digest_ignores_key_order(self):
+        self.assertEqual(
+            payload_digest({"a": 1, "b": [1, 2]}), payload_digest({"b": [1, 2], "a": 1})
+        )
+        self.assertNotEqual(payload_digest({"a": 1}), payload_digest({"a": 2}))
+
+    def test_statuses_share_stored_payloads(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=45, at=1), minutes(1))
+        first, second = AttractionStatus.objects.order_by("timestamp")
+        self.assertEqual(first.schedule_payload_id, second.schedule_payload_id)
+        self.assertNotEqual(first.payload_id, second.payload_id)
+        self.assertEqual(RawPayload.objects.count(), 3)
+        self.assertIsNone(second.raw_data)
+        self.assertEqual(
+            second.get_raw_data(), attraction_item(wait=45, updated=minutes(1))
+        )
+
+    def test_inline_raw_data_is_moved_into_the_store(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=45, at=1), minutes(1))
+        items = {
+            status.pk: status.get_raw_data()
+            for status in AttractionStatus.objects.all()
+        }
+        for pk, item in items.items():
+            AttractionStatus.objects.filter(pk=pk).update(
+                raw_data=item, payload=None, schedule_payload=None
+            )
+        RawPayload.objects.all().delete()
+
+        call_command("migrate_raw_payloads", chunk_size=1, stdout=StringIO())
+
+        self.assertEqual(RawPayload.objects.count(), 3)
+        for status in AttractionStatus.objects.all():
+            self.assertIsNone(status.raw_data)
+            self.assertIsNotNone(status.payload_id)
+            self.assertEqual(status.get_raw_data(), items[status.pk])
+
+    def test_failed_migration_is_a_command_error(self):
+        ingest(ride_status(wait=30), START)
+        status = AttractionStatus.objects.get()
+        AttractionStatus.objects.update(raw_data=status.get_raw_data(), payload=None)
+        with mock.patch.object(
+            RawPayload.objects, "bulk_create", side_effect=DatabaseError("disk full")
+        ):
+            with self.assertRaisesMessage(CommandError, "disk full"):
+                call_command("migrate_raw_payloads", stdout=StringIO())
+        self.assertIsNotNone(AttractionStatus.objects.get().raw_data)
+
+
+class StubApi:
+    """Local HTTP server answering each GET with the next queued response
+
+    Responses are (status, headers, body, delay) tuples; the request headers
+    of every call are kept in ``requests``.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(dict(self.headers))
+                status, headers, body, delay = stub.responses.pop(0)
+                time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    # The client gave up waiting
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def respond(self, status=200, data=None, headers=None, delay=0):
+        body = json.dumps(data).encode() if data is not None else b""
+        self.responses.append((status, headers or {}, body, delay))
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def stub_client(**kwargs):
+    options = {
+        "connect_timeout": 1,
+        "read_timeout": 1,
+        "max_retries": 2,
+        "backoff_base": 0.001,
+        "backoff_max": 0.001,
+        "breaker_threshold": 5,
+        "breaker_reset_timeout": 60,
+    }
+    options.update(kwargs)
+    return ApiClient(**options)
+
+
+class ApiClientTests(TestCase):
+    def setUp(self):
+        self.api = StubApi()
+        self.addCleanup(self.api.close)
+        self.url = f"{self.api.base_url}/entity/{PARK_ID}/live"
+
+    def test_ok_response_is_returned(self):
+        self.api.respond(data={"id": PARK_ID})
+        result = stub_client().get_json(self.url)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.data, {"id": PARK_ID})
+        self.assertFalse(result.unchanged)
+        self.assertEqual(result.attempts, 1)
+
+    def test_not_modified_reuses_the_cached_body(self):
+        client = stub_client()
+        self.api.respond(data={"id": PARK_ID}, headers={"ETag": '"v1"'})
+        self.api.respond(304)
+        first = client.get_json(self.url)
+        second = client.get_json(self.url)
+        self.assertNotIn("If-None-Match", self.api.requests[0])
+        self.assertEqual(self.api.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual(second.status_code, 304)
+        self.assertTrue(second.unchanged)
+        self.assertEqual(second.data, first.data)
+
+    def test_server_error_is_retried(self):
+        self.api.respond(503)
+        self.api.respond(data={"id": PARK_ID})
+        result = stub_client().get_json(self.url)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.attempts, 2)
+        self.assertEqual(len(self.api.requests), 2)
+
+    def test_slow_response_times_out(self):
+        self.api.respond(data={"id": PARK_ID}, delay=0.5)
+        client = stub_client(read_timeout=0.1, max_retries=0)
+        with self.assertRaises(requests.Timeout):
+            client.get_json(self.url)
+        self.assertEqual(client.breaker_for(self.url).failures, 1)
+
+    def test_breakers_are_kept_per_url(self):
+        client = stub_client(max_retries=0, breaker_threshold=1)
+        other_url = f"{self.api.base_url}/entity/{OTHER_PARK_ID}/live"
+        self.api.respond(503)
+        with self.assertRaises(requests.HTTPError):
+            client.get_json(self.url)
+        with self.assertRaises(CircuitOpenError):
+            client.get_json(self.url)
+
+        # Another park's feed is still fetched
+        self.api.respond(data={"id": OTHER_PARK_ID})
+        self.assertEqual(client.get_json(other_url).data, {"id": OTHER_PARK_ID})
+        self.assertEqual(len(self.api.requests), 2)
+
+    def test_retry_after_sets_the_retry_delay(self):
+        self.api.respond(429, headers={"Retry-After": "1"})
+        self.api.respond(data={"id": PARK_ID})
+        client = stub_client(backoff_max=5)
+        with mock.patch("theme_park_data.api_client.time.sleep") as sleep:
+            result = client.get_json(self.url)
+        self.assertEqual(result.attempts, 2)
+        self.assertIn(mock.call(1.0), sleep.call_args_list)
+
+    def test_long_retry_after_holds_the_url(self):
+        self.api.respond(429, headers={"Retry-After": "120"})
+        client = stub_client()
+        with self.assertRaises(requests.HTTPError):
+            client.get_json(self.url)
+        # Neither retried now nor called again before the time has passed
+        with self.assertRaisesMessage(CircuitOpenError, "retry after"):
+            client.get_json(self.url)
+        self.assertEqual(len(self.api.requests), 1)
+        self.assertEqual(client.breaker_for(self.url).failures, 0)
+
+    def test_retry_after_date(self):
+        response = requests.Response()
+        response.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+        self.assertEqual(retry_after(response), 0)
+        response.headers["Retry-After"] = "soon"
+        self.assertIsNone(retry_after(response))
+
+    def test_body_that_is_not_json_is_a_failure(self):
+        self.api.responses.append((200, {}, b"{truncated", 0))
+        client = stub_client(breaker_threshold=1)
+        with self.assertRaises(ValueError):
+            client.get_json(self.url)
+        self.assertTrue(client.breaker_for(self.url).is_open)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FetchLiveDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        services._last_processed.clear()
+        self.addCleanup(services._last_processed.clear)
+        self.api = StubApi()
+        self.addCleanup(self.api.close)
+
+    def fetch(self, client):
+        with override_settings(THEME_PARK_API_BASE_URL=self.api.base_url):
+            service = ThemeParkApiService(client=client, entity_id=PARK_ID)
+        return service.fetch_live_data()
+
+    def test_payload_is_stored(self):
+        self.api.respond(data=live_payload(attraction_item()))
+        self.assertIsNotNone(self.fetch(stub_client()))
+        self.assertIn(PARK_ID, services._last_processed)
+        self.assertEqual(AttractionStatus.objects.count(), 1)
+
+    def test_failed_ingest_is_retried_on_the_next_poll(self):
+        client = stub_client()
+        payload = live_payload(attraction_item())
+        self.api.respond(data=payload, headers={"ETag": '"v1"'})
+        self.api.respond(304)
+        with mock.patch.object(
+            ThemeParkApiService, "_build_park", side_effect=ValueError("bad park")
+        ):
+            self.fetch(client)
+        self.assertNotIn(PARK_ID, services._last_processed)
+        self.assertFalse(Park.objects.exists())
+
+        # The same payload comes back unchanged and is processed again
+        self.assertEqual(self.fetch(client), payload)
+        self.assertIn(PARK_ID, services._last_processed)
+        self.assertEqual(AttractionStatus.objects.count(), 1)
+
+
+class StubClient:
+    """API client answering each park's live data URL from a dict
+
+    Values are payloads, or exceptions to raise for that park.
+    """
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get_json(self, url):
+        response = self.responses[url.split("/")[-2]]
+        if isinstance(response, Exception):
+            raise response
+        return FetchResult(200, response, payload_digest(response), False, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class FetchParksTests(TransactionTestCase):
+    def setUp(self):
+        # Committed writes are remembered past the flush between tests
+        entity_registry.clear()
+        self.addCleanup(entity_registry.clear)
+
+    def fetch(self, responses):
+        client = StubClient(responses)
+        with mock.patch(
+            "theme_park_data.services.get_default_client", return_value=client
+        ):
+            # The in-memory SQLite test database locks out concurrent writers
+            return fetch_parks(list(responses), max_workers=1)
+
+    def test_parks_are_returned_in_order(self):
+        other = live_payload(park_id=OTHER_PARK_ID, name="Other")
+        results = self.fetch({PARK_ID: live_payload(), OTHER_PARK_ID: other})
+        self.assertEqual(
+            [(service.entity_id, data) for service, data in results],
+            [(PARK_ID, live_payload()), (OTHER_PARK_ID, other)],
+        )
+        self.assertEqual(
+            sorted(Park.objects.values_list("name", flat=True)), ["Other", "Park"]
+        )
+
+    def test_a_failing_park_does_not_stop_the_others(self):
+        broken = live_payload(park_id=OTHER_PARK_ID)
+        del broken["name"]
+        unreachable = str(uuid.UUID(int=101))
+        results = self.fetch(
+            {
+                unreachable: requests.ConnectionError("unreachable"),
+                OTHER_PARK_ID: broken,
+                PARK_ID: ride_status(),
+            }
+        )
+        self.assertEqual(
+            [data is None for service, data in results], [True, False, False]
+        )
+        self.assertEqual(
+            list(Park.objects.values_list("id", flat=True)), [uuid.UUID(PARK_ID)]
+        )
+        self.assertEqual(AttractionStatus.objects.count(), 1)
+
+    @override_settings(THEME_PARK_ENTITY_IDS=[PARK_ID])
+    def test_no_parks_fetches_nothing(self):
+        with mock.patch("theme_park_data.services.ThemeParkApiService") as service:
+            self.assertEqual(fetch_parks([]), [])
+        service.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ParkSelectionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ingest(ride_status(), START)
+        other_ride = dict(attraction_item(wait=10), id=str(uuid.UUID(int=11)))
+        ingest(live_payload(other_ride, park_id=OTHER_PARK_ID, name="Another"), START)
+
+    def current_waits(self, **params):
+        return self.client.get("/park/api/current-waits/", params)
+
+    def test_first_park_by_name_is_the_default(self):
+        data = self.current_waits().json()
+        self.assertEqual(data["park_id"], OTHER_PARK_ID)
+        self.assertEqual([a["standby_wait_time"] for a in data["attractions"]], [10])
+
+    def test_park_parameter_selects_the_park(self):
+        data = self.current_waits(park=PARK_ID).json()
+        self.assertEqual(data["park_name"], "Park")
+        self.assertEqual([a["id"] for a in data["attractions"]], [RIDE_ID])
+
+    def test_unknown_or_invalid_park_is_not_found(self):
+        self.assertEqual(self.current_waits(park=str(uuid.uuid4())).status_code, 404)
+        self.assertEqual(self.current_waits(park="not-a-park").status_code, 404)
+
+
+class FakeParkService:
+    """Stands in for ThemeParkApiService inside the Ingestor"""
+
+    def __init__(self, entity_id):
+        self.entity_id = entity_id
+        self.last_fetch_unchanged = False
+        self.last_ingest_stats = {"rows_written": 2}
+        self.polled = threading.Event()
+
+    def fetch_live_data(self):
+        self.polled.set()
+        if self.entity_id == OTHER_PARK_ID:
+            raise requests.ConnectionError("unreachable")
+        return {"id": self.entity_id}
+
+
+@mock.patch("theme_park_data.ingestor.close_old_connections", mock.Mock())
+@mock.patch("theme_park_data.ingestor.ThemeParkApiService", FakeParkService)
+class IngestorTests(SimpleTestCase):
+    def run_once(self, entity_ids):
+        """Run the loop until every park has been polled, then stop it"""
+        ingestor = Ingestor(entity_ids, interval=60, max_workers=2)
+        runner = threading.Thread(target=ingestor.run)
+        runner.start()
+        for service in ingestor.services.values():
+            self.assertTrue(service.polled.wait(5))
+        ingestor.stop()
+        runner.join(5)
+        self.assertFalse(runner.is_alive())
+        return ingestor
+
+    def test_one_cycle_polls_every_park(self):
+        snapshot = self.run_once([PARK_ID, OTHER_PARK_ID]).stats.snapshot()
+        self.assertEqual(snapshot["polls"], 2)
+        self.assertEqual(snapshot["failures"], 1)
+        self.assertEqual(snapshot["rows_written"], 2)
+        self.assertEqual(set(snapshot["parks"]), {PARK_ID, OTHER_PARK_ID})
+        self.assertIsNotNone(snapshot["parks"][PARK_ID]["seconds_since_success"])
+        self.assertIsNone(snapshot["parks"][OTHER_PARK_ID]["seconds_since_success"])
+
+    def test_unchanged_fetches_are_counted(self):
+        ingestor = Ingestor([PARK_ID], interval=60)
+        service = ingestor.services[PARK_ID]
+        service.last_fetch_unchanged = True
+        ingestor._poll(PARK_ID, due=0)
+        snapshot = ingestor.stats.snapshot()
+        self.assertEqual((snapshot["unchanged"], snapshot["rows_written"]), (1, 0))
+        self.assertGreater(snapshot["max_lag_seconds"], 0)
+
+    def test_next_poll_waits_for_the_policy_interval(self):
+        policy = PollingPolicy(base_interval=60, adaptive=False)
+        ingestor = Ingestor([PARK_ID], policy=policy)
+        ingestor._poll(PARK_ID, due=0)
+        self.assertGreaterEqual(ingestor._next_due[PARK_ID], ingestor.stats.started_at)
+        snapshot = ingestor.stats.snapshot()
+        self.assertEqual(snapshot["parks"][PARK_ID]["poll_interval_seconds"], 60)
+
+    def test_connections_are_checked_around_each_poll(self):
+        ingestor = Ingestor([OTHER_PARK_ID], interval=60)
+        with mock.patch(
+            "theme_park_data.ingestor.close_old_connections"
+        ) as close_old_connections:
+            # The fake service raises for this park
+            ingestor._poll(OTHER_PARK_ID, due=0)
+        self.assertEqual(close_old_connections.call_count, 2)
+        self.assertEqual(ingestor.stats.snapshot()["failures"], 1)
+
+    def test_stop_ends_the_loop(self):
+        ingestor = self.run_once([PARK_ID])
+        self.assertTrue(ingestor.wait_for_stop(0))
+        self.assertTrue(ingestor._executor._shutdown)
+
+
+class PollingPolicyTests(SimpleTestCase):
+    def setUp(self):
+        self.policy = PollingPolicy(
+            base_interval=60,
+            fast_interval=20,
+            closed_interval=900,
+            margin=30,
+            change_fraction=0.5,
+            adaptive=True,
+        )
+
+    def next_interval(self, data, at):
+        return self.policy.next_interval(PARK_ID, data, now=at)
+
+    def test_open_park_is_polled_at_the_base_interval(self):
+        self.assertEqual(self.next_interval(ride_status(), START), 60)
+        # Operating hours are 09:00 to 21:00, widened by the margin
+        self.assertEqual(self.next_interval(ride_status(), START.replace(hour=21)), 60)
+
+    def test_closed_park_is_polled_at_the_closed_interval(self):
+        late = START.replace(hour=23)
+        self.assertEqual(self.next_interval(ride_status(), late), 900)
+
+    def test_closed_interval_stops_short_of_the_next_opening(self):
+        early = START.replace(hour=8, minute=20)
+        self.assertEqual(self.next_interval(ride_status(), early), 600)
+        # Never sooner than the base interval
+        early = START.replace(hour=8, minute=29)
+        self.assertEqual(self.next_interval(ride_status(), early), 60)
+
+    def test_churn_while_open_is_polled_at_the_fast_interval(self):
+        self.assertEqual(self.next_interval(ride_status(wait=30), START), 60)
+        self.assertEqual(self.next_interval(ride_status(wait=45), minutes(1)), 20)
+        self.assertEqual(self.next_interval(ride_status(wait=45), minutes(2)), 60)
+
+    def test_base_interval_without_hours_or_data(self):
+        item = attraction_item()
+        del item["operatingHours"]
+        self.assertEqual(self.next_interval(live_payload(item), START), 60)
+        self.assertEqual(self.next_interval(None, START), 60)
+        self.policy.adaptive = False
+        late = START.replace(hour=23)
+        self.assertEqual(self.next_interval(ride_status(), late), 60)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CurrentStatusTests(TestCase):
+    def current(self):
+        return AttractionCurrentStatus.objects.get(attraction_id=RIDE_ID)
+
+    def test_status_since_is_kept_while_the_status_holds(self):
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=45, at=1), minutes(1))
+        current = self.current()
+        self.assertEqual(current.timestamp, minutes(1))
+        self.assertEqual(current.standby_wait_time, 45)
+        self.assertEqual(current.status_since, START)
+
+        ingest(ride_status("DOWN", None, at=2), minutes(2))
+        current = self.current()
+        self.assertEqual(current.status, "DOWN")
+        self.assertIsNone(current.standby_wait_time)
+        self.assertEqual(current.status_since, minutes(2))
+        # Once an attraction has reported a wait it keeps being listed
+        self.assertTrue(current.reports_wait_times)
+        self.assertEqual(AttractionCurrentStatus.objects.count(), 1)
+
+    def test_show_current_status_points_at_the_newest_status(self):
+        ingest(live_payload(show_item([])), START)
+        ingest(
+            live_payload(show_item([], status="CLOSED", updated=minutes(1))),
+            minutes(1),
+        )
+        current = ShowCurrentStatus.objects.get(show_id=SHOW_ID)
+        newest = ShowStatus.objects.latest("timestamp")
+        self.assertEqual(current.show_status_id, newest.id)
+        self.assertEqual(current.status, "CLOSED")
+        self.assertEqual(ShowCurrentStatus.objects.count(), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LoadSampleDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        call_command("load_sample_data", stdout=StringIO())
+
+    def test_current_waits_lists_the_sample_attractions(self):
+        response = self.client.get("/park/api/current-waits/")
+        self.assertEqual(response.status_code, 200)
+        attractions = response.json()["attractions"]
+        self.assertEqual(len(attractions), Attraction.objects.count())
+        for attraction in attractions:
+            latest = AttractionStatus.objects.filter(
+                attraction_id=attraction["id"]
+            ).latest("timestamp")
+            self.assertEqual(attraction["status"], latest.status)
+            self.assertEqual(attraction["standby_wait_time"], latest.standby_wait_time)
+
+    def test_sample_shows_list_upcoming_showtimes(self):
+        shows = list(Show.objects.all())
+        upcoming = upcoming_showtimes(shows, datetime.now(dt_timezone.utc), 5)
+        self.assertEqual(set(upcoming), {show.id for show in shows})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ingest(ride_status(wait=30), START)
+
+    def get(self, query="", **headers):
+        return self.client.get(f"/park/api/current-waits/?{query}", **headers)
+
+    def waits(self, response):
+        return [a["standby_wait_time"] for a in response.json()["attractions"]]
+
+    def cached_responses(self):
+        return sum(":current_waits:" in key for key in cache._cache)
+
+    def test_matching_etag_is_not_modified(self):
+        first = self.get()
+        etag = first["ETag"]
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("no-cache", first["Cache-Control"])
+
+        repeat = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat.content, b"")
+        self.assertEqual(repeat["ETag"], etag)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_key_is_the_generation_and_the_sorted_query(self):
+        first = self.get(f"park={PARK_ID}&format=json")
+        with self.assertNumQueries(0):
+            reordered = self.get(f"format=json&park={PARK_ID}")
+        self.assertEqual(reordered.content, first.content)
+        with self.assertNumQueries(0):
+            self.get(f"park={PARK_ID}&format=json")
+        self.assertEqual(self.cached_responses(), 1)
+        # Any other query string is a separate entry
+        self.get(f"park={PARK_ID}")
+        self.assertEqual(self.cached_responses(), 2)
+
+    def test_bump_generation_invalidates_cached_responses(self):
+        etag = self.get()["ETag"]
+        AttractionCurrentStatus.objects.update(standby_wait_time=50)
+        self.assertEqual(self.waits(self.get()), [30])
+
+        bump_generation()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.waits(response), [50])
+
+    def test_ingest_invalidates_cached_responses(self):
+        self.assertEqual(self.waits(self.get()), [30])
+        ingest(ride_status(wait=45, at=1), minutes(1))
+        self.assertEqual(self.waits(self.get()), [45])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class GenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_increments_by_one(self):
+        first = bump_generation()
+        self.assertEqual(bump_generation(), first + 1)
+        self.assertEqual(current_generation(), first + 1)
+
+    def test_evicted_copy_is_reloaded_from_the_database(self):
+        generation = bump_generation()
+        cache.delete(GENERATION_KEY)
+        self.assertEqual(current_generation(), generation)
+        self.assertEqual(bump_generation(), generation + 1)
+
+    def test_copy_does_not_expire(self):
+        bump_generation()
+        self.assertIsNone(
+            cache._expire_info[cache.make_and_validate_key(GENERATION_KEY)]
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class PublishChangesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_each_park_gets_its_own_event(self):
+        first = publish_changes("park-a", {"attractions": [{"id": "a"}]})
+        second = publish_changes("park-b", {"attractions": [{"id": "b"}]})
+        self.assertNotEqual(first, second)
+        self.assertEqual(
+            json.loads(cache.get(EVENT_KEY.format(first)))["park_id"], "park-a"
+        )
+        self.assertEqual(
+            json.loads(cache.get(EVENT_KEY.format(second)))["park_id"], "park-b"
+        )
+
+    def test_event_is_stored_before_the_generation_is_visible(self):
+        seen = []
+        original = cache.set
+
+        def set_and_check(key, *args, **kwargs):
+            if key == GENERATION_KEY:
+                seen.append(cache.get(EVENT_KEY.format(args[0])) is not None)
+            return original(key, *args, **kwargs)
+
+        with mock.patch.object(cache, "set", set_and_check):
+            publish_changes("park-a", {})
+        self.assertEqual(seen, [True])
+
+
+def event_data(event_id, park_id=PARK_ID):
+    return json.dumps(
+        {"park_id": park_id, "attractions": [{"id": event_id}], "shows": []}
+    )
+
+
+def pending_frames(subscriber):
+    frames = []
+    while not subscriber.queue.empty():
+        frames.append(subscriber.queue.get_nowait())
+    return frames
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EventBroadcasterTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.broadcaster = EventBroadcaster()
+        self.broadcaster.buffer = deque(maxlen=2)
+        # Streams are resumed without starting the polling task
+        self.broadcaster._task = mock.Mock(done=lambda: False)
+        self.broadcaster.last_id = self.broadcaster.covered_from = 1
+        for event_id in range(2, 6):
+            cache.set(EVENT_KEY.format(event_id), event_data(event_id))
+            self.deliver(event_id)
+
+    def deliver(self, event_id):
+        self.broadcaster._deliver(event_id, event_data(event_id))
+        self.broadcaster.last_id = event_id
+
+    def event_ids(self, subscriber):
+        return [
+            int(frame.split("\n")[0].removeprefix("id: "))
+            for frame in pending_frames(subscriber)
+        ]
+
+    async def test_resume_from_the_buffer(self):
+        subscriber = await self.broadcaster.subscribe(last_event_id=3)
+        self.assertEqual(self.event_ids(subscriber), [4, 5])
+
+    async def test_resume_from_the_cache(self):
+        subscriber = await self.broadcaster.subscribe(last_event_id=1)
+        self.assertEqual(self.event_ids(subscriber), [2, 3, 4, 5])
+
+    async def test_resume_skips_other_parks(self):
+        subscriber = await self.broadcaster.subscribe(OTHER_PARK_ID, last_event_id=1)
+        self.assertEqual(pending_frames(subscriber), [])
+
+    async def test_events_delivered_during_catch_up_are_replayed(self):
+        original = cache.get_many
+
+        def get_many_while_delivering(keys):
+            self.deliver(6)
+            return original(keys)
+
+        with mock.patch.object(cache, "get_many", get_many_while_delivering):
+            subscriber = await self.broadcaster.subscribe(last_event_id=1)
+        self.assertEqual(self.event_ids(subscriber), [2, 3, 4, 5, 6])
+
+    async def test_buffer_moving_past_the_copy_resets(self):
+        original = cache.get_many
+
+        def get_many_while_delivering(keys):
+            for event_id in (6, 7, 8):
+                self.deliver(event_id)
+            return original(keys)
+
+        with mock.patch.object(cache, "get_many", get_many_while_delivering):
+            subscriber = await self.broadcaster.subscribe(last_event_id=1)
+        self.assertEqual(
+            pending_frames(subscriber), ["event: reset\ndata: {}\nid: 8\n\n"]
+        )
+
+    async def test_expired_events_reset(self):
+        cache.delete(EVENT_KEY.format(2))
+        subscriber = await self.broadcaster.subscribe(last_event_id=1)
+        self.assertEqual(
+            pending_frames(subscriber), ["event: reset\ndata: {}\nid: 5\n\n"]
+        )
+
+    async def test_id_older_than_the_catch_up_limit_resets(self):
+        subscriber = await self.broadcaster.subscribe(last_event_id=3 - MAX_CATCH_UP)
+        self.assertEqual(
+            pending_frames(subscriber), ["event: reset\ndata: {}\nid: 5\n\n"]
+        )
+
+
+class EventStreamViewTests(SimpleTestCase):
+    def test_wsgi_is_not_served(self):
+        response = self.client.get("/park/api/events/")
+        self.assertEqual(response.status_code, 501)
+
+    async def test_invalid_park(self):
+        response = await self.async_client.get("/park/api/events/", {"park": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_stream_resumes_from_last_event_id(self):
+        subscriber = Subscriber(PARK_ID)
+        subscriber.send("id: 7\nevent: update\ndata: {}\n\n")
+        subscriber.send(None)
+        with mock.patch.object(
+            broadcaster, "subscribe", mock.AsyncMock(return_value=subscriber)
+        ) as subscribe:
+            response = await self.async_client.get(
+                "/park/api/events/", {"park": PARK_ID}, headers={"Last-Event-ID": "6"}
+            )
+            frames = [frame async for frame in response.streaming_content]
+        subscribe.assert_awaited_once_with(PARK_ID, 6)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(
+            [frame.decode() for frame in frames],
+            ["retry: 5000\n\n", "id: 7\nevent: update\ndata: {}\n\n"],
+        )
+
+
+class SketchTests(SimpleTestCase):
+    def test_encode_round_trip(self):
+        sketch = sketches.from_weights({10: 60.0, 25: 180.0})
+        means, weights = sketches.decode(sketches.encode(sketch))
+        self.assertEqual(means.tolist(), [10.0, 25.0])
+        self.assertEqual(weights.tolist(), [60.0, 180.0])
+        self.assertEqual(len(sketches.decode(None)[0]), 0)
+
+    def test_merge_combines_equal_waits(self):
+        merged = sketches.merge(
+            [sketches.from_weights({10: 60}), sketches.from_weights({10: 30, 20: 90})]
+        )
+        self.assertEqual(merged[0].tolist(), [10.0, 20.0])
+        self.assertEqual(merged[1].tolist(), [90.0, 90.0])
+        self.assertEqual(sketches.quantiles(merged, [0.5]), [15.0])
+
+    def test_large_sketches_are_compressed(self):
+        sketch = sketches.from_weights({wait: 1.0 for wait in range(1000)})
+        self.assertLessEqual(len(sketch[0]), sketches.COMPRESSION)
+        self.assertEqual(sketch[1].sum(), 1000)
+        median, p99 = sketches.quantiles(sketch, [0.5, 0.99])
+        self.assertAlmostEqual(median, 499.5, delta=10)
+        self.assertAlmostEqual(p99, 989.5, delta=5)
+        self.assertEqual(sketches.quantiles(sketches.empty(), [0.5]), [None])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=60, at=10), minutes(10))
+
+    def test_closed_interval_is_rolled_up_in_park_time(self):
+        rollup = AttractionWaitRollup.objects.get(attraction_id=RIDE_ID)
+        local = START.astimezone(park_timezone("America/New_York"))
+        self.assertEqual((rollup.local_date, rollup.hour), (local.date(), local.hour))
+        self.assertEqual(rollup.weekday, local.weekday())
+        self.assertEqual(rollup.covered_seconds, 600)
+        self.assertEqual(rollup.wait_sum, 30 * 600)
+        self.assertEqual((rollup.min_wait, rollup.max_wait), (30, 30))
+        self.assertEqual(
+            sketches.quantiles(sketches.decode(rollup.wait_sketch), [0.5]), [30.0]
+        )
+
+    def test_wait_profile_adds_the_current_status(self):
+        attraction = Attraction.objects.select_related("park", "current_status").get(
+            id=RIDE_ID
+        )
+        profile = wait_profile(attraction, now=minutes(20), percentiles=(50,))
+        hour = START.astimezone(park_timezone("America/New_York")).hour
+        self.assertEqual(list(profile), [hour])
+        self.assertEqual(
+            profile[hour],
+            {"average": 45.0, "min": 30, "max": 60, "percentiles": {50: 45.0}},
+        )
+
+
+class ForecastTests(TestCase):
+    def setUp(self):
+        park = Park.objects.create(
+            id=PARK_ID, name="Park", entity_type="PARK", timezone="America/New_York"
+        )
+        self.park = park
+        self.ride = Attraction.objects.create(
+            id=RIDE_ID, park=park, name="Ride", entity_type="ATTRACTION"
+        )
+
+    def rollup(self, local_date, hour, wait, seconds=600):
+        AttractionWaitRollup.objects.create(
+            attraction=self.ride,
+            local_date=local_date,
+            hour=hour,
+            weekday=local_date.weekday(),
+            covered_seconds=seconds,
+            wait_sum=wait * seconds,
+        )
+
+    def test_sparse_cells_lean_on_the_hour_profile(self):
+        # 20 minutes on Saturdays at 10:00 for 600s, 30 on Sundays for 7200s
+        expected = fit_profiles(
+            np.array([0, 0]),
+            np.array([5, 6]),
+            np.array([10, 10]),
+            np.array([20.0 * 600, 30.0 * 7200]),
+            np.array([600.0, 7200.0]),
+            1,
+        )
+        self.assertEqual(expected.shape, (1, 7, 24))
+        hour_average = (20 * 600 + 30 * 7200) / 7800
+        saturday = 600 / 7800
+        sunday = 7200 / 14400
+        self.assertAlmostEqual(
+            expected[0, 5, 10], saturday * 20 + (1 - saturday) * hour_average
+        )
+        self.assertAlmostEqual(
+            expected[0, 6, 10], sunday * 30 + (1 - sunday) * hour_average
+        )
+        # Other weekdays fall back to the hour profile, and unknown hours
+        # stay unknown
+        self.assertAlmostEqual(expected[0, 0, 10], hour_average)
+        self.assertTrue(np.isnan(expected[0, 0, 11]))
+
+    def test_current_deviation_fades_with_the_horizon(self):
+        expected = np.full((2, 7, 24), np.nan)
+        expected[:, 0, 10] = 20
+        expected[0, 0, 11] = 30
+        forecast = predict(
+            expected,
+            np.array([40.0, 25.0]),
+            (np.array([0, 0]), np.array([10, 10])),
+            (np.array([[0], [0]]), np.array([[11], [11]])),
+            [1],
+            1,
+        )
+        self.assertAlmostEqual(forecast[0, 0], 30 + 20 * math.exp(-1))
+        # Without a profile for the target hour the current wait is kept
+        self.assertEqual(forecast[1, 0], 25)
+
+    @override_settings(THEME_PARK_FORECAST_TRAINING_DAYS=1)
+    def test_training_window_starts_on_the_park_local_date(self):
+        # 02:00 UTC on June 2 is still June 1 in New York, so the window
+        # reaches back to May 31 there
+        now = datetime(2025, 6, 2, 2, 0, tzinfo=dt_timezone.utc)
+        self.rollup(date(2025, 5, 30), 10, 50)
+        self.rollup(date(2025, 5, 31), 10, 20)
+        self.rollup(date(2025, 6, 1), 10, 30)
+        profiles = train_park(self.park, now=now)
+        self.assertEqual(profiles.attraction_ids, [RIDE_ID])
+        self.assertAlmostEqual(profiles.expected[0, 0, 10], 25)
+
+        before = train_park(self.park, now=now, before=date(2025, 6, 1))
+        self.assertAlmostEqual(before.expected[0, 0, 10], 20)
+
+    def test_backtest_reports_each_horizon(self):
+        out = StringIO()
+        call_command("backtest_forecasts", attraction_counts="10", stdout=out)
+        self.assertIn("No rollups to time training on", out.getvalue())
+
+        self.rollup(date(2025, 6, 1), 10, 30)
+        out = StringIO()
+        with override_settings(THEME_PARK_FORECAST_HORIZONS_HOURS=[1, 2]):
+            call_command("backtest_forecasts", attraction_counts="10", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            lines[1:3], ["+1h: no forecasts to compare", "+2h: no forecasts to compare"]
+        )
+        self.assertTrue(lines[3].startswith("10 attractions (10 rollup rows)"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status("DOWN", None, at=1), minutes(1))
+        other_ride = dict(attraction_item(wait=10), id=str(uuid.UUID(int=11)))
+        ingest(live_payload(other_ride, park_id=OTHER_PARK_ID, name="Other"), START)
+
+    def export(self, export_format="ndjson", **kwargs):
+        chunks = export_stream(
+            "attraction-statuses", START, minutes(2), export_format, **kwargs
+        )
+        return b"".join(chunks)
+
+    def test_ndjson_rows_in_primary_key_order(self):
+        rows = [json.loads(line) for line in self.export().decode().splitlines()]
+        self.assertEqual(
+            [(row["attraction_id"], row["standby_wait_time"]) for row in rows],
+            [(RIDE_ID, 30), (RIDE_ID, None), (str(uuid.UUID(int=11)), 10)],
+        )
+        self.assertEqual(rows[0]["attraction_name"], "Ride")
+        self.assertEqual(rows[1]["timestamp"], _iso(minutes(1)))
+
+    def test_csv_filtered_by_park(self):
+        export = self.export("csv", park_id=PARK_ID).decode()
+        header, first, second = csv.reader(export.splitlines())
+        self.assertEqual(
+            header[:4], ["id", "timestamp", "attraction_id", "attraction_name"]
+        )
+        self.assertEqual((first[4], first[5]), ("OPERATING", "30"))
+        self.assertEqual((second[4], second[5]), ("DOWN", ""))
+        self.assertEqual(first[1], START.isoformat())
+
+    def test_gzip_wraps_the_same_export(self):
+        self.assertEqual(gzip.decompress(self.export(gzip=True)), self.export())
+
+    def test_view_streams_to_staff_only(self):
+        url = "/park/api/export/attraction-statuses/"
+        params = {"from": _iso(START), "to": _iso(minutes(2)), "park": PARK_ID}
+        self.assertEqual(self.client.get(url, params).status_code, 302)
+
+        staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("attachment;", response["Content-Disposition"])
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 2)
+
+        self.assertEqual(self.client.get(url, {"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"park": "x"}).status_code, 400)
+        missing = self.client.get("/park/api/export/unknown/")
+        self.assertEqual(missing.status_code, 404)
+
+    def test_command_writes_the_export_to_a_file(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output = os.path.join(directory.name, "statuses.ndjson")
+        call_command(
+            "export_history",
+            "attraction-statuses",
+            "--from",
+            _iso(START),
+            "--to",
+            _iso(minutes(2)),
+            "--output",
+            output,
+            stdout=StringIO(),
+        )
+        with open(output, "rb") as f:
+            self.assertEqual(f.read(), self.export())
+
+
+DAY = date(2025, 5, 1)
+
+
+def at_day(hour, minute=0):
+    return datetime(DAY.year, DAY.month, DAY.day, hour, minute, tzinfo=dt_timezone.utc)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class HistoryStorageTestCase(TestCase):
+    """A ride with three statuses on DAY: 20 and 40 minutes, then down"""
+
+    def setUp(self):
+        cache.clear()
+        ingest(ride_status(), START)
+        tz = park_timezone("America/New_York")
+        for moment, status, wait in (
+            (at_day(10), "OPERATING", 20),
+            (at_day(10, 10), "OPERATING", 40),
+            (at_day(10, 20), "DOWN", None),
+        ):
+            stamp_local_time(
+                AttractionStatus(
+                    attraction_id=RIDE_ID,
+                    timestamp=moment,
+                    status=status,
+                    standby_wait_time=wait,
+                    last_updated=moment,
+                ),
+                tz,
+            ).save()
+
+    def history(self):
+        timestamps, statuses, standby, single_rider = read_attraction_history(
+            RIDE_ID, PARK_ID, at_day(0), at_day(23)
+        )
+        return (
+            timestamps.tolist(),
+            statuses.tolist(),
+            [None if math.isnan(wait) else wait for wait in standby.tolist()],
+        )
+
+
+class CompactionTests(HistoryStorageTestCase):
+    def summaries(self, resolution):
+        return AttractionStatusSummary.objects.filter(
+            attraction_id=RIDE_ID, resolution=resolution
+        ).order_by("bucket_start")
+
+    def test_raw_day_becomes_quarter_hours_then_hours(self):
+        self.assertEqual(compact_raw_day(RIDE_ID, PARK_ID, DAY), 3)
+        self.assertFalse(
+            AttractionStatus.objects.filter(timestamp__lt=at_day(23)).exists()
+        )
+        quarters = self.summaries(QUARTER_HOUR)
+        self.assertEqual(
+            [
+                (q.bucket_start, q.sample_count, q.covered_seconds, q.standby_sum)
+                for q in quarters
+            ],
+            [
+                (at_day(10), 2, 900, 20 * 600 + 40 * 300),
+                (at_day(10, 15), 1, 900, 40 * 300),
+                (at_day(10, 30), 0, 360, 0),
+            ],
+        )
+        # Nothing is left to compact the second time
+        self.assertEqual(compact_raw_day(RIDE_ID, PARK_ID, DAY), 0)
+
+        self.assertEqual(compact_summary_day(RIDE_ID, DAY), 3)
+        self.assertFalse(self.summaries(QUARTER_HOUR).exists())
+        hour = self.summaries(HOUR).get()
+        self.assertEqual(hour.bucket_start, at_day(10))
+        self.assertEqual(hour.sample_count, 3)
+        self.assertEqual(hour.covered_seconds, 2160)
+        self.assertEqual(hour.operating_seconds, 1200)
+        self.assertEqual((hour.standby_min, hour.standby_max), (20, 40))
+        self.assertEqual(hour.last_status, "DOWN")
+
+        starts, ends, waits, resolutions = summary_segments(
+            RIDE_ID, at_day(0), at_day(23)
+        )
+        self.assertEqual(starts.tolist(), [at_day(10).timestamp()])
+        self.assertEqual((ends - starts).tolist(), [1200])
+        self.assertEqual(waits.tolist(), [30.0])
+        self.assertEqual(resolutions.tolist(), [HOUR])
+
+
+class ArchiveTests(HistoryStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_dir = override_settings(THEME_PARK_ARCHIVE_DIR=directory.name)
+        archive_dir.enable()
+        self.addCleanup(archive_dir.disable)
+
+    def test_archived_day_reads_back_the_same_history(self):
+        before = self.history()
+        records = list(
+            AttractionStatus.objects.filter(timestamp__lt=at_day(23))
+            .order_by("pk")
+            .values_list(
+                "attraction_id",
+                "id",
+                "timestamp",
+                "status",
+                "last_updated",
+                "payload_id",
+                "schedule_payload_id",
+                "standby_wait_time",
+                "single_rider_wait_time",
+            )
+        )
+        call_command("archive_statuses", kind=["attractions"], stdout=StringIO())
+
+        self.assertFalse(
+            AttractionStatus.objects.filter(timestamp__lt=at_day(23)).exists()
+        )
+        self.assertEqual(self.history(), before)
+        archived = ArchiveDay(day_path("attractions", PARK_ID, DAY))
+        self.assertEqual(
+            list(archived.records()),
+            [(str(record[0]), *record[1:]) for record in records],
+        )
+
+        # Writing the same rows again keeps one copy of each
+        self.assertEqual(write_day("attractions", PARK_ID, DAY, records), 3)
+        self.assertEqual(self.history(), before)
+
+
+class PartitionReferenceTests(SimpleTestCase):
+    def test_current_show_status_is_an_unconstrained_reference(self):
+        self.assertEqual(
+            unconstrained_references(ShowStatus),
+            [ShowCurrentStatus._meta.get_field("show_status")],
+        )
+        self.assertEqual(unconstrained_references(AttractionStatus), [])
+
+
+@skipUnless(connection.vendor == "postgresql", "partitioning needs PostgreSQL")
+class PartitionTests(TransactionTestCase):
+    table = ShowStatus._meta.db_table
+
+    def setUp(self):
+        park = Park.objects.create(
+            id=PARK_ID, name="Park", entity_type="PARK", timezone="UTC"
+        )
+        self.show = Show.objects.create(
+            id=SHOW_ID, park=park, name="Show", entity_type="SHOW"
+        )
+
+    def partition_of(self, status):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {self.table} WHERE id = %s",
+                [status.id],
+            )
+            return cursor.fetchone()[0]
+
+    def add_partition(self, start, end):
+        with connection.cursor() as cursor:
+            name = create_partition(cursor, self.table, "timestamp", start, end)
+        self.addCleanup(self.drop_table, name)
+        return name
+
+    def drop_table(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {name}")
+
+    def test_history_tables_are_partitioned(self):
+        with connection.cursor() as cursor:
+            for model in PARTITIONED_MODELS:
+                self.assertTrue(is_partitioned(cursor, model._meta.db_table))
+            cursor.execute(
+                "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = %s::regclass AND contype = 'p'",
+                [self.table],
+            )
+            self.assertEqual(cursor.fetchone()[0], 'PRIMARY KEY (id, "timestamp")')
+
+    def test_partitioning_again_changes_nothing(self):
+        with connection.schema_editor() as schema_editor:
+            partition_table(schema_editor, ShowStatus, "timestamp", "month", 2, START)
+        first = ShowStatus.objects.create(show=self.show, status="OPERATING")
+        second = ShowStatus.objects.create(show=self.show, status="CLOSED")
+        self.assertGreater(second.id, first.id)
+
+    def test_new_partition_takes_its_rows_from_the_default(self):
+        start = datetime(2001, 1, 1, tzinfo=dt_timezone.utc)
+        status = ShowStatus.objects.create(
+            show=self.show, status="OPERATING", timestamp=start + timedelta(hours=1)
+        )
+        self.assertEqual(self.partition_of(status), f"{self.table}_default")
+
+        name = self.add_partition(start, start + timedelta(days=1))
+        self.assertEqual(name, f"{self.table}_p20010101")
+        self.assertEqual(self.partition_of(status), name)
+
+    def test_partition_with_a_current_status_is_kept(self):
+        start = datetime(2001, 2, 1, tzinfo=dt_timezone.utc)
+        old = self.add_partition(start, start + timedelta(days=1))
+        current = self.add_partition(
+            start + timedelta(days=1), start + timedelta(days=2)
+        )
+        ShowStatus.objects.create(
+            show=self.show, status="OPERATING", timestamp=start + timedelta(hours=1)
+        )
+        status = ShowStatus.objects.create(
+            show=self.show, status="CLOSED", timestamp=start + timedelta(hours=25)
+        )
+        ShowCurrentStatus.objects.create(
+            show=self.show,
+            park_id=PARK_ID,
+            show_status=status,
+            timestamp=status.timestamp,
+            status=status.status,
+        )
+
+        cutoff = start + timedelta(days=2)
+        self.assertEqual(
+            expire_partitions(ShowStatus, cutoff, "drop", dry_run=True), [old]
+        )
+        self.assertEqual(expire_partitions(ShowStatus, cutoff, "drop"), [old])
+        self.assertEqual(
+            list(ShowStatus.objects.values_list("id", flat=True)), [status.id]
+        )
+        self.assertEqual(self.partition_of(status), current)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TransitionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_status_changes_write_transitions(self):
+        ingest(ride_status(), START)
+        ingest(ride_status("DOWN", None, at=5), minutes(5))
+        ingest(ride_status(at=20), minutes(20))
+        self.assertEqual(
+            list(
+                StatusTransition.objects.values_list(
+                    "from_status", "to_status", "started", "ended"
+                )
+            ),
+            [
+                ("OPERATING", "DOWN", START, minutes(5)),
+                ("DOWN", "OPERATING", minutes(5), minutes(20)),
+            ],
+        )
+        events = downtime_events([RIDE_ID], START, minutes(60), now=minutes(30))
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["duration_seconds"], 900)
+        self.assertEqual(events[0]["to_status"], "OPERATING")
+
+        attraction = Attraction.objects.select_related("park").get(id=RIDE_ID)
+        (day,) = uptime(attraction, START, minutes(60), now=minutes(30))
+        self.assertEqual(day["operating_seconds"], 900)
+        self.assertEqual(day["downtime_seconds"], 900)
+        self.assertEqual(day["uptime_percent"], 50.0)
+
+    def test_gap_in_the_data_ends_the_period(self):
+        ingest(ride_status(), START)
+        ingest(ride_status(at=30), minutes(30))
+        transition = StatusTransition.objects.get()
+        self.assertEqual(transition.from_status, "OPERATING")
+        self.assertIsNone(transition.to_status)
+        self.assertEqual(transition.ended, minutes(16))
+        self.assertEqual(
+            AttractionCurrentStatus.objects.get(attraction_id=RIDE_ID).status_since,
+            minutes(30),
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ScheduleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_hours_are_stored_once(self):
+        ingest(ride_status(wait=30), START)
+        later = attraction_item(wait=45, updated=minutes(1))
+        later["operatingHours"][0]["endTime"] = _iso(START.replace(hour=22))
+        ingest(live_payload(later), minutes(1))
+
+        hours = OperatingHours.objects.get()
+        self.assertEqual(hours.start_time, START.replace(hour=9))
+        self.assertEqual(hours.end_time, START.replace(hour=22))
+        self.assertEqual(hours.first_seen, START)
+        self.assertEqual(hours.last_seen, minutes(1))
+
+    def test_duplicate_entries_are_written_once(self):
+        ingest(ride_status(), START)
+        entries = [
+            OperatingHours(
+                attraction_id=RIDE_ID,
+                type="OPERATING",
+                start_time=START.replace(hour=9),
+                end_time=START.replace(hour=hour),
+                first_seen=START,
+                last_seen=START,
+            )
+            for hour in (20, 21)
+        ]
+        self.assertEqual(save_schedule(OperatingHours, entries), 1)
+        self.assertEqual(OperatingHours.objects.get().end_time, START.replace(hour=21))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class UpcomingShowtimesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def upcoming(self):
+        show = Show.objects.get(id=SHOW_ID)
+        return [
+            showtime.start_time
+            for showtime in upcoming_showtimes([show], START, 5).get(show.id, [])
+        ]
+
+    def test_moved_showtime_replaces_the_old_one(self):
+        first = [START + timedelta(hours=1), START + timedelta(hours=2)]
+        ingest(live_payload(show_item(first)), START)
+        moved = [START + timedelta(hours=1), START + timedelta(hours=2, minutes=30)]
+        ingest(
+            live_payload(show_item(moved, updated=START + timedelta(minutes=1))),
+            START + timedelta(minutes=1),
+        )
+        self.assertEqual(self.upcoming(), moved)
+        self.assertEqual(
+            ShowStatus.objects.latest("timestamp").timestamp,
+            START + timedelta(minutes=1),
+        )
+
+    def test_cancelled_show_lists_no_showtimes(self):
+        ingest(live_payload(show_item([START + timedelta(hours=1)])), START)
+        ingest(
+            live_payload(
+                show_item([], status="CLOSED", updated=START + timedelta(minutes=1))
+            ),
+            START + timedelta(minutes=1),
+        )
+        self.assertEqual(self.upcoming(), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class RecentHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ingest(ride_status(wait=30), START)
+        ingest(ride_status(wait=60, at=10), minutes(10))
+        ingest(ride_status("DOWN", None, at=12), minutes(12))
+        self.attraction = Attraction.objects.get(id=RIDE_ID)
+
+    def test_chart_summary_and_recent_rows(self):
+        result = recent_history(
+            self.attraction, START - timedelta(hours=1), minutes(20)
+        )
+        self.assertEqual(result["labels"], ["14:00", "14:10"])
+        self.assertEqual(result["waits"], [30, 60])
+        # 30 minutes held for 10 minutes, 60 minutes for 2
+        self.assertEqual(
+            result["summary"], {"average": 35.0, "median": 30, "p90": 60, "max": 60}
+        )
+        self.assertEqual(
+            [(row["status"], row["standby_wait_time"]) for row in result["recent"]],
+            [("DOWN", None), ("OPERATING", 60), ("OPERATING", 30)],
+        )
+
+    def test_status_current_at_the_start_is_carried_in(self):
+        result = recent_history(self.attraction, minutes(5), minutes(20), recent=1)
+        self.assertEqual(result["labels"], ["14:05", "14:10"])
+        self.assertEqual(result["waits"], [30, 60])
+        self.assertEqual(result["summary"]["average"], 38.6)
+        self.assertEqual([row["timestamp"] for row in result["recent"]], [minutes(12)])
+
+    def test_last_wait_is_extended_while_it_is_current(self):
+        AttractionStatus.objects.filter(timestamp__gt=START).delete()
+        result = recent_history(self.attraction, START, minutes(5))
+        self.assertEqual(result["labels"], ["14:00", "14:05"])
+        self.assertEqual(result["waits"], [30, 30])
+        # Not once the status is older than the heartbeat allows
+        result = recent_history(self.attraction, START, minutes(30))
+        self.assertEqual(result["waits"], [30])
+
+    def test_empty_range(self):
+        self.assertEqual(
+            recent_history(self.attraction, minutes(60), minutes(90)),
+            {"labels": [], "waits": [], "summary": None, "recent": []},
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class AttractionHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # 30 minutes from 14:00 until 14:10, then 60 minutes until now
+        ingest(live_payload(attraction_item(wait=30)), START)
+        changed = START + timedelta(minutes=10)
+        ingest(live_payload(attraction_item(wait=60, updated=changed)), changed)
+        self.now = START + timedelta(minutes=20)
+
+    def history(self, start, end, points):
+        attraction = Attraction.objects.select_related("park", "current_status").get(
+            id=RIDE_ID
+        )
+        with frozen(self.now):
+            return attraction_history(attraction, start, end, points)
+
+    def test_hourly_buckets_include_the_current_hour(self):
+        resolution, timestamps, waits = self.history(
+            self.now - timedelta(hours=24), self.now, 24
+        )
+        self.assertEqual(resolution, "hourly")
+        self.assertEqual(
+            timestamps.tolist(), [(self.now - timedelta(hours=1)).timestamp()]
+        )
+        self.assertEqual(waits.tolist(), [45.0])
+
+    def test_hour_is_split_between_the_buckets_it_overlaps(self):
+        # Buckets from 13:10 to 14:10 and from 14:10 to 15:10
+        start = START - timedelta(minutes=50)
+        resolution, timestamps, waits = self.history(
+            start, start + timedelta(hours=2), 2
+        )
+        self.assertEqual(resolution, "hourly")
+        self.assertEqual(len(waits), 2)
+        self.assertEqual(waits.tolist(), [45.0, 45.0])
+
+    def test_long_ranges_never_read_raw_statuses(self):
+        with mock.patch.object(timeseries, "_raw_series") as raw_series:
+            resolution, timestamps, waits = self.history(
+                self.now - timedelta(days=90), self.now, 5000
+            )
+        raw_series.assert_not_called()
+        self.assertEqual(resolution, "hourly")
+        self.assertEqual(waits.tolist(), [45.0])
+
+    def test_long_range_points_are_capped_at_one_an_hour(self):
+        response = self.client.get(
+            f"/park/api/attractions/{RIDE_ID}/history/",
+            {
+                "from": (START - timedelta(days=89)).isoformat(),
+                "to": (START + timedelta(days=1)).isoformat(),
+                "points": 5000,
+                "mode": "lttb",
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["resolution"], "hourly")
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LocalTimeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # 10:00 and 22:30 on Sunday 1 June in New York, then 07:00 on Monday
+        ingest(ride_status(), START)
+        ingest(ride_status("DOWN", None, at=750), minutes(750))
+        ingest(ride_status(at=1260), minutes(1260))
+        self.attraction = Attraction.objects.get(id=RIDE_ID)
+
+    def local_times(self, model=AttractionStatus):
+        return list(
+            model.objects.order_by("timestamp").values_list(
+                "local_date", "local_hour", "local_weekday"
+            )
+        )
+
+    def test_ingest_stamps_park_local_time(self):
+        sunday, monday = date(2025, 6, 1), date(2025, 6, 2)
+        self.assertEqual(
+            self.local_times(), [(sunday, 10, 6), (sunday, 22, 6), (monday, 7, 0)]
+        )
+        ingest(live_payload(show_item([])), START)
+        self.assertEqual(self.local_times(ShowStatus), [(sunday, 10, 6)])
+
+    def test_status_reports_group_on_local_time(self):
+        sunday, monday = date(2025, 6, 1), date(2025, 6, 2)
+        self.assertEqual(
+            status_reports(self.attraction, sunday, monday),
+            {sunday: {"DOWN": 1, "OPERATING": 1}, monday: {"OPERATING": 1}},
+        )
+        self.assertEqual(
+            status_reports(self.attraction, sunday, sunday, "hour"),
+            {10: {"OPERATING": 1}, 22: {"DOWN": 1}},
+        )
+        self.assertEqual(
+            list(status_reports(self.attraction, sunday, monday, "weekday")), [0, 6]
+        )
+
+    def test_status_reports_view(self):
+        url = f"/park/api/attractions/{RIDE_ID}/status-reports/"
+        data = self.client.get(url, {"end": "2025-06-02", "days": 2}).json()
+        self.assertEqual(
+            data["reports"],
+            [
+                {
+                    "date": "2025-06-01",
+                    "rows": 2,
+                    "by_status": {"DOWN": 1, "OPERATING": 1},
+                },
+                {"date": "2025-06-02", "rows": 1, "by_status": {"OPERATING": 1}},
+            ],
+        )
+        self.assertEqual(self.client.get(url, {"by": "minute"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"days": 0}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"end": "June"}).status_code, 400)
+
+    def test_migration_backfills_existing_statuses(self):
+        stamped = self.local_times()
+        AttractionStatus.objects.update(
+            local_date=None, local_hour=None, local_weekday=None
+        )
+        migration = import_module("theme_park_data.migrations.0010_local_time_columns")
+        with mock.patch.object(migration, "BATCH_SIZE", 2):
+            migration.stamp_local_time(apps, None)
+        self.assertEqual(self.local_times(), stamped)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class EntityRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.registry = EntityRegistry()
+        self.park = Park(id=PARK_ID, name="Park", timezone="America/New_York")
+
+    def save(self, park):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.registry.save(Park, [park])
+
+    def test_unchanged_entity_is_written_once(self):
+        self.assertEqual(self.save(self.park), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.save(self.park), 0)
+
+        renamed = Park(id=PARK_ID, name="Renamed", timezone="America/New_York")
+        self.assertEqual(self.save(renamed), 1)
+        self.assertEqual(Park.objects.get().name, "Renamed")
+
+    def test_fingerprint_is_remembered_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(self.registry.save(Park, [self.park]), 1)
+            # Until the write commits the entity is written again
+            self.assertEqual(self.registry.save(Park, [self.park]), 1)
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.save(self.park), 0)
+
+    def test_rolled_back_write_is_not_remembered(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.registry.save(Park, [self.park])
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        self.assertFalse(Park.objects.exists())
+        self.assertEqual(self.save(self.park), 1)
+
+    def test_forget_and_clear_write_again(self):
+        self.save(self.park)
+        self.registry.forget(Park, PARK_ID)
+        self.assertEqual(self.save(self.park), 1)
+        self.registry.clear()
+        self.assertEqual(self.save(self.park), 1)
+
+    def test_failed_bulk_ingest_writes_every_entity_again(self):
+        entity_registry.clear()
+        self.addCleanup(entity_registry.clear)
+        # The park was written once, then removed behind the registry's back
+        park = Park(id=PARK_ID, name="Park", entity_type="PARK")
+        park.timezone = "America/New_York"
+        entity_registry._remember({(Park, PARK_ID): (park, fingerprint(park))})
+        with mock.patch.object(
+            AttractionStatus.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            ingest(ride_status(), START)
+        self.assertEqual(Park.objects.get().name, "Park")
+        self.assertEqual(AttractionStatus.objects.count(), 1)
+
+
+class TelemetryTests(TestCase):
+    def setUp(self):
+        self.recorder = ApiCallRecorder()
+
+    def record(self, at, response_time, success=True):
+        with frozen(at):
+            self.recorder.record(
+                "entity/live",
+                status_code=200 if success else 503,
+                response_time=response_time,
+                success=success,
+                error_message=None if success else "unavailable",
+            )
+
+    def test_calls_are_counted_per_minute(self):
+        self.record(START, 0.02)
+        self.record(START + timedelta(seconds=10), 0.04)
+        self.record(START + timedelta(seconds=20), 0.5, success=False)
+        # Only failures are written straight away
+        self.assertFalse(ApiCallMinute.objects.exists())
+        self.assertEqual(ApiLog.objects.get().status_code, 503)
+
+        # A call in the next minute writes the minute that ended
+        self.record(START + timedelta(minutes=1), 0.02)
+        minute = ApiCallMinute.objects.get()
+        self.assertEqual(minute.minute, START)
+        self.assertEqual((minute.call_count, minute.error_count), (3, 1))
+        self.assertAlmostEqual(minute.latency_sum, 0.56)
+        self.assertEqual(minute.latency_max, 0.5)
+        self.assertEqual(sum(minute.latency_histogram), 3)
+
+        self.assertEqual(self.recorder.flush(), 1)
+        self.assertEqual(ApiCallMinute.objects.count(), 2)
+        self.assertEqual(self.recorder.flush(), 0)
+
+    def test_flushes_of_the_same_minute_are_merged(self):
+        self.record(START, 0.02)
+        self.recorder.flush()
+        self.record(START + timedelta(seconds=30), 0.02, success=False)
+        self.recorder.flush()
+        minute = ApiCallMinute.objects.get()
+        self.assertEqual((minute.call_count, minute.error_count), (2, 1))
+
+        overall, by_endpoint = fetch_health(START, minutes(1))
+        self.assertEqual(overall["calls"], 2)
+        self.assertEqual(overall["success_rate"], 50.0)
+        self.assertEqual(list(by_endpoint), ["entity/live"])
+
+    def test_histogram_quantiles(self):
+        histogram = [0] * 22
+        histogram[0] = 2
+        histogram[1] = 2
+        self.assertEqual(
+            histogram_quantiles(histogram, [0.5, 1.0], max_latency=0.04),
+            [0.025, 0.04],
+        )
+        self.assertEqual(histogram_quantiles([0] * 22, [0.5], None), [None])
@@ -0,0 +1,327 @@
+import logging
+from datetime import datetime, time, timedelta
+import numpy as np
+from django.utils import timezone
+from .archive import read_attraction_history
+from .compaction import summary_segments, tier_name
+from .models import AttractionStatus, AttractionWaitRollup
+from .rollups import add_interval, park_timezone, status_validity
+
+logger = logging.getLogger(__name__)
+
+DOWNSAMPLE_MODES = ("average", "lttb")
+
+# Buckets at least this wide are built from the hourly rollups
+ROLLUP_RESOLUTION_SECONDS = 3600
+
+# Longer ranges always come from the hourly rollups, at most one point an hour
+MAX_RAW_SPAN_SECONDS = 2 * 24 * 3600
+
+
+def step_bucket_averages(starts, ends, values, edges):
+    """Time-weighted average of a step series over each pair of edges
+
+    The series holds ``values[i]`` from ``starts[i]`` until ``ends[i]``;
+    segments must be sorted and must not overlap. NaN values count as no
+    data. Returns one average per bucket, NaN where a bucket has no data.
+    """
+    known = ~np.isnan(values)
+    weighted = np.where(known, values, 0.0) * (ends - starts)
+    covered = np.where(known, ends - starts, 0.0)
+    cum_weighted = np.concatenate(([0.0], np.cumsum(weighted)))
+    cum_covered = np.concatenate(([0.0], np.cumsum(covered)))
+
+    # Integral up to each edge: every segment before the one the edge falls
+    # in is complete, plus the covered part of that last segment
+    index = np.searchsorted(starts, edges, side="right") - 1
+    safe = np.clip(index, 0, None)
+    partial = np.clip(np.minimum(edges, ends[safe]) - starts[safe], 0, None)
+    partial = np.where(index >= 0, partial, 0.0)
+    at_weighted = cum_weighted[safe] + np.where(known[safe], values[safe], 0) * partial
+    at_covered = cum_covered[safe] + np.where(known[safe], partial, 0.0)
+    at_weighted = np.where(index >= 0, at_weighted, 0.0)
+    at_covered = np.where(index >= 0, at_covered, 0.0)
+
+    weighted_sums = np.diff(at_weighted)
+    covered_sums = np.diff(at_covered)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(covered_sums > 0, weighted_sums / covered_sums, np.nan)
+
+
+def lttb(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets
+
+    Keeps the first and last points and, from each of ``threshold - 2``
+    equal-count buckets in between, the point forming the largest triangle
+    with the point kept before it and the average of the next bucket. Each
+    bucket is scored with array operations.
+    """
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    bounds = np.linspace(1, count - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0] = 0
+    kept[-1] = count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        next_start = end
+        next_end = bounds[bucket + 2] if bucket + 2 < len(bounds) else count
+        next_x = x[next_start:next_end].mean()
+        next_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def _raw_series(attraction, start, end):
+    """Status segments overlapping start..end as (starts, ends, waits, tier)
+
+    Periods that have been compacted come from the 15-minute or hourly
+    summaries instead of the raw statuses; ``tier`` is the coarsest one used.
+    """
+    max_gap = status_validity()
+    # Archived days and the live table are read through one interface
+    starts, statuses, values, single_rider_waits = read_attraction_history(
+        attraction.id, attraction.park_id, start - max_gap, end
+    )
+    # Each row holds until the next one, at most the status validity, and the
+    # last one until the end of the range (or now, if sooner)
+    if len(starts):
+        limit = min(end, timezone.now()).timestamp()
+        following = np.append(starts[1:], max(limit, starts[-1]))
+        ends = np.minimum(following, starts + max_gap.total_seconds())
+    else:
+        ends = np.empty(0)
+
+    summary_starts, summary_ends, summary_values, resolutions = summary_segments(
+        attraction.id, start, end
+    )
+    if not len(summary_starts):
+        return starts, ends, values, "raw"
+
+    starts = np.concatenate((starts, summary_starts))
+    ends = np.concatenate((ends, summary_ends))
+    values = np.concatenate((values, summary_values))
+    order = np.argsort(starts, kind="stable")
+    starts, ends, values = starts[order], ends[order], values[order]
+    # Raw and compacted periods meet at day boundaries; keep them apart
+    ends = np.minimum(ends, np.append(starts[1:], np.inf))
+    return starts, ends, values, tier_name(int(resolutions.max()))
+
+
+def _hourly_series(attraction, start, end):
+    """Hourly rollups in start..end as (starts, ends, waits, weights) arrays
+
+    The current hour, which still includes the current status, ends now.
+    """
+    tz = park_timezone(attraction.park.timezone)
+    local_start = start.astimezone(tz).date() - timedelta(days=1)
+    local_end = end.astimezone(tz).date()
+    rows = list(
+        AttractionWaitRollup.objects.filter(
+            attraction=attraction,
+            local_date__gte=local_start,
+            local_date__lte=local_end,
+            covered_seconds__gt=0,
+        ).values_list("local_date", "hour", "wait_sum", "covered_seconds")
+    )
+
+    # The current status has not been rolled up yet
+    current = getattr(attraction, "current_status", None)
+    if current is not None:
+        buckets = {}
+        add_interval(
+            buckets,
+            attraction.id,
+            current.timestamp,
+            min(timezone.now(), current.timestamp + status_validity()),
+            current.standby_wait_time,
+            tz,
+        )
+        rows.extend(
+            (local_date, hour, bucket[3], bucket[2])
+            for (_, local_date, hour), bucket in buckets.items()
+        )
+
+    hours = {}
+    for local_date, hour, wait_sum, covered in rows:
+        hour_start = datetime.combine(local_date, time(hour), tz).timestamp()
+        total = hours.setdefault(hour_start, [0.0, 0.0])
+        total[0] += wait_sum
+        total[1] += covered
+
+    starts = np.array(sorted(hours), dtype=float)
+    weights = np.array([hours[hour][1] for hour in starts], dtype=float)
+    waits = np.array([hours[hour][0] for hour in starts], dtype=float) / np.where(
+        weights > 0, weights, 1
+    )
+    in_range = (starts + ROLLUP_RESOLUTION_SECONDS > start.timestamp()) & (
+        starts < end.timestamp()
+    )
+    ends = np.minimum(starts + ROLLUP_RESOLUTION_SECONDS, timezone.now().timestamp())
+    return starts[in_range], ends[in_range], waits[in_range], weights[in_range]
+
+
+def attraction_history(attraction, start, end, points, mode="average"):
+    """Standby wait history of an attraction, downsampled to about ``points``
+
+    Ranges whose buckets span an hour or more are built from the hourly
+    rollups, so the cost depends on the number of points rather than on how
+    much raw history the range covers. So are ranges longer than
+    MAX_RAW_SPAN_SECONDS, with ``points`` lowered to one an hour. Shorter
+    ranges use the raw statuses, or the 15-minute and hourly summaries where
+    those have been compacted.
+    In ``average`` mode each of ``points`` equal buckets gets its
+    time-weighted average wait; in ``lttb`` mode the points that best keep
+    the shape of the series are selected.
+    Returns ``(resolution, timestamps, waits)`` with epoch-second timestamps.
+    """
+    span = (end - start).total_seconds()
+    weights = None
+    if span > MAX_RAW_SPAN_SECONDS:
+        points = min(points, int(span // ROLLUP_RESOLUTION_SECONDS))
+    if span / points >= ROLLUP_RESOLUTION_SECONDS:
+        resolution = "hourly"
+        starts, ends, values, weights = _hourly_series(attraction, start, end)
+    else:
+        starts, ends, values, resolution = _raw_series(attraction, start, end)
+
+    if not len(starts):
+        return resolution, np.empty(0), np.empty(0)
+
+    if mode == "lttb":
+        # Points are each segment's start, clamped to the range
+        known = ~np.isnan(values)
+        x = np.clip(starts[known], start.timestamp(), end.timestamp())
+        y = values[known]
+        kept = lttb(x, y, points)
+        return resolution, x[kept], y[kept]
+
+    edges = np.linspace(start.timestamp(), end.timestamp(), points + 1)
+    if weights is not None:
+        # Buckets are at least an hour wide, so each rollup hour overlaps the
+        # bucket its start falls in and at most the next one. Its weight is
+        # split between them by the share of the hour each one covers.
+        first = np.searchsorted(edges, starts, side="right") - 1
+        length = np.maximum(ends - starts, 1e-9)
+        weighted = np.zeros(points)
+        covered = np.zeros(points)
+        for index in (first, first + 1):
+            valid = (index >= 0) & (index < points)
+            lower = edges[index[valid]]
+            upper = edges[index[valid] + 1]
+            overlap = np.clip(
+                np.minimum(ends[valid], upper) - np.maximum(starts[valid], lower),
+                0,
+                None,
+            )
+            share = weights[valid] * overlap / length[valid]
+            weighted += np.bincount(
+                index[valid], weights=values[valid] * share, minlength=points
+            )
+            covered += np.bincount(index[valid], weights=share, minlength=points)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            averages = np.where(covered > 0, weighted / covered, np.nan)
+    else:
+        averages = step_bucket_averages(starts, ends, values, edges)
+
+    known = ~np.isnan(averages)
+    return resolution, edges[:-1][known], averages[known]
+
+
+def _clock_labels(seconds):
+    """``HH:MM`` (UTC) labels for an array of epoch seconds"""
+    minutes = (seconds // 60).astype(np.int64) % 1440
+    hours = np.char.zfill((minutes // 60).astype(str), 2)
+    return np.char.add(
+        np.char.add(hours, ":"), np.char.zfill((minutes % 60).astype(str), 2)
+    )
+
+
+def _weighted_percentiles(values, weights, fractions):
+    """Percentiles of ``values`` where each counts for its weight"""
+    order = np.argsort(values, kind="stable")
+    cumulative = np.cumsum(weights[order])
+    index = np.searchsorted(cumulative, np.asarray(fractions) * cumulative[-1])
+    return values[order][np.minimum(index, len(values) - 1)]
+
+
+def recent_history(attraction, start, end, recent=10):
+    """Chart series, wait summary and latest rows of start..end in one query
+
+    The statuses are read once as columns with ``values_list`` and every
+    output comes from array operations on them:
+
+    - ``labels``/``waits``: the chart points, starting with the status that
+      was current at ``start`` and extended to ``end`` while the last status
+      is still valid;
+    - ``summary``: the time-weighted average, median, 90th percentile and
+      maximum standby wait over the range, or None without waits;
+    - ``recent``: the newest ``recent`` statuses in the range, newest first,
+      as dicts with ``timestamp``, ``status`` and ``standby_wait_time``.
+    """
+    max_gap = status_validity()
+    rows = list(
+        AttractionStatus.objects.filter(
+            attraction=attraction, timestamp__gte=start - max_gap, timestamp__lte=end
+        )
+        .order_by("timestamp")
+        .values_list("timestamp", "status", "standby_wait_time")
+    )
+    result = {"labels": [], "waits": [], "summary": None, "recent": []}
+    if not rows:
+        return result
+
+    timestamps, statuses, waits = zip(*rows)
+    seconds = np.fromiter((t.timestamp() for t in timestamps), float, len(rows))
+    waits = np.array(waits, dtype=float)
+    start_s, end_s, gap_s = start.timestamp(), end.timestamp(), max_gap.total_seconds()
+    first = int(np.searchsorted(seconds, start_s, side="left"))
+
+    # Each status holds until the next, at most the status validity
+    following = np.append(seconds[1:], end_s)
+    holds_until = np.minimum(np.minimum(following, seconds + gap_s), end_s)
+    held = np.clip(holds_until - np.maximum(seconds, start_s), 0, None)
+    known = ~np.isnan(waits)
+
+    # Chart: the carried-in status at the start, every status with a wait
+    # in the range, and the last one again at the end if still current
+    points = np.concatenate(([start_s], seconds[first:], [end_s]))
+    values = np.concatenate(([waits[first - 1] if first else np.nan], waits[first:]))
+    current = first < len(seconds) and end_s - seconds[-1] <= gap_s
+    values = np.append(values, waits[-1] if current else np.nan)
+    show = ~np.isnan(values)
+    result["labels"] = _clock_labels(points[show]).tolist()
+    result["waits"] = values[show].astype(int).tolist()
+
+    weighted = known & (held > 0)
+    if weighted.any():
+        average = np.average(waits[weighted], weights=held[weighted])
+        median, p90 = _weighted_percentiles(
+            waits[weighted], held[weighted], (0.5, 0.9)
+        ).astype(int)
+        result["summary"] = {
+            "average": round(float(average), 1),
+            "median": int(median),
+            "p90": int(p90),
+            "max": int(waits[weighted].max()),
+        }
+
+    newest = range(len(rows) - 1, max(first, len(rows) - recent) - 1, -1)
+    result["recent"] = [
+        {
+            "timestamp": timestamps[index],
+            "status": statuses[index],
+            "standby_wait_time": rows[index][2],
+        }
+        for index in newest
+    ]
+    return result
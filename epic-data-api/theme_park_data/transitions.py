@@ -0,0 +1,176 @@
+from datetime import datetime, time, timedelta
+from django.db.models import Q
+from django.utils import timezone
+from .models import AttractionCurrentStatus, StatusTransition
+from .rollups import park_timezone, status_validity
+
+OPERATING = "OPERATING"
+
+# Statuses that count against uptime. Time in other statuses (CLOSED,
+# REFURBISHMENT) is planned and left out of the percentage.
+DOWNTIME_STATUSES = ("DOWN",)
+
+UPTIME_PERIODS = ("day", "week")
+
+
+def _ends_period(previous, status, max_gap):
+    """When and into what the previous status's period ends, or None
+
+    A period ends when the status changes, or at the end of the status
+    validity when the next status comes later than that.
+    """
+    if previous is None or status.timestamp <= previous.timestamp:
+        return None
+    if status.timestamp - previous.timestamp > max_gap:
+        return previous.timestamp + max_gap, None
+    if status.status != previous.status:
+        return status.timestamp, status.status
+    return None
+
+
+def status_transition(previous, status, max_gap=None):
+    """Unsaved StatusTransition ended by a new status, if it ends one
+
+    ``previous`` is the attraction's current-state row before the status.
+    """
+    ending = _ends_period(previous, status, max_gap or status_validity())
+    if ending is None:
+        return None
+    ended, to_status = ending
+    return StatusTransition(
+        attraction_id=status.attraction_id,
+        park_id=previous.park_id,
+        from_status=previous.status,
+        to_status=to_status,
+        started=previous.status_since or previous.timestamp,
+        ended=ended,
+    )
+
+
+def period_start(previous, status, max_gap=None):
+    """When the period of a new status began"""
+    if previous is None or previous.status_since is None:
+        return status.timestamp
+    if _ends_period(previous, status, max_gap or status_validity()) is not None:
+        return status.timestamp
+    return previous.status_since
+
+
+def status_periods(attraction_ids, start, end, now=None, statuses=None):
+    """Status periods of the given attractions overlapping start..end
+
+    Reads the transitions and adds each attraction's current status from
+    when it began until now, or until the end of its validity if no status
+    has arrived since. ``statuses`` limits the periods to those statuses.
+    Returns ``(attraction_id, status, started, ended, to_status, ongoing)``
+    tuples ordered by start.
+    """
+    now = now or timezone.now()
+    transitions = StatusTransition.objects.filter(
+        attraction_id__in=attraction_ids, ended__gt=start, started__lt=end
+    )
+    currents = AttractionCurrentStatus.objects.filter(
+        Q(status_since__lt=end) | Q(status_since__isnull=True, timestamp__lt=end),
+        attraction_id__in=attraction_ids,
+    )
+    if statuses is not None:
+        transitions = transitions.filter(from_status__in=statuses)
+        currents = currents.filter(status__in=statuses)
+
+    periods = [
+        (attraction_id, from_status, started, ended, to_status, False)
+        for attraction_id, from_status, started, ended, to_status in (
+            transitions.values_list(
+                "attraction_id", "from_status", "started", "ended", "to_status"
+            )
+        )
+    ]
+    max_gap = status_validity()
+    for current in currents:
+        started = current.status_since or current.timestamp
+        ongoing = now - current.timestamp <= max_gap
+        ended = now if ongoing else current.timestamp + max_gap
+        if ended > start and ended > started:
+            periods.append(
+                (current.attraction_id, current.status, started, ended, None, ongoing)
+            )
+    periods.sort(key=lambda period: period[2])
+    return periods
+
+
+def downtime_events(attraction_ids, start, end, now=None):
+    """Downtime periods of the given attractions overlapping start..end
+
+    Each event is a dict with the attraction id, the downtime status, when
+    it started and ended (None while it is still going on), its duration so
+    far in seconds and the status it ended in (None if the data stopped).
+    """
+    return [
+        {
+            "attraction_id": str(attraction_id),
+            "status": status,
+            "started": started,
+            "ended": None if ongoing else ended,
+            "duration_seconds": (ended - started).total_seconds(),
+            "to_status": to_status,
+        }
+        for attraction_id, status, started, ended, to_status, ongoing in (
+            status_periods(attraction_ids, start, end, now, DOWNTIME_STATUSES)
+        )
+    ]
+
+
+def _local_buckets(start, end, period, tz):
+    """Split start..end at park-local day or week boundaries
+
+    Yields ``(first_local_date_of_bucket, seconds)``.
+    """
+    cursor = start
+    while cursor < end:
+        day = cursor.astimezone(tz).date()
+        first = day - timedelta(days=day.weekday()) if period == "week" else day
+        length = 7 if period == "week" else 1
+        boundary = datetime.combine(first + timedelta(days=length), time.min, tz)
+        segment_end = min(boundary, end)
+        yield first, (segment_end - cursor).total_seconds()
+        cursor = segment_end
+
+
+def uptime(attraction, start, end, period="day", now=None):
+    """Seconds in each status and uptime percentage per local day or week
+
+    Uptime is the time operating as a share of the time operating or in a
+    downtime status, so scheduled closures do not count against it.
+    Returns a list of dicts in date order.
+    """
+    tz = park_timezone(attraction.park.timezone)
+    buckets = {}
+    for attraction_id, status, started, ended, to_status, ongoing in status_periods(
+        [attraction.id], start, end, now
+    ):
+        for first, seconds in _local_buckets(
+            max(started, start), min(ended, end), period, tz
+        ):
+            totals = buckets.setdefault(first, {})
+            totals[status] = totals.get(status, 0) + seconds
+
+    result = []
+    for first, totals in sorted(buckets.items()):
+        operating = totals.get(OPERATING, 0)
+        down = sum(totals.get(status, 0) for status in DOWNTIME_STATUSES)
+        result.append(
+            {
+                "date": first,
+                "seconds_by_status": {
+                    status: round(seconds, 1) for status, seconds in totals.items()
+                },
+                "operating_seconds": round(operating, 1),
+                "downtime_seconds": round(down, 1),
+                "uptime_percent": (
+                    round(100 * operating / (operating + down), 2)
+                    if operating + down
+                    else None
+                ),
+            }
+        )
+    return result
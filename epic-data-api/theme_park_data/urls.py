@@ -6,9 +6,34 @@ app_name = "theme_park_data"
 urlpatterns = [
     path("", views.index, name="index"),
     path("api/current-waits/", views.api_current_waits, name="api_current_waits"),
+    path("api/downtime/", views.api_downtime, name="api_downtime"),
+    path("api/events/", views.api_events, name="api_events"),
+    path("api/forecast/", views.api_forecast, name="api_forecast"),
+    path("api/fetch-health/", views.api_fetch_health, name="api_fetch_health"),
+    path("api/export/<slug:kind>/", views.export_history, name="export_history"),
     path(
         "attraction/<uuid:attraction_id>/",
         views.attraction_detail,
         name="attraction_detail",
     ),
+    path(
+        "api/attractions/<uuid:attraction_id>/history/",
+        views.api_attraction_history,
+        name="api_attraction_history",
+    ),
+    path(
+        "api/attractions/<uuid:attraction_id>/wait-profile/",
+        views.api_wait_profile,
+        name="api_wait_profile",
+    ),
+    path(
+        "api/attractions/<uuid:attraction_id>/uptime/",
+        views.api_uptime,
+        name="api_uptime",
+    ),
+    path(
+        "api/attractions/<uuid:attraction_id>/status-reports/",
+        views.api_status_reports,
+        name="api_status_reports",
+    ),
 ]
@@ -1,73 +1,91 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Max, F, Q, Avg, Count
-from django.db.models.functions import ExtractHour
-from .models import Park, Attraction, Show, AttractionStatus, ShowStatus
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import (
+    ApiLog,
+    Park,
+    Attraction,
+    AttractionCurrentStatus,
+    ShowCurrentStatus,
+)
+from .cache import cache_per_generation
+from .events import broadcaster
+from .exports import EXPORTS, EXPORT_FORMATS, export_filename, export_stream
+from .forecasting import cached_forecasts
+from .rollups import REPORT_GROUPS, park_timezone, status_reports, wait_profile
+from .schedules import upcoming_showtimes
+from .telemetry import fetch_health
+from .timeseries import DOWNSAMPLE_MODES, attraction_history, recent_history
+from .transitions import UPTIME_PERIODS, downtime_events, uptime
+import asyncio
 import json
-from datetime import timedelta
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
 
 
+def _get_park(request):
+    """Park selected by the ``park`` query parameter, defaulting to the first park"""
+    park_id = request.GET.get("park")
+    if not park_id:
+        return Park.objects.order_by("name").first()
+    try:
+        park_id = uuid.UUID(park_id)
+    except ValueError:
+        raise Http404("Invalid park id")
+    return get_object_or_404(Park, id=park_id)
+
+
+@cache_per_generation("index")
 def index(request):
     """Home page view"""
-    park = Park.objects.first()
-
-    # Get latest attraction statuses
-    attractions = (
-        Attraction.objects.annotate(latest_status_time=Max("statuses__timestamp"))
-        .prefetch_related("statuses")
-        .order_by("name")
-    )
+    park = _get_park(request)
 
-    attraction_data = []
-    for attraction in attractions:
-        latest_status = attraction.statuses.filter(
-            timestamp=attraction.latest_status_time
-        ).first()
+    # Latest statuses come from the current-state tables kept up to date at
+    # ingest, so this is one small query however much history is stored
+    attraction_data = [
+        {
+            "id": current.attraction.id,
+            "name": current.attraction.name,
+            "status": current.status,
+            "standby_wait_time": current.standby_wait_time,
+            "last_updated": current.last_updated,
+        }
+        for current in AttractionCurrentStatus.objects.filter(park=park)
+        .select_related("attraction")
+        .order_by("attraction__name")
+    ]
 
-        if latest_status:
-            attraction_data.append(
-                {
-                    "id": attraction.id,
-                    "name": attraction.name,
-                    "status": latest_status.status,
-                    "standby_wait_time": latest_status.standby_wait_time,
-                    "last_updated": latest_status.last_updated,
-                }
-            )
-
-    # Get latest show statuses
-    shows = (
-        Show.objects.annotate(latest_status_time=Max("statuses__timestamp"))
-        .prefetch_related("statuses")
-        .order_by("name")
+    # Get latest show statuses, and the next showtimes of every show in one
+    # query against the schedule table
+    now = timezone.now()
+    shows = list(
+        ShowCurrentStatus.objects.filter(park=park)
+        .select_related("show")
+        .order_by("show__name")
     )
+    upcoming = upcoming_showtimes([current.show_id for current in shows], now, 5)
 
-    show_data = []
-    for show in shows:
-        latest_status = show.statuses.filter(timestamp=show.latest_status_time).first()
-
-        if latest_status:
-            # Get upcoming showtimes
-            now = timezone.now()
-            upcoming_showtimes = latest_status.showtimes.filter(
-                start_time__gt=now
-            ).order_by("start_time")[:5]
-
-            show_data.append(
-                {
-                    "id": show.id,
-                    "name": show.name,
-                    "status": latest_status.status,
-                    "upcoming_showtimes": [
-                        st.start_time.strftime("%H:%M") for st in upcoming_showtimes
-                    ],
-                    "last_updated": latest_status.last_updated,
-                }
-            )
+    show_data = [
+        {
+            "id": current.show.id,
+            "name": current.show.name,
+            "status": current.status,
+            "upcoming_showtimes": [
+                st.start_time.strftime("%H:%M")
+                for st in upcoming.get(current.show_id, [])
+            ],
+            "last_updated": current.last_updated,
+        }
+        for current in shows
+    ]
 
     context = {
         "park": park,
+        "parks": Park.objects.order_by("name"),
         "attractions": attraction_data,
         "shows": show_data,
         "current_time": timezone.now(),
@@ -76,111 +94,472 @@ def index(request):
     return render(request, "theme_park_data/index.html", context)
 
 
+@cache_per_generation("current_waits")
 def api_current_waits(request):
     """API endpoint for current wait times"""
-    park = Park.objects.first()
+    park = _get_park(request)
 
-    # Get all attractions with their latest status
+    # Attractions that have ever reported a wait time, with their latest status
     attractions = (
-        Attraction.objects.annotate(latest_status_time=Max("statuses__timestamp"))
-        .filter(
-            Q(statuses__standby_wait_time__isnull=False)
-            | Q(statuses__single_rider_wait_time__isnull=False)
-        )
-        .prefetch_related("statuses")
-        .order_by("name")
+        AttractionCurrentStatus.objects.filter(park=park, reports_wait_times=True)
+        .select_related("attraction")
+        .order_by("attraction__name")
     )
 
     data = {
+        "park_id": str(park.id) if park else None,
         "park_name": park.name if park else "Unknown Park",
         "timestamp": timezone.now().isoformat(),
-        "attractions": [],
+        "attractions": [
+            {
+                "id": str(current.attraction.id),
+                "name": current.attraction.name,
+                "status": current.status,
+                "standby_wait_time": current.standby_wait_time,
+                "single_rider_wait_time": current.single_rider_wait_time,
+                "last_updated": (
+                    current.last_updated.isoformat() if current.last_updated else None
+                ),
+            }
+            for current in attractions
+        ],
     }
 
-    for attraction in attractions:
-        latest_status = attraction.statuses.filter(
-            timestamp=attraction.latest_status_time
-        ).first()
+    return JsonResponse(data)
 
-        if latest_status:
-            data["attractions"].append(
-                {
-                    "id": str(attraction.id),
-                    "name": attraction.name,
-                    "status": latest_status.status,
-                    "standby_wait_time": latest_status.standby_wait_time,
-                    "single_rider_wait_time": latest_status.single_rider_wait_time,
-                    "last_updated": (
-                        latest_status.last_updated.isoformat()
-                        if latest_status.last_updated
-                        else None
-                    ),
-                }
-            )
 
-    return JsonResponse(data)
+@cache_per_generation("forecast")
+def api_forecast(request):
+    """API endpoint for expected wait times over the next hours"""
+    park = _get_park(request)
+    if park is None:
+        return JsonResponse({"park_id": None, "attractions": []})
+    forecasts = cached_forecasts(park)
+    if forecasts is None:
+        return JsonResponse({"error": "Forecasts are not available"}, status=503)
+    return JsonResponse({"park_name": park.name, **forecasts})
 
 
 def attraction_detail(request, attraction_id):
     """View for showing detailed historical data about an attraction"""
-    attraction = get_object_or_404(Attraction, id=attraction_id)
-
-    # Get the latest status
-    latest_status = (
-        AttractionStatus.objects.filter(attraction=attraction)
-        .order_by("-timestamp")
-        .first()
+    attraction = get_object_or_404(
+        Attraction.objects.select_related("park", "current_status"), id=attraction_id
     )
 
-    # Get historical data for the past 24 hours
+    # The latest status comes from the current-state table, so no unbounded
+    # scan of the history is needed
+    latest_status = getattr(attraction, "current_status", None)
+
+    # The past 24 hours are read in one query and turned into the chart,
+    # summary and recent-rows table with array operations
     now = timezone.now()
-    past_24_hours = now - timedelta(hours=24)
-
-    historical_statuses = AttractionStatus.objects.filter(
-        attraction=attraction, timestamp__gte=past_24_hours
-    ).order_by("timestamp")
-
-    # Prepare chart data
-    timestamps = []
-    wait_times = []
-
-    for status in historical_statuses:
-        if status.standby_wait_time is not None:
-            timestamps.append(status.timestamp.strftime("%H:%M"))
-            wait_times.append(status.standby_wait_time)
-
-    # Get hourly averages for the past 7 days
-    past_7_days = now - timedelta(days=7)
-
-    # Use a more compatible approach instead of .extra()
-    hourly_data = (
-        AttractionStatus.objects.filter(
-            attraction=attraction,
-            timestamp__gte=past_7_days,
-            standby_wait_time__isnull=False,
-        )
-        .annotate(hour=ExtractHour("timestamp"))
-        .values("hour")
-        .annotate(avg_wait=Avg("standby_wait_time"))
-        .order_by("hour")
-    )
+    recent = recent_history(attraction, now - timedelta(hours=24), now)
+
+    # Hourly averages and percentiles for the past 7 days come from the
+    # precomputed rollups and their sketches
+    hourly_averages = wait_profile(attraction, days=7, now=now, percentiles=(90,))
 
     hours = []
     avg_waits = []
+    p90_waits = []
 
-    for data in hourly_data:
-        hour = int(data["hour"])
+    for hour, waits in hourly_averages.items():
         hours.append(f"{hour:02d}:00")
-        avg_waits.append(round(data["avg_wait"], 1))
+        avg_waits.append(round(waits["average"], 1))
+        p90 = waits["percentiles"][90]
+        p90_waits.append(None if p90 is None else round(p90, 1))
 
     context = {
         "attraction": attraction,
         "latest_status": latest_status,
-        "historical_statuses": historical_statuses[:10],  # Most recent 10
-        "chart_timestamps": json.dumps(timestamps),
-        "chart_wait_times": json.dumps(wait_times),
+        "historical_statuses": recent["recent"],  # Most recent 10
+        "day_summary": recent["summary"],
+        "chart_timestamps": json.dumps(recent["labels"]),
+        "chart_wait_times": json.dumps(recent["waits"]),
         "hourly_chart_hours": json.dumps(hours),
         "hourly_chart_waits": json.dumps(avg_waits),
+        "hourly_chart_p90": json.dumps(p90_waits),
     }
 
     return render(request, "theme_park_data/attraction_detail.html", context)
+
+
+def api_wait_profile(request, attraction_id):
+    """API endpoint for an attraction's average waits by hour or weekday"""
+    attraction = get_object_or_404(
+        Attraction.objects.select_related("park", "current_status"), id=attraction_id
+    )
+    group_by = request.GET.get("by", "hour")
+    if group_by not in ("hour", "weekday"):
+        return JsonResponse({"error": "by must be hour or weekday"}, status=400)
+    try:
+        days = int(request.GET.get("days", 7))
+    except ValueError:
+        return JsonResponse({"error": "days must be a whole number"}, status=400)
+    if not 1 <= days <= 366:
+        return JsonResponse({"error": "days must be between 1 and 366"}, status=400)
+    end_date = None
+    if request.GET.get("end"):
+        try:
+            end_date = parse_date(request.GET["end"])
+        except ValueError:
+            end_date = None
+        if end_date is None:
+            return JsonResponse({"error": "end must be a YYYY-MM-DD date"}, status=400)
+    try:
+        percentiles = [
+            float(value)
+            for value in request.GET.get("percentiles", "50,90,99").split(",")
+            if value.strip()
+        ]
+    except ValueError:
+        return JsonResponse({"error": "percentiles must be numbers"}, status=400)
+    if not all(0 <= percentile <= 100 for percentile in percentiles):
+        return JsonResponse(
+            {"error": "percentiles must be between 0 and 100"}, status=400
+        )
+
+    profile = wait_profile(
+        attraction,
+        days=days,
+        group_by=group_by,
+        percentiles=percentiles,
+        end_date=end_date,
+    )
+    return JsonResponse(
+        {
+            "attraction_id": str(attraction.id),
+            "name": attraction.name,
+            "timezone": attraction.park.timezone,
+            "days": days,
+            "end": end_date,
+            "by": group_by,
+            "waits": [
+                {
+                    group_by: key,
+                    "average_wait": round(waits["average"], 1),
+                    "min_wait": waits["min"],
+                    "max_wait": waits["max"],
+                    "percentiles": {
+                        f"p{percentile:g}": (None if wait is None else round(wait, 1))
+                        for percentile, wait in waits["percentiles"].items()
+                    },
+                }
+                for key, waits in profile.items()
+            ],
+        }
+    )
+
+
+def api_status_reports(request, attraction_id):
+    """API endpoint for an attraction's status rows per local date, hour or weekday"""
+    attraction = get_object_or_404(
+        Attraction.objects.select_related("park"), id=attraction_id
+    )
+    group_by = request.GET.get("by", "date")
+    if group_by not in REPORT_GROUPS:
+        return JsonResponse(
+            {"error": f"by must be one of {', '.join(REPORT_GROUPS)}"}, status=400
+        )
+    try:
+        days = int(request.GET.get("days", 7))
+    except ValueError:
+        return JsonResponse({"error": "days must be a whole number"}, status=400)
+    if not 1 <= days <= 366:
+        return JsonResponse({"error": "days must be between 1 and 366"}, status=400)
+    end_date = timezone.now().astimezone(park_timezone(attraction.park.timezone)).date()
+    if request.GET.get("end"):
+        try:
+            end_date = parse_date(request.GET["end"])
+        except ValueError:
+            end_date = None
+        if end_date is None:
+            return JsonResponse({"error": "end must be a YYYY-MM-DD date"}, status=400)
+    first_date = end_date - timedelta(days=days - 1)
+
+    reports = status_reports(attraction, first_date, end_date, group_by)
+    return JsonResponse(
+        {
+            "attraction_id": str(attraction.id),
+            "name": attraction.name,
+            "timezone": attraction.park.timezone,
+            "days": days,
+            "end": end_date,
+            "by": group_by,
+            "reports": [
+                {group_by: key, "rows": sum(counts.values()), "by_status": counts}
+                for key, counts in reports.items()
+            ],
+        }
+    )
+
+
+def _parse_range_bound(value, default):
+    """Parse an ISO 8601 ``from``/``to`` value, treating naive times as local"""
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid datetime: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def api_attraction_history(request, attraction_id):
+    """API endpoint for an attraction's downsampled wait time history"""
+    attraction = get_object_or_404(
+        Attraction.objects.select_related("park", "current_status"), id=attraction_id
+    )
+    now = timezone.now()
+    try:
+        end = _parse_range_bound(request.GET.get("to"), now)
+        start = _parse_range_bound(request.GET.get("from"), end - timedelta(hours=24))
+        points = int(request.GET.get("points", 200))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    mode = request.GET.get("mode", "average")
+    if mode not in DOWNSAMPLE_MODES:
+        return JsonResponse(
+            {"error": f"mode must be one of {', '.join(DOWNSAMPLE_MODES)}"},
+            status=400,
+        )
+    if start >= end:
+        return JsonResponse({"error": "from must be before to"}, status=400)
+    if not 2 <= points <= 5000:
+        return JsonResponse({"error": "points must be between 2 and 5000"}, status=400)
+
+    resolution, timestamps, waits = attraction_history(
+        attraction, start, end, points, mode
+    )
+    return JsonResponse(
+        {
+            "attraction_id": str(attraction.id),
+            "name": attraction.name,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "mode": mode,
+            "resolution": resolution,
+            "timestamps": [
+                datetime.fromtimestamp(t, dt_timezone.utc).isoformat()
+                for t in timestamps.tolist()
+            ],
+            "waits": [round(wait, 1) for wait in waits.tolist()],
+        }
+    )
+
+
+def api_downtime(request):
+    """API endpoint for a park's downtime events, from the transition log"""
+    park = _get_park(request)
+    if park is None:
+        return JsonResponse({"park_id": None, "events": []})
+    now = timezone.now()
+    try:
+        end = _parse_range_bound(request.GET.get("to"), now)
+        start = _parse_range_bound(request.GET.get("from"), end - timedelta(days=7))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if start >= end:
+        return JsonResponse({"error": "from must be before to"}, status=400)
+
+    attractions = Attraction.objects.filter(park=park)
+    if request.GET.get("attraction"):
+        try:
+            attractions = attractions.filter(id=uuid.UUID(request.GET["attraction"]))
+        except ValueError:
+            return JsonResponse({"error": "Invalid attraction id"}, status=400)
+    names = dict(attractions.values_list("id", "name"))
+    events = downtime_events(list(names), start, end, now)
+    for event in events:
+        event["name"] = names.get(uuid.UUID(event["attraction_id"]))
+    return JsonResponse(
+        {
+            "park_id": str(park.id),
+            "park_name": park.name,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "events": events,
+        }
+    )
+
+
+def api_uptime(request, attraction_id):
+    """API endpoint for an attraction's uptime per local day or week"""
+    attraction = get_object_or_404(
+        Attraction.objects.select_related("park"), id=attraction_id
+    )
+    period = request.GET.get("by", "day")
+    if period not in UPTIME_PERIODS:
+        return JsonResponse(
+            {"error": f"by must be one of {', '.join(UPTIME_PERIODS)}"}, status=400
+        )
+    now = timezone.now()
+    try:
+        end = _parse_range_bound(request.GET.get("to"), now)
+        start = _parse_range_bound(
+            request.GET.get("from"),
+            end - timedelta(days=7 if period == "day" else 28),
+        )
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if start >= end:
+        return JsonResponse({"error": "from must be before to"}, status=400)
+
+    return JsonResponse(
+        {
+            "attraction_id": str(attraction.id),
+            "name": attraction.name,
+            "timezone": attraction.park.timezone,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "by": period,
+            "uptime": uptime(attraction, start, end, period, now),
+        }
+    )
+
+
+def _health_json(health):
+    return {
+        **health,
+        "latency_percentiles": {
+            f"p{percentile:g}": seconds
+            for percentile, seconds in health["latency_percentiles"].items()
+        },
+    }
+
+
+def api_fetch_health(request):
+    """API endpoint for the success rate and response times of API fetches"""
+    now = timezone.now()
+    try:
+        end = _parse_range_bound(request.GET.get("to"), now)
+        start = _parse_range_bound(request.GET.get("from"), end - timedelta(hours=24))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if start >= end:
+        return JsonResponse({"error": "from must be before to"}, status=400)
+    try:
+        percentiles = [
+            float(value)
+            for value in request.GET.get("percentiles", "50,90,99").split(",")
+            if value.strip()
+        ]
+    except ValueError:
+        return JsonResponse({"error": "percentiles must be numbers"}, status=400)
+    if not all(0 <= percentile <= 100 for percentile in percentiles):
+        return JsonResponse(
+            {"error": "percentiles must be between 0 and 100"}, status=400
+        )
+    endpoint = request.GET.get("endpoint")
+
+    overall, by_endpoint = fetch_health(start, end, endpoint, percentiles)
+    failures = ApiLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    if endpoint:
+        failures = failures.filter(endpoint=endpoint)
+    return JsonResponse(
+        {
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "endpoint": endpoint,
+            **_health_json(overall),
+            "endpoints": [
+                {"endpoint": name, **_health_json(health)}
+                for name, health in by_endpoint.items()
+            ],
+            "recent_failures": list(
+                failures.order_by("-timestamp").values(
+                    "timestamp", "endpoint", "status_code", "error_message"
+                )[:20]
+            ),
+        }
+    )
+
+
+async def _event_stream(subscriber):
+    """SSE frames for one subscriber, with keepalive comments while idle"""
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(
+                    subscriber.queue.get(), settings.THEME_PARK_EVENT_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                frame = ": keepalive\n\n"
+            if frame is None:
+                return
+            yield frame
+    finally:
+        broadcaster.unsubscribe(subscriber)
+
+
+async def api_events(request):
+    """Server-sent events stream of attraction and show changes after each ingest
+
+    Served only under ASGI, where each open stream is a coroutine rather than
+    a worker. Clients resume with the Last-Event-ID header (or a
+    ``lastEventId`` query parameter) and receive a ``reset`` event when the
+    changes they missed are no longer available.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "The event stream is only served by the ASGI application"},
+            status=501,
+        )
+
+    park_id = request.GET.get("park")
+    if park_id:
+        try:
+            park_id = str(uuid.UUID(park_id))
+        except ValueError:
+            return JsonResponse({"error": "Invalid park id"}, status=400)
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get(
+        "lastEventId"
+    )
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscriber = await broadcaster.subscribe(park_id or None, last_event_id)
+    response = StreamingHttpResponse(
+        _event_stream(subscriber), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@staff_member_required
+def export_history(request, kind):
+    """Stream status or API log history for a time range as NDJSON or CSV"""
+    if kind not in EXPORTS:
+        raise Http404("Unknown export")
+    try:
+        end = _parse_range_bound(request.GET.get("to"), timezone.now())
+        start = _parse_range_bound(request.GET.get("from"), end - timedelta(days=1))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"error": "format must be ndjson or csv"}, status=400)
+    gzip = request.GET.get("gzip") in ("1", "true", "True")
+    park_id = request.GET.get("park")
+    if park_id:
+        try:
+            park_id = uuid.UUID(park_id)
+        except ValueError:
+            return JsonResponse({"error": "Invalid park id"}, status=400)
+
+    response = StreamingHttpResponse(
+        export_stream(kind, start, end, export_format, gzip, park_id=park_id),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    filename = export_filename(kind, start, end, export_format, gzip)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    if gzip:
+        # A .gz download, not a compressed encoding of the response
+        response["Content-Type"] = "application/gzip"
+    return response